@@ -1,7 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
-from .models import User, EmailOTP
+from proj_expense_track.admin_utils import EstimatedCountPaginator
+from .models import User, EmailOTP, EmailOutbox, UserShard
 
 
 # ═══════════════════════════════════════════════════════════
@@ -53,8 +54,12 @@ class UserAdmin(BaseUserAdmin):
         'is_staff',
         'is_superuser',
         'is_email_verified',
-        'date_joined',
     )
+    date_hierarchy = 'date_joined'
+
+    # Large-table changelist: estimated total, no second unfiltered COUNT(*)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     # Fields to show when editing existing user
     fieldsets = (
@@ -141,6 +146,8 @@ class EmailOTPAdmin(admin.ModelAdmin):
     
     list_filter = ('purpose', 'is_used', 'created_at')
     search_fields = ('user__email', 'otp')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
     readonly_fields = ('created_at',)
     ordering = ('-created_at',)
     
@@ -152,6 +159,49 @@ class EmailOTPAdmin(admin.ModelAdmin):
     is_expired_status.boolean = True
 
 
+# ═══════════════════════════════════════════════════════════
+# EMAIL OUTBOX ADMIN
+# ═══════════════════════════════════════════════════════════
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    """Delivery status of queued emails"""
+
+    list_display = (
+        'id',
+        'to_email',
+        'subject',
+        'status',
+        'attempts',
+        'next_attempt_at',
+        'sent_at',
+    )
+
+    list_filter = ('status',)
+    search_fields = ('to_email', 'subject')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+    ordering = ('-id',)
+
+
+# ═══════════════════════════════════════════════════════════
+# SHARD MAP ADMIN
+# ═══════════════════════════════════════════════════════════
+
+@admin.register(UserShard)
+class UserShardAdmin(admin.ModelAdmin):
+    """Which database holds each user's data (change it with move_user_shard)"""
+
+    list_display = ('user', 'shard', 'moved_at')
+    list_filter = ('shard',)
+    search_fields = ('user__email',)
+    list_select_related = ('user',)
+    readonly_fields = ('user', 'shard', 'moved_at')
+    ordering = ('-user_id',)
+
+    def has_add_permission(self, request):
+        return False
+
+
 # ═══════════════════════════════════════════════════════════
 # ADMIN SITE CUSTOMIZATION (OPTIONAL)
 # ═══════════════════════════════════════════════════════════
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class AccountConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'account'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from proj_expense_track.media import register_media_owner
+        from .avatars import profile_media_owner
+
+        register_media_owner('profiles/', profile_media_owner)
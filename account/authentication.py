@@ -0,0 +1,118 @@
+"""
+Lean JWT authentication.
+
+The stock JWTAuthentication loads the full User row on every request even
+though almost every view only uses `request.user` as a filter key. Here the
+user is built from the verified token claims instead: a real User instance
+with only id/email/is_active/is_email_verified loaded, so it works in ORM
+filters and FK assignments, and any other field is loaded lazily on first
+access.
+
+Deactivation (and password-change revocation when SIMPLE_JWT's
+CHECK_REVOKE_TOKEN is on) is still enforced through a small per-user state
+entry in the cache, refreshed at most every AUTH_USER_STATE_CACHE_SECONDS
+and dropped whenever the User row is saved.
+
+Authentication also selects the user's database shard for the rest of the
+request (proj_expense_track/sharding.py).
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from proj_expense_track import metrics
+from proj_expense_track.sharding import activate_user_shard
+
+
+STATE_CACHE_SECONDS = getattr(settings, 'AUTH_USER_STATE_CACHE_SECONDS', 60)
+
+EMAIL_CLAIM = 'email'
+VERIFIED_CLAIM = 'verified'
+
+
+def issue_tokens(user):
+    """Return a RefreshToken carrying the claims LeanJWTAuthentication needs."""
+    refresh = RefreshToken.for_user(user)
+    refresh[EMAIL_CLAIM] = user.email
+    refresh[VERIFIED_CLAIM] = user.is_email_verified
+    return refresh
+
+
+def _state_key(user_id):
+    return f'auth:user-state:{user_id}'
+
+
+def get_user_state(user_id):
+    """(is_active, is_email_verified, password_md5) or None if the user is gone."""
+    key = _state_key(user_id)
+    state = cache.get(key)
+    metrics.cache_lookup('auth_user_state', state is not None)
+    if state is None:
+        row = get_user_model().objects.filter(pk=user_id).values_list(
+            'is_active', 'is_email_verified', 'password'
+        ).first()
+        state = (row[0], row[1], get_md5_hash_password(row[2])) if row else False
+        cache.set(key, state, STATE_CACHE_SECONDS)
+    return state or None
+
+
+def invalidate_user_state(user_id):
+    cache.delete(_state_key(user_id))
+
+
+def get_full_user(request):
+    """Load the complete User row for endpoints that need more than the claims."""
+    return get_user_model().objects.get(pk=request.user.pk)
+
+
+class LeanJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that builds request.user from token claims."""
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            activate_user_shard(result[0].pk)
+        return result
+
+    def get_user(self, validated_token):
+        # Tokens issued before the extra claims existed: fall back to a full load
+        if EMAIL_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+
+        try:
+            # The claim is serialized as a string; coerce to the pk's type
+            user_id = self.user_model._meta.pk.to_python(
+                validated_token[api_settings.USER_ID_CLAIM]
+            )
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        state = get_user_state(user_id)
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        is_active, is_email_verified, password_md5 = state
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != password_md5
+        ):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."), code="password_changed"
+            )
+
+        # from_db marks every other field as deferred (loaded on access)
+        return self.user_model.from_db(
+            self.user_model.objects.db,
+            [api_settings.USER_ID_FIELD, 'email', 'is_active', 'is_email_verified'],
+            [user_id, validated_token[EMAIL_CLAIM], is_active, is_email_verified],
+        )
@@ -0,0 +1,155 @@
+"""
+Avatar upload pipeline.
+
+1. The view rejects a request whose declared Content-Length is over the
+   cap before reading the body. `CappedTemporaryFileUploadHandler` streams
+   the rest straight to a temp file on disk and stops reading the request
+   (without draining it) once AVATAR_MAX_UPLOAD_BYTES is exceeded.
+2. `validate_avatar` reads only the image header (format and dimensions)
+   - no pixel data is decoded on the request path.
+3. The view stores the original and marks the user `thumbnail_pending`;
+   `process_avatar_thumbnails` renders a fixed-size WebP (JPEG when WebP is
+   unavailable) in the background using draft-mode decoding.
+4. Originals and thumbnails are served like all media: through signed,
+   expiring URLs (`proj_expense_track.media.signed_media_url`) checked
+   against their owner.
+"""
+
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+from PIL import Image, ImageOps, features
+
+
+MAX_UPLOAD_BYTES = getattr(settings, 'AVATAR_MAX_UPLOAD_BYTES', 5 * 1024 * 1024)
+# Room for the multipart boundaries, headers and other form fields
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+MAX_PIXELS = getattr(settings, 'AVATAR_MAX_PIXELS', 40_000_000)
+THUMBNAIL_SIZE = getattr(settings, 'AVATAR_THUMBNAIL_SIZE', 256)
+
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+
+
+class CappedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Always spool to disk and give up once the size cap is crossed."""
+
+    def __init__(self, *args, max_bytes=MAX_UPLOAD_BYTES, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_bytes = max_bytes
+        self.too_large = False
+        self.received = 0
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Declared too large: stop at the first file (StopUpload raised
+        # here would escape the parser; the view checks before parsing)
+        if is_too_large(content_length, self.max_bytes):
+            self.too_large = True
+
+    def new_file(self, *args, **kwargs):
+        if self.too_large:
+            raise StopUpload(connection_reset=True)
+        self.received = 0
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_bytes:
+            self.too_large = True
+            self.file.close()
+            # connection_reset: the parser does not read the rest of the body
+            raise StopUpload(connection_reset=True)
+        return super().receive_data_chunk(raw_data, start)
+
+
+def is_too_large(content_length, max_bytes=MAX_UPLOAD_BYTES):
+    """Whether a request body of `content_length` bytes cannot hold an acceptable upload."""
+    try:
+        return int(content_length or 0) > max_bytes + MULTIPART_OVERHEAD_BYTES
+    except (TypeError, ValueError):
+        return False
+
+
+def validate_avatar(file):
+    """Return an error message, or None if the upload is an acceptable image."""
+    try:
+        with Image.open(file) as img:
+            # open() parses the header only; pixels are not decoded here
+            image_format = img.format
+            width, height = img.size
+    except Exception:
+        return 'File is not a valid image'
+    finally:
+        file.seek(0)
+
+    if image_format not in ALLOWED_FORMATS:
+        return f'Unsupported image format. Allowed: {", ".join(sorted(ALLOWED_FORMATS))}'
+    if width * height > MAX_PIXELS:
+        return 'Image dimensions are too large'
+    return None
+
+
+def thumbnail_format():
+    return ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+
+def render_thumbnail(path, size=THUMBNAIL_SIZE):
+    """Render a size x size thumbnail; returns (bytes, extension)."""
+    image_format, extension = thumbnail_format()
+
+    with Image.open(path) as img:
+        # JPEG: let the decoder downscale by 1/2..1/8 instead of decoding full size
+        img.draft('RGB', (size * 2, size * 2))
+        img = ImageOps.exif_transpose(img)
+        img = ImageOps.fit(img.convert('RGB'), (size, size), Image.LANCZOS)
+
+        buffer = BytesIO()
+        img.save(buffer, image_format, quality=82, optimize=True)
+
+    return buffer.getvalue(), extension
+
+
+def build_thumbnail(user):
+    """Render and attach the thumbnail for user.profile_image (worker side)."""
+    User = type(user)
+    old_thumbnail = user.profile_thumbnail.name if user.profile_thumbnail else None
+    image_name = user.profile_image.name if user.profile_image else ''
+
+    new_thumbnail = None
+    if image_name:
+        data, extension = render_thumbnail(user.profile_image.path)
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        user.profile_thumbnail.save(
+            f'{user.pk}_{digest}.{extension}',
+            ContentFile(data),
+            save=False
+        )
+        new_thumbnail = user.profile_thumbnail.name
+
+    storage = user.profile_thumbnail.storage
+
+    # Only commit if the avatar was not replaced while we were rendering
+    updated = User.objects.filter(pk=user.pk, profile_image=image_name).update(
+        profile_thumbnail=new_thumbnail,
+        thumbnail_pending=False
+    )
+    if not updated:
+        if new_thumbnail:
+            storage.delete(new_thumbnail)
+        return False
+
+    if old_thumbnail and old_thumbnail != new_thumbnail:
+        storage.delete(old_thumbnail)
+    return True
+
+
+def profile_media_owner(relative_path):
+    """Owner of a file under profiles/ (original upload or thumbnail)."""
+    # One indexed lookup on the column the path belongs to
+    field = 'profile_thumbnail' if relative_path.startswith('profiles/thumbs/') else 'profile_image'
+    return get_user_model().objects.filter(
+        **{field: relative_path}
+    ).values_list('id', flat=True).first()
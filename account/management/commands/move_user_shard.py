@@ -0,0 +1,255 @@
+# account/management/commands/move_user_shard.py
+# Move one user's expenses, budgets and settings to another database shard.
+# Order: copy to the target (one transaction there), verify the source did
+# not change, switch the shard map (one transaction on 'default'), then
+# delete the source copy - a separate step, retried with --cleanup.
+
+import hashlib
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from account.models import UserShard
+from api_budgets.models import Budget, BudgetCategory
+from api_expenses.models import (
+    CategorySpendStats, Expense, ReceiptAttachment, ReceiptBlob, ReceiptUpload,
+)
+from api_expenses.receipts import link_blob_files
+from proj_expense_track.sharding import (
+    MAP_CACHE_SECONDS, delete_user_data, forget_user_shard, set_user_shard, shard_aliases,
+    shard_for_user, use_shard,
+)
+from usersettings.cache import invalidate_user_settings
+from usersettings.models import UserSettings
+
+User = get_user_model()
+
+# Copied in this order so foreign keys can be remapped to the new ids
+USER_MODELS = (BudgetCategory, Budget, UserSettings, Expense, CategorySpendStats)
+
+
+def _user_rows(model, user_id, alias):
+    if model is ReceiptAttachment:
+        queryset = model.objects.using(alias).filter(expense__user_id=user_id)
+    else:
+        queryset = model.objects.using(alias).filter(user_id=user_id)
+    return queryset.order_by('pk')
+
+
+class Command(BaseCommand):
+    help = (
+        "Move a user's data to another shard: 1. copy it to the target, "
+        "2. check the source did not change and switch the shard map, "
+        "3. delete the old copy. If step 3 fails the user already lives on "
+        "the target; rerun with --cleanup to retry it. Row ids change on "
+        "the way; unfinished receipt uploads are dropped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', type=str, required=True, help='User to move')
+        parser.add_argument('--to', type=str, required=True, help='Target shard alias (e.g. shard_1)')
+        parser.add_argument(
+            '--wait',
+            type=float,
+            default=MAP_CACHE_SECONDS,
+            help=(
+                'Seconds to wait after switching before deleting the old copy, so '
+                'workers drop their cached shard map (default: SHARD_MAP_CACHE_SECONDS)'
+            )
+        )
+        parser.add_argument(
+            '--cleanup',
+            action='store_true',
+            help=(
+                'User already mapped to --to: delete the copies left on other shards '
+                'by a move whose last step failed'
+            )
+        )
+
+    def handle(self, *args, **kwargs):
+        target = kwargs['to']
+        if target not in shard_aliases():
+            raise CommandError(f"Unknown shard {target!r}; configured: {', '.join(shard_aliases())}")
+
+        user = User.objects.filter(email=kwargs['email']).first()
+        if user is None:
+            raise CommandError(f"User with email {kwargs['email']} not found")
+
+        source = shard_for_user(user.pk)
+        if source == target:
+            self._cleanup(user, target, kwargs['cleanup'], kwargs['wait'])
+            return
+        if kwargs['cleanup']:
+            raise CommandError(f"{user.email} is mapped to {source}, not {target}; nothing to clean up")
+
+        for model in USER_MODELS + (ReceiptAttachment,):
+            if _user_rows(model, user.pk, target).exists():
+                raise CommandError(
+                    f"{target} already holds {model.__name__} rows for this user "
+                    f"(left over from an earlier move?); remove them first"
+                )
+
+        self.stdout.write(self.style.WARNING(f"🚚 Moving {user.email} from {source} to {target}..."))
+
+        # 1. Copy, remembering what the source looked like
+        self.stdout.write(f"   1/3 Copying to {target}...")
+        before = self._fingerprint(user.pk, source)
+        try:
+            with use_shard(target), transaction.atomic(using=target):
+                copied = self._copy(user.pk, source, target)
+        except Exception:
+            delete_user_data(user.pk, target)
+            raise
+
+        # 2. Switch the shard map, unless the user wrote during the copy. The
+        # map lives on 'default', so that is the transaction that covers it;
+        # writes to the source after this check are caught in step 3
+        if self._fingerprint(user.pk, source) != before:
+            delete_user_data(user.pk, target)
+            raise CommandError("The user's data changed during the copy; nothing was moved, try again")
+
+        summary = ', '.join(f"{count} {name}" for name, count in copied.items())
+        self.stdout.write(f"   2/3 Copied {summary}; switching the shard map to {target}...")
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            set_user_shard(user.pk, target)
+            UserShard.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user.pk).update(moved_at=timezone.now())
+        # After the commit, so no worker re-caches the old mapping in between
+        forget_user_shard(user.pk)
+        invalidate_user_settings(user.pk)
+        self.stdout.write(self.style.SUCCESS(f"   ✅ {user.email} now lives on {target}"))
+
+        # 3. Delete the source copy. Workers that cached the old mapping may still write to the source
+        # until their entry expires; only delete it if nothing arrived
+        if kwargs['wait'] > 0:
+            self.stdout.write(f"   ⏳ Waiting {kwargs['wait']:.0f}s for cached shard maps to expire...")
+            time.sleep(kwargs['wait'])
+
+        if self._fingerprint(user.pk, source) != before:
+            self.stdout.write(self.style.ERROR(
+                f"❌ Writes reached {source} after the switch; its copy was kept for manual "
+                f"reconciliation (then rerun with --cleanup)"
+            ))
+            return
+
+        self.stdout.write(f"   3/3 Removing the old copy on {source}...")
+        self._delete_copy(user, source)
+        self.stdout.write(self.style.SUCCESS(f"✅ Moved {user.email} to {target} and removed the copy on {source}"))
+
+    def _cleanup(self, user, target, cleanup, wait):
+        """Step 3 again, for a user whose map already points at `target`."""
+        leftovers = [
+            alias for alias in shard_aliases()
+            if alias != target and any(_user_rows(model, user.pk, alias).exists() for model in USER_MODELS)
+        ]
+        if not leftovers:
+            self.stdout.write(self.style.WARNING(f"⚠️ {user.email} is already on {target}"))
+            return
+        if not cleanup:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ {user.email} is already on {target}; an old copy is left on "
+                f"{', '.join(leftovers)} (rerun with --cleanup to delete it)"
+            ))
+            return
+
+        if wait > 0:
+            self.stdout.write(f"   ⏳ Waiting {wait:.0f}s for cached shard maps to expire...")
+            time.sleep(wait)
+        for alias in leftovers:
+            self._delete_copy(user, alias)
+            self.stdout.write(self.style.SUCCESS(f"✅ Removed the old copy of {user.email} on {alias}"))
+
+    def _delete_copy(self, user, alias):
+        try:
+            delete_user_data(user.pk, alias)
+        except Exception as e:
+            raise CommandError(
+                f"Could not delete the old copy on {alias} ({e}); {user.email} already lives on "
+                f"{shard_for_user(user.pk)}, rerun with --cleanup to retry"
+            )
+
+    def _fingerprint(self, user_id, alias):
+        """Digest of every row the move copies."""
+        digest = hashlib.sha256()
+        for model in USER_MODELS + (ReceiptAttachment, ReceiptUpload):
+            for row in _user_rows(model, user_id, alias).values_list():
+                digest.update(repr(row).encode())
+        return digest.hexdigest()
+
+    def _copy(self, user_id, source, target):
+        """Insert the user's rows on `target` with fresh ids; returns counts per model."""
+        id_maps = {}
+        counts = {}
+
+        for model in USER_MODELS:
+            rows = list(_user_rows(model, user_id, source))
+            self._insert(model, rows, target, id_maps, {'category_id': BudgetCategory})
+            counts[model.__name__] = len(rows)
+
+        # Blobs are shared per shard by digest: reuse the target's row if it
+        # has one, else copy it with the target's own (hard-linked) files
+        attachments = list(_user_rows(ReceiptAttachment, user_id, source).select_related('blob'))
+        blob_map = id_maps.setdefault(ReceiptBlob, {})
+        for attachment in attachments:
+            blob = attachment.blob
+            if blob.pk in blob_map:
+                continue
+            existing = ReceiptBlob.objects.using(target).filter(sha256=blob.sha256).first()
+            if existing is None:
+                existing = self._clone(blob)
+                existing.ref_count = 0
+                existing.file, existing.thumbnail = link_blob_files(blob, target)
+                existing.save(using=target, force_insert=True)
+            blob_map[blob.pk] = existing.pk
+
+        self._insert(ReceiptAttachment, attachments, target, id_maps, {
+            'expense_id': Expense,
+            'blob_id': ReceiptBlob,
+        })
+        # Inserted without signals: count the new references here
+        added = {}
+        for attachment in attachments:
+            blob_id = blob_map[attachment.blob_id]
+            added[blob_id] = added.get(blob_id, 0) + 1
+        for blob_id, count in added.items():
+            ReceiptBlob.objects.using(target).filter(pk=blob_id).update(ref_count=F('ref_count') + count)
+        counts['ReceiptAttachment'] = len(attachments)
+        return counts
+
+    def _clone(self, obj):
+        clone = type(obj)()
+        for field in obj._meta.concrete_fields:
+            if not field.primary_key:
+                setattr(clone, field.attname, getattr(obj, field.attname))
+        return clone
+
+    def _insert(self, model, rows, target, id_maps, remap):
+        """Copy `rows` to `target`, remapping foreign keys and keeping timestamps."""
+        clones = []
+        for row in rows:
+            clone = self._clone(row)
+            for attname, related in remap.items():
+                value = getattr(clone, attname, None)
+                if value is not None:
+                    setattr(clone, attname, id_maps[related][value])
+            clones.append(clone)
+
+        if connections[target].features.can_return_rows_from_bulk_insert:
+            model.objects.using(target).bulk_create(clones, batch_size=500)
+        else:
+            for clone in clones:
+                # raw: no signals, the copied rows already carry their stats
+                clone.save_base(using=target, raw=True, force_insert=True)
+
+        id_maps[model] = {row.pk: clone.pk for row, clone in zip(rows, clones)}
+
+        # auto_now / auto_now_add were applied on insert; put the originals back
+        stamped = [f.name for f in model._meta.concrete_fields if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False)]
+        if stamped and clones:
+            for row, clone in zip(rows, clones):
+                for name in stamped:
+                    setattr(clone, name, getattr(row, name))
+            model.objects.using(target).bulk_update(clones, stamped, batch_size=500)
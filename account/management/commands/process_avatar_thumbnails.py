@@ -0,0 +1,72 @@
+# account/management/commands/process_avatar_thumbnails.py
+# Background worker that renders avatar thumbnails off the request path
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+
+from account.avatars import build_thumbnail
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Render thumbnails for newly uploaded avatars (once, or continuously with --loop)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help='Users processed per poll (default: 20)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling instead of exiting when nothing is pending'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Seconds to sleep between polls when idle (default: 2)'
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs.get('batch_size')
+        loop = kwargs.get('loop')
+        interval = kwargs.get('interval')
+
+        processed = failed = 0
+
+        try:
+            while True:
+                users = list(
+                    User.objects
+                    .filter(thumbnail_pending=True)
+                    .only('id', 'profile_image', 'profile_thumbnail', 'thumbnail_pending')
+                    .order_by('id')[:batch_size]
+                )
+
+                for user in users:
+                    try:
+                        build_thumbnail(user)
+                        processed += 1
+                    except Exception as e:
+                        # Unreadable image: clear the flag so it is not retried forever
+                        User.objects.filter(pk=user.pk).update(thumbnail_pending=False)
+                        failed += 1
+                        self.stdout.write(self.style.ERROR(f"❌ User {user.pk}: {e}"))
+
+                if len(users) >= batch_size:
+                    continue
+                if not loop:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Thumbnails rendered: {processed}, failed: {failed}")
+        )
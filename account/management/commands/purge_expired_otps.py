@@ -0,0 +1,55 @@
+# account/management/commands/purge_expired_otps.py
+# Delete used and expired EmailOTP rows in small batches
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from account.models import EmailOTP, OTP_VALIDITY
+
+
+class Command(BaseCommand):
+    help = "Purge used or expired email OTPs in batches (safe to run from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows deleted per statement (default: 500)'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.05,
+            help='Seconds to sleep between batches so writers are not starved (default: 0.05)'
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs.get('batch_size')
+        pause = kwargs.get('pause')
+
+        cutoff = timezone.now() - OTP_VALIDITY
+
+        expired = self._purge(EmailOTP.objects.filter(created_at__lt=cutoff), batch_size, pause)
+        used = self._purge(EmailOTP.objects.filter(is_used=True), batch_size, pause)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Purged {expired} expired and {used} used OTPs")
+        )
+
+    def _purge(self, queryset, batch_size, pause):
+        """Delete by primary-key chunks: each DELETE is short and holds locks briefly."""
+        deleted = 0
+        while True:
+            ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+
+            # Nothing references EmailOTP, so this is a single fast DELETE
+            deleted += EmailOTP.objects.filter(pk__in=ids).delete()[0]
+
+            if len(ids) < batch_size:
+                return deleted
+            time.sleep(pause)
@@ -0,0 +1,61 @@
+# account/management/commands/send_outbox_emails.py
+# Background worker that drains the EmailOutbox table
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from account.outbox import deliver_pending
+
+
+class Command(BaseCommand):
+    help = "Send queued emails from the outbox (once, or continuously with --loop)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50),
+            help='Emails sent per SMTP connection (default: EMAIL_OUTBOX_BATCH_SIZE)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new emails instead of exiting when the outbox is empty'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Seconds to sleep between polls when idle (default: 2)'
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs.get('batch_size')
+        loop = kwargs.get('loop')
+        interval = kwargs.get('interval')
+
+        total_sent = total_failed = 0
+
+        try:
+            while True:
+                sent, failed = deliver_pending(batch_size)
+                total_sent += sent
+                total_failed += failed
+
+                if sent or failed:
+                    self.stdout.write(f"📧 Sent {sent}, failed {failed}")
+
+                # Full batch: more are probably waiting, go again immediately
+                if sent + failed >= batch_size:
+                    continue
+                if not loop:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Outbox drained: {total_sent} sent, {total_failed} failed")
+        )
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0002_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emailotp',
+            index=models.Index(fields=['user', 'purpose', 'is_used', 'created_at'], name='emailotp_lookup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emailotp',
+            index=models.Index(fields=['created_at'], name='emailotp_created_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0003_emailotp_indexes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='profiles/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='thumbnail_pending',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('thumbnail_pending', True)), fields=['id'], name='user_thumbnail_pending_idx'),
+        ),
+    ]
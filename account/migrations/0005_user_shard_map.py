@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def map_existing_users_to_default(apps, schema_editor):
+    # Their data is already on 'default'
+    User = apps.get_model('account', 'User')
+    UserShard = apps.get_model('account', 'UserShard')
+    db = schema_editor.connection.alias
+    UserShard.objects.using(db).bulk_create(
+        [UserShard(user_id=pk, shard='default') for pk in User.objects.using(db).values_list('pk', flat=True)],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0004_user_avatar_thumbnail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserShard',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='shard', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('shard', models.CharField(db_index=True, max_length=50)),
+                ('moved_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'User shard',
+                'verbose_name_plural': 'User shards',
+            },
+        ),
+        migrations.RunPython(map_existing_users_to_default, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0005_user_shard_map'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='profile_image',
+            field=models.ImageField(blank=True, db_index=True, null=True, upload_to='profiles/'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='profile_thumbnail',
+            field=models.ImageField(blank=True, db_index=True, null=True, upload_to='profiles/thumbs/'),
+        ),
+    ]
@@ -10,8 +10,17 @@ class User(AbstractUser):
     profile_image = models.ImageField(
         upload_to='profiles/',
         null=True,
-        blank=True
+        blank=True,
+        db_index=True
     )
+    # Rendered in the background by `process_avatar_thumbnails`
+    profile_thumbnail = models.ImageField(
+        upload_to='profiles/thumbs/',
+        null=True,
+        blank=True,
+        db_index=True
+    )
+    thumbnail_pending = models.BooleanField(default=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
@@ -19,6 +28,25 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(
+                fields=['id'],
+                condition=models.Q(thumbnail_pending=True),
+                name='user_thumbnail_pending_idx',
+            ),
+        ]
+
+# OTPs older than this are rejected and purged by `purge_expired_otps`
+OTP_VALIDITY = timedelta(minutes=15)
+
+
+class EmailOTPQuerySet(models.QuerySet):
+    def active(self):
+        """Unused and not yet expired - the expiry check runs in SQL."""
+        return self.filter(is_used=False, created_at__gte=timezone.now() - OTP_VALIDITY)
+
+
 class EmailOTP(models.Model):
     PURPOSE_CHOICES = (
         ('register', 'Register'),
@@ -31,8 +59,10 @@ class EmailOTP(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_used = models.BooleanField(default=False)
 
+    objects = EmailOTPQuerySet.as_manager()
+
     def is_expired(self):
-        return timezone.now() > self.created_at + timedelta(minutes=15)
+        return timezone.now() > self.created_at + OTP_VALIDITY
 
     def __str__(self):
         return f"{self.user.email} - {self.purpose} - {'Used' if self.is_used else 'Active'}"
@@ -40,4 +70,68 @@ class EmailOTP(models.Model):
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Email OTP'
-        verbose_name_plural = 'Email OTPs'
\ No newline at end of file
+        verbose_name_plural = 'Email OTPs'
+        indexes = [
+            # Verification lookup: user + purpose, unused, newest first
+            models.Index(fields=['user', 'purpose', 'is_used', 'created_at'], name='emailotp_lookup_idx'),
+            # Reaper range scan
+            models.Index(fields=['created_at'], name='emailotp_created_idx'),
+        ]
+
+
+class EmailOutbox(models.Model):
+    """
+    Outgoing mail queued in the same transaction as the row that needs it
+    (e.g. EmailOTP). Delivered by the `send_outbox_emails` worker command.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.to_email} - {self.subject} - {self.status}"
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Email outbox'
+        verbose_name_plural = 'Email outbox'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_pending_idx'),
+        ]
+
+
+class UserShard(models.Model):
+    """
+    Shard map: the database alias holding the user's expenses, budgets and
+    settings (see proj_expense_track/sharding.py). Changed only by
+    `move_user_shard`, after the data has been copied.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='shard'
+    )
+    shard = models.CharField(max_length=50, db_index=True)
+    moved_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.shard}"
+
+    class Meta:
+        verbose_name = 'User shard'
+        verbose_name_plural = 'User shards'
@@ -0,0 +1,113 @@
+"""
+Transactional email outbox.
+
+Views call `enqueue_email` inside the same transaction that creates the
+OTP, so either both rows exist or neither does, and the request never
+waits on SMTP. `deliver_pending` is run by the `send_outbox_emails`
+command and sends a batch over one reused mail connection.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+
+MAX_ATTEMPTS = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+BACKOFF_SECONDS = getattr(settings, 'EMAIL_OUTBOX_BACKOFF_SECONDS', 30)
+MAX_BACKOFF_SECONDS = getattr(settings, 'EMAIL_OUTBOX_MAX_BACKOFF_SECONDS', 3600)
+# How long a claimed row is hidden from other workers while being sent
+LEASE_SECONDS = getattr(settings, 'EMAIL_OUTBOX_LEASE_SECONDS', 300)
+
+
+def enqueue_email(to_email, subject, body):
+    """Queue a plain-text email for background delivery."""
+    return EmailOutbox.objects.create(
+        to_email=to_email,
+        subject=subject,
+        body=body
+    )
+
+
+def _claim_batch(batch_size):
+    """
+    Lease the next due rows by pushing next_attempt_at past the lease window.
+    The claim is a short transaction so sending never holds DB locks; rows
+    from a crashed worker become due again once the lease expires.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            EmailOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        EmailOutbox.objects.filter(id__in=ids).update(
+            next_attempt_at=now + timedelta(seconds=LEASE_SECONDS)
+        )
+    return list(EmailOutbox.objects.filter(id__in=ids).order_by('id'))
+
+
+def deliver_pending(batch_size=50):
+    """
+    Send one batch of due emails over a single connection.
+    Returns (sent, failed) counts; failures are retried with exponential
+    backoff until MAX_ATTEMPTS.
+    """
+    batch = _claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        # Server unreachable: back off the whole batch
+        for item in batch:
+            _record_failure(item, e)
+        return 0, len(batch)
+
+    sent = failed = 0
+    try:
+        for item in batch:
+            message = EmailMessage(
+                subject=item.subject,
+                body=item.body,
+                from_email=None,
+                to=[item.to_email],
+                connection=connection
+            )
+            try:
+                message.send()
+            except Exception as e:
+                _record_failure(item, e)
+                failed += 1
+                continue
+
+            item.status = 'sent'
+            item.attempts += 1
+            item.sent_at = timezone.now()
+            item.last_error = ''
+            item.save(update_fields=['status', 'attempts', 'sent_at', 'last_error'])
+            sent += 1
+    finally:
+        connection.close()
+
+    return sent, failed
+
+
+def _record_failure(item, error):
+    item.attempts += 1
+    item.last_error = str(error)
+    if item.attempts >= MAX_ATTEMPTS:
+        item.status = 'failed'
+    else:
+        delay = min(BACKOFF_SECONDS * (2 ** (item.attempts - 1)), MAX_BACKOFF_SECONDS)
+        item.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+    item.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at'])
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import User
+from proj_expense_track.media import signed_media_url
 
 class RegisterSerializer(serializers.ModelSerializer):
     full_name = serializers.CharField(write_only=True)
@@ -45,6 +46,7 @@ class RegisterSerializer(serializers.ModelSerializer):
 
 class ProfileSerializer(serializers.ModelSerializer):
     profile_image_url = serializers.SerializerMethodField()
+    profile_thumbnail_url = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -54,11 +56,18 @@ class ProfileSerializer(serializers.ModelSerializer):
             'email',
             'username',
             'profile_image_url',
+            'profile_thumbnail_url',
         ]
 
     def get_profile_image_url(self, obj):
         request = self.context.get('request')
         if obj.profile_image:
-            return request.build_absolute_uri(obj.profile_image.url)
+            return signed_media_url(request, obj.profile_image.name)
+        return None
+
+    def get_profile_thumbnail_url(self, obj):
+        request = self.context.get('request')
+        if obj.profile_thumbnail:
+            return signed_media_url(request, obj.profile_thumbnail.name)
         return None
 # -----------------------------------------------------------------------
\ No newline at end of file
@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from proj_expense_track.sharding import (
+    DEFAULT_SHARD, delete_user_data, forget_user_shard, shard_for_user,
+)
+from .authentication import invalidate_user_state
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def drop_cached_user_state(sender, instance, **kwargs):
+    """Deactivation / password change takes effect on the next request."""
+    invalidate_user_state(instance.pk)
+
+
+@receiver(post_save, sender=get_user_model())
+def assign_user_shard(sender, instance, created, raw=False, **kwargs):
+    """Place new users on a shard before anything is written for them."""
+    if created and not raw:
+        shard_for_user(instance.pk)
+
+
+@receiver(pre_delete, sender=get_user_model())
+def remember_user_shard(sender, instance, **kwargs):
+    # The UserShard row goes with the user
+    instance._shard_alias = shard_for_user(instance.pk)
+
+
+@receiver(post_delete, sender=get_user_model())
+def delete_sharded_user_data(sender, instance, **kwargs):
+    """Rows on 'default' are removed by the delete cascade; other shards are not."""
+    user_id = instance.pk
+    alias = getattr(instance, '_shard_alias', DEFAULT_SHARD)
+    forget_user_shard(user_id)
+    if alias != DEFAULT_SHARD:
+        transaction.on_commit(lambda: delete_user_data(user_id, alias))
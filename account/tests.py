@@ -0,0 +1,311 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient, APIRequestFactory
+
+from . import outbox
+from .authentication import api_settings, issue_tokens
+from .avatars import MAX_UPLOAD_BYTES, build_thumbnail
+from .models import OTP_VALIDITY, EmailOTP, EmailOutbox, User
+from .serializers import ProfileSerializer
+from .throttling import MAX_FAILED_ATTEMPTS, SLOWDOWN_SECONDS
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class EmailOutboxTests(TestCase):
+
+    def test_register_enqueues_without_sending(self):
+        response = APIClient().post('/api/account/register/', {
+            'full_name': 'Test User',
+            'email': 'test@example.com',
+            'username': 'testuser',
+            'password': 'S3cure-pass!',
+            'confirm_password': 'S3cure-pass!',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        item = EmailOutbox.objects.get()
+        self.assertEqual(item.to_email, 'test@example.com')
+        self.assertEqual(item.status, 'pending')
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_worker_sends_and_marks_sent(self):
+        item = outbox.enqueue_email('a@example.com', 'Subject', 'Body')
+
+        self.assertEqual(outbox.deliver_pending(), (1, 0))
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['a@example.com'])
+        item.refresh_from_db()
+        self.assertEqual(item.status, 'sent')
+        self.assertEqual(item.attempts, 1)
+        self.assertIsNotNone(item.sent_at)
+
+    def test_failed_send_is_retried_with_backoff(self):
+        item = outbox.enqueue_email('a@example.com', 'Subject', 'Body')
+
+        with mock.patch('account.outbox.EmailMessage.send', side_effect=OSError('refused')):
+            before = timezone.now()
+            self.assertEqual(outbox.deliver_pending(), (0, 1))
+
+        item.refresh_from_db()
+        self.assertEqual(item.status, 'pending')
+        self.assertEqual(item.attempts, 1)
+        self.assertEqual(item.last_error, 'refused')
+        self.assertGreaterEqual(item.next_attempt_at, before + timedelta(seconds=outbox.BACKOFF_SECONDS))
+        # Not due yet: the next run leaves it alone
+        self.assertEqual(outbox.deliver_pending(), (0, 0))
+
+        # Once due, the second failure waits twice as long
+        EmailOutbox.objects.filter(pk=item.pk).update(next_attempt_at=timezone.now())
+        with mock.patch('account.outbox.EmailMessage.send', side_effect=OSError('refused')):
+            before = timezone.now()
+            outbox.deliver_pending()
+
+        item.refresh_from_db()
+        self.assertEqual(item.attempts, 2)
+        self.assertGreaterEqual(item.next_attempt_at, before + timedelta(seconds=2 * outbox.BACKOFF_SECONDS))
+
+    def test_gives_up_after_max_attempts(self):
+        item = outbox.enqueue_email('a@example.com', 'Subject', 'Body')
+        EmailOutbox.objects.filter(pk=item.pk).update(attempts=outbox.MAX_ATTEMPTS - 1)
+
+        with mock.patch('account.outbox.EmailMessage.send', side_effect=OSError('refused')):
+            outbox.deliver_pending()
+
+        item.refresh_from_db()
+        self.assertEqual(item.status, 'failed')
+        self.assertEqual(item.attempts, outbox.MAX_ATTEMPTS)
+
+    def test_leased_row_is_not_claimed_twice(self):
+        item = outbox.enqueue_email('a@example.com', 'Subject', 'Body')
+
+        self.assertEqual([row.pk for row in outbox._claim_batch(10)], [item.pk])
+        self.assertEqual(outbox._claim_batch(10), [])
+
+        item.refresh_from_db()
+        self.assertGreater(item.next_attempt_at, timezone.now() + timedelta(seconds=outbox.LEASE_SECONDS - 60))
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class LoginThrottleTests(TestCase):
+    url = '/api/account/login/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='owner@example.com', username='owner', password='S3cure-pass!',
+            is_active=True, is_email_verified=True
+        )
+        self.client = APIClient()
+
+    def _login(self, password, ip, email='owner@example.com'):
+        return self.client.post(self.url, {'email': email, 'password': password}, format='json', REMOTE_ADDR=ip)
+
+    def _fail_from(self, ip):
+        for _ in range(MAX_FAILED_ATTEMPTS):
+            self.assertEqual(self._login('wrong', ip).status_code, 401)
+
+    def test_lockout_is_per_ip_and_email(self):
+        self._fail_from('10.0.0.1')
+
+        self.assertEqual(self._login('S3cure-pass!', '10.0.0.1').status_code, 429)
+        # The owner, elsewhere, still gets in
+        self.assertEqual(self._login('S3cure-pass!', '10.0.0.2').status_code, 200)
+
+    def test_attacked_email_is_only_slowed_down(self):
+        self._fail_from('10.0.0.1')
+
+        self.assertEqual(self._login('wrong', '10.0.0.2').status_code, 401)
+        response = self._login('S3cure-pass!', '10.0.0.3', email='OWNER@example.com')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertLessEqual(int(response['Retry-After']), SLOWDOWN_SECONDS)
+
+    def test_success_clears_failures(self):
+        for _ in range(MAX_FAILED_ATTEMPTS - 1):
+            self._login('wrong', '10.0.0.1')
+        self.assertEqual(self._login('S3cure-pass!', '10.0.0.1').status_code, 200)
+
+        self.assertEqual(self._login('wrong', '10.0.0.1').status_code, 401)
+        self.assertEqual(self._login('S3cure-pass!', '10.0.0.1').status_code, 200)
+
+    def test_login_reads_the_user_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self._login('S3cure-pass!', '10.0.0.1')
+
+        self.assertEqual(response.status_code, 200)
+        user_reads = [q for q in queries if q['sql'].startswith('SELECT') and '"account_user"' in q['sql']]
+        self.assertEqual(len(user_reads), 1)
+
+
+class LeanJWTAuthenticationTests(TestCase):
+    url = '/api/expenses/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='lean@example.com', username='lean', password='S3cure-pass!',
+            is_active=True, is_email_verified=True
+        )
+        self.client = APIClient()
+
+    def _get(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return self.client.get(self.url)
+
+    def _user_reads(self, token):
+        with CaptureQueriesContext(connection) as queries:
+            response = self._get(token)
+        self.assertEqual(response.status_code, 200)
+        return len([q for q in queries if '"account_user"' in q['sql']])
+
+    def test_one_auth_query_then_none_while_cached(self):
+        token = issue_tokens(self.user).access_token
+
+        self.assertEqual(self._user_reads(token), 1)
+        self.assertEqual(self._user_reads(token), 0)
+
+    def test_deactivated_user_is_rejected(self):
+        token = issue_tokens(self.user).access_token
+        self.assertEqual(self._get(token).status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self._get(token).status_code, 401)
+
+    def test_password_change_revokes_tokens(self):
+        with mock.patch.object(api_settings, 'CHECK_REVOKE_TOKEN', True):
+            token = issue_tokens(self.user).access_token
+            self.assertEqual(self._get(token).status_code, 200)
+
+            self.user.set_password('N3w-pass-phrase!')
+            self.user.save()
+
+            self.assertEqual(self._get(token).status_code, 401)
+            self.assertEqual(self._get(issue_tokens(self.user).access_token).status_code, 200)
+
+
+class OTPExpiryTests(TestCase):
+    url = '/api/account/verify-otp/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='otp@example.com', username='otp', password='S3cure-pass!', is_active=False
+        )
+        self.client = APIClient()
+
+    def _otp(self, age, code='123456', **kwargs):
+        otp = EmailOTP.objects.create(user=self.user, otp=code, **kwargs)
+        EmailOTP.objects.filter(pk=otp.pk).update(created_at=timezone.now() - age)
+        return otp
+
+    def _verify(self, code='123456'):
+        return self.client.post(self.url, {'email': self.user.email, 'otp': code}, format='json')
+
+    def test_expired_otp_is_rejected(self):
+        self._otp(OTP_VALIDITY + timedelta(seconds=1))
+
+        response = self._verify()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Invalid or expired OTP')
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+
+    def test_fresh_otp_is_accepted_once(self):
+        otp = self._otp(OTP_VALIDITY - timedelta(minutes=1))
+
+        self.assertEqual(self._verify().status_code, 200)
+        self.assertEqual(self._verify().status_code, 400)
+
+        otp.refresh_from_db()
+        self.assertTrue(otp.is_used)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_active)
+
+    def test_other_purpose_does_not_verify(self):
+        self._otp(timedelta(0), purpose='reset')
+
+        self.assertEqual(self._verify().status_code, 400)
+
+    def test_purge_removes_expired_and_used(self):
+        self._otp(OTP_VALIDITY + timedelta(minutes=1), code='111111')
+        self._otp(timedelta(0), code='222222', is_used=True)
+        fresh = self._otp(timedelta(0), code='333333')
+
+        call_command('purge_expired_otps', batch_size=1, pause=0, stdout=StringIO())
+
+        self.assertEqual(list(EmailOTP.objects.values_list('pk', flat=True)), [fresh.pk])
+
+
+class AvatarTests(TestCase):
+    url = '/api/account/profile/avatar/'
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(
+            email='avatar@example.com', username='avatar', password='S3cure-pass!',
+            is_active=True, is_email_verified=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _image(self, name='me.png'):
+        buffer = BytesIO()
+        Image.new('RGB', (64, 48), (200, 30, 30)).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_declared_oversize_is_refused_before_parsing(self):
+        with mock.patch('account.views.CappedTemporaryFileUploadHandler') as handler:
+            response = self.client.post(
+                self.url, {'profile_image': self._image()}, format='multipart',
+                CONTENT_LENGTH=str(MAX_UPLOAD_BYTES * 2)
+            )
+
+        self.assertEqual(response.status_code, 413)
+        handler.assert_not_called()
+
+    def test_oversize_body_stops_the_upload(self):
+        big = SimpleUploadedFile('big.png', b'\0' * (MAX_UPLOAD_BYTES + 1), content_type='image/png')
+        with mock.patch('account.views.is_too_large', return_value=False):
+            response = self.client.post(self.url, {'profile_image': big}, format='multipart')
+
+        self.assertEqual(response.status_code, 413)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.profile_image)
+
+    def test_original_and_thumbnail_use_signed_urls(self):
+        response = self.client.post(self.url, {'profile_image': self._image()}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('?sig=', response.data['profile_image_url'])
+
+        self.user.refresh_from_db()
+        self.assertTrue(build_thumbnail(self.user))
+        request = APIRequestFactory().get('/')
+        thumbnail_url = ProfileSerializer(self.user, context={'request': request}).data['profile_thumbnail_url']
+        self.assertIn('?sig=', thumbnail_url)
+
+        anonymous = APIClient()
+        self.assertEqual(anonymous.get(thumbnail_url).status_code, 200)
+        unsigned = thumbnail_url.split('?')[0]
+        self.assertEqual(anonymous.get(unsigned).status_code, 401)
@@ -0,0 +1,142 @@
+"""
+Cache-backed abuse protection for the public auth endpoints.
+
+Two mechanisms, both kept in Django's cache so rejected requests cost no
+database query and no password hash:
+
+- a token bucket per client IP, limiting request rate per scope
+- failed-attempt counters. Too many wrong passwords / OTP guesses for an
+  email from one IP lock that (IP, email) pair out for LOCKOUT_SECONDS.
+  Across all IPs the email is only slowed down, to one attempt per
+  SLOWDOWN_SECONDS: a stranger failing on purpose must not be able to
+  lock the owner out of their own account.
+
+With the default local-memory cache the limits are per process; configure
+a shared cache (see CACHES in settings) to enforce them across workers.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+
+# scope -> (bucket capacity, seconds to refill a full bucket)
+RATE_LIMITS = getattr(settings, 'AUTH_RATE_LIMITS', {
+    'login': (10, 60),
+    'otp_register': (10, 60),
+    'otp_reset': (10, 60),
+})
+MAX_FAILED_ATTEMPTS = getattr(settings, 'AUTH_MAX_FAILED_ATTEMPTS', 5)
+LOCKOUT_SECONDS = getattr(settings, 'AUTH_LOCKOUT_SECONDS', 900)
+SLOWDOWN_SECONDS = getattr(settings, 'AUTH_SLOWDOWN_SECONDS', 30)
+# Reverse proxies in front of the app that append to X-Forwarded-For
+TRUSTED_PROXY_COUNT = getattr(settings, 'TRUSTED_PROXY_COUNT', 0)
+
+
+def client_ip(request):
+    """
+    The client address as seen by the outermost trusted proxy.
+    X-Forwarded-For entries left of the trusted hops are written by the
+    client and can be anything, so they are never used.
+    """
+    remote_addr = request.META.get('REMOTE_ADDR', '')
+    if not TRUSTED_PROXY_COUNT:
+        return remote_addr
+
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()] + [remote_addr]
+    # Each trusted proxy appended the address it received the request from
+    return hops[max(0, len(hops) - 1 - TRUSTED_PROXY_COUNT)]
+
+
+# ==================== TOKEN BUCKET (per IP) ====================
+
+def take_token(scope, ident, limit=None):
+    """
+    Take one token from the (scope, ident) bucket.
+    Returns 0 if allowed, else seconds until a token is available.
+    `limit` overrides RATE_LIMITS[scope] for callers with their own setting.
+    Read-modify-write on the cache is not atomic; under a race a client
+    may get a token or two extra, which is acceptable for rate limiting.
+    """
+    capacity, period = limit or RATE_LIMITS[scope]
+    refill_rate = capacity / period
+    key = f'throttle:bucket:{scope}:{ident}'
+    now = time.time()
+
+    tokens, updated = cache.get(key, (capacity, now))
+    tokens = min(capacity, tokens + (now - updated) * refill_rate)
+
+    if tokens < 1:
+        cache.set(key, (tokens, now), period)
+        return int((1 - tokens) / refill_rate) + 1
+
+    cache.set(key, (tokens - 1, now), period)
+    return 0
+
+
+# ==================== FAILED ATTEMPTS ====================
+
+def _attempts_keys(scope, email, ip):
+    """(per IP and email, per email) failure counter keys."""
+    email = email.strip().lower()
+    return f'throttle:fail:{scope}:{ip}:{email}', f'throttle:fail:{scope}:{email}'
+
+
+def _incr(key):
+    # add() is a no-op if the key exists, incr() is atomic on shared caches
+    cache.add(key, 0, LOCKOUT_SECONDS)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.set(key, 1, LOCKOUT_SECONDS)
+        return 1
+
+
+def failure_retry_after(request, scope, email):
+    """Seconds this client must wait before trying `email` again (0: go ahead)."""
+    pair_key, email_key = _attempts_keys(scope, email, client_ip(request))
+    if cache.get(pair_key, 0) >= MAX_FAILED_ATTEMPTS:
+        return LOCKOUT_SECONDS
+    if cache.get(email_key, 0) >= MAX_FAILED_ATTEMPTS:
+        # Under attack from elsewhere: everyone gets a turn, slowly
+        return take_token(f'{scope}_slowdown', email.strip().lower(), (1, SLOWDOWN_SECONDS))
+    return 0
+
+
+def record_failure(request, scope, email):
+    for key in _attempts_keys(scope, email, client_ip(request)):
+        _incr(key)
+
+
+def reset_failures(request, scope, email):
+    cache.delete_many(_attempts_keys(scope, email, client_ip(request)))
+
+
+# ==================== VIEW HELPER ====================
+
+def check_throttle(request, scope, email=None):
+    """
+    Return a 429 Response if the request must be rejected, else None.
+    Call before touching the database.
+    """
+    retry_after = take_token(scope, client_ip(request))
+    if not retry_after and email:
+        retry_after = failure_retry_after(request, scope, email)
+
+    if not retry_after:
+        return None
+
+    response = Response(
+        {
+            'error': 'Too many attempts. Please try again later.',
+            'retry_after': retry_after
+        },
+        status=status.HTTP_429_TOO_MANY_REQUESTS
+    )
+    response['Retry-After'] = str(retry_after)
+    return response
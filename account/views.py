@@ -1,15 +1,23 @@
 import random
-from django.core.mail import send_mail
+from django.db import transaction
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from django.contrib.auth import authenticate
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 
 from .models import EmailOTP, User
+from .outbox import enqueue_email
+from .throttling import check_throttle, record_failure, reset_failures
+from .authentication import issue_tokens, get_full_user
+from .avatars import (
+    CappedTemporaryFileUploadHandler,
+    MAX_UPLOAD_BYTES as AVATAR_MAX_UPLOAD_BYTES,
+    is_too_large,
+    validate_avatar,
+)
+from proj_expense_track.media import signed_media_url
 from .serializers import RegisterSerializer, ProfileSerializer
 
 
@@ -24,19 +32,22 @@ def register_user(request):
     try:
         serializer = RegisterSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = serializer.save()
 
-        otp = generate_otp()
-        EmailOTP.objects.filter(user=user).delete()
-        # ✅ FIXED - purpose explicitly set
-        EmailOTP.objects.create(user=user, otp=otp, purpose='register')
-
-        send_mail(
-            subject='Verify your email',
-            message=f'Your OTP is {otp}',
-            from_email=None,
-            recipient_list=[user.email],
-        )
+        # User, OTP and outgoing mail commit together; delivery happens in
+        # the send_outbox_emails worker, off the request path
+        with transaction.atomic():
+            user = serializer.save()
+
+            otp = generate_otp()
+            EmailOTP.objects.filter(user=user).delete()
+            # ✅ FIXED - purpose explicitly set
+            EmailOTP.objects.create(user=user, otp=otp, purpose='register')
+
+            enqueue_email(
+                to_email=user.email,
+                subject='Verify your email',
+                body=f'Your OTP is {otp}',
+            )
 
         return Response({
             'message': 'OTP sent successfully to email'
@@ -59,23 +70,25 @@ def verify_email_otp(request):
         if not email or not otp:
             return Response({'error': 'Email and OTP required'}, status=400)
 
+        throttled = check_throttle(request, 'otp_register', email)
+        if throttled:
+            return throttled
+
         user = User.objects.filter(email=email).first()
         if not user:
+            record_failure(request, 'otp_register', email)
             return Response({'error': 'Invalid email'}, status=400)
 
         # ✅ FIXED - filters by purpose='register'
-        otp_obj = EmailOTP.objects.filter(
+        otp_obj = EmailOTP.objects.active().filter(
             user=user,
             otp=otp,
-            purpose='register',
-            is_used=False
-        ).last()
+            purpose='register'
+        ).first()
 
         if not otp_obj:
-            return Response({'error': 'Invalid OTP'}, status=400)
-
-        if otp_obj.is_expired():
-            return Response({'error': 'OTP expired'}, status=400)
+            record_failure(request, 'otp_register', email)
+            return Response({'error': 'Invalid or expired OTP'}, status=400)
 
         otp_obj.is_used = True
         otp_obj.save()
@@ -83,6 +96,7 @@ def verify_email_otp(request):
         user.is_active = True
         user.is_email_verified = True
         user.save()
+        reset_failures(request, 'otp_register', email)
 
         return Response({'message': 'Email verified successfully'})
     except Exception as e:
@@ -106,10 +120,16 @@ def login_user(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    # ── Rate limit (cache only, before any DB query or hashing) ──
+    throttled = check_throttle(request, 'login', email)
+    if throttled:
+        return throttled
+
     # ── Check user existence ──────────────────────────────────────
     try:
         user_obj = User.objects.get(email=email)
     except User.DoesNotExist:
+        record_failure(request, 'login', email)
         return Response(
             {'error': 'No account found with this email'},
             status=status.HTTP_404_NOT_FOUND
@@ -129,26 +149,27 @@ def login_user(request):
             status=status.HTTP_403_FORBIDDEN
         )
 
-    # ── Authenticate (password check) ────────────────────────────
-    user = authenticate(username=email, password=password)
-    if user is None:
+    # ── Authenticate (password check on the row fetched above) ───
+    if not user_obj.check_password(password):
+        record_failure(request, 'login', email)
         return Response(
             {'error': 'Incorrect password. Please try again.'},
             status=status.HTTP_401_UNAUTHORIZED
         )
+    reset_failures(request, 'login', email)
 
     # ── Issue JWT tokens ──────────────────────────────────────────
     try:
-        refresh = RefreshToken.for_user(user)
+        refresh = issue_tokens(user_obj)
         return Response({
             'message': 'Login successful',
             'access': str(refresh.access_token),
             'refresh': str(refresh),
             'user': {
-                'id': user.id,
-                'email': user.email,
-                'full_name': f"{user.first_name} {user.last_name}".strip(),
-                'username': user.username,
+                'id': user_obj.id,
+                'email': user_obj.email,
+                'full_name': f"{user_obj.first_name} {user_obj.last_name}".strip(),
+                'username': user_obj.username,
             }
         }, status=status.HTTP_200_OK)
 
@@ -165,14 +186,15 @@ def login_user(request):
 @permission_classes([IsAuthenticated])
 def profile(request):
     try:
-        
+        user = get_full_user(request)
+
         return Response({
             'message': 'Profile retrieved successfully',
             'data': {
-            'id': request.user.id,
-            'full_name': f"{request.user.first_name} {request.user.last_name}".strip(),
-            'email': request.user.email,
-            'username': request.user.username
+            'id': user.id,
+            'full_name': f"{user.first_name} {user.last_name}".strip(),
+            'email': user.email,
+            'username': user.username
             }
         }, status=status.HTTP_200_OK)
     except Exception as e:
@@ -199,15 +221,15 @@ def password_reset_request(request):
 
         otp = generate_otp()
 
-        EmailOTP.objects.filter(user=user, purpose='reset').delete()
-        EmailOTP.objects.create(user=user, otp=otp, purpose='reset')
+        with transaction.atomic():
+            EmailOTP.objects.filter(user=user, purpose='reset').delete()
+            EmailOTP.objects.create(user=user, otp=otp, purpose='reset')
 
-        send_mail(
-            subject='Password Reset OTP',
-            message=f'Your password reset OTP is {otp}. It is valid for 5 minutes.',
-            from_email=None,
-            recipient_list=[user.email],
-        )
+            enqueue_email(
+                to_email=user.email,
+                subject='Password Reset OTP',
+                body=f'Your password reset OTP is {otp}. It is valid for 5 minutes.',
+            )
 
         return Response({'message': 'Password reset OTP sent to email'})
     except Exception as e:
@@ -229,25 +251,28 @@ def password_reset_verify_otp(request):
         if not email or not otp:
             return Response({'error': 'Email and OTP are required'}, status=400)
 
+        throttled = check_throttle(request, 'otp_reset', email)
+        if throttled:
+            return throttled
+
         user = User.objects.filter(email=email).first()
         if not user:
+            record_failure(request, 'otp_reset', email)
             return Response({'error': 'Invalid email'}, status=400)
 
-        otp_obj = EmailOTP.objects.filter(
+        otp_obj = EmailOTP.objects.active().filter(
             user=user,
             otp=otp,
-            purpose='reset',
-            is_used=False
-        ).last()
+            purpose='reset'
+        ).first()
 
         if not otp_obj:
-            return Response({'error': 'Invalid OTP'}, status=400)
-
-        if otp_obj.is_expired():
-            return Response({'error': 'OTP expired'}, status=400)
+            record_failure(request, 'otp_reset', email)
+            return Response({'error': 'Invalid or expired OTP'}, status=400)
 
         otp_obj.is_used = True
         otp_obj.save()
+        reset_failures(request, 'otp_reset', email)
 
         return Response({'message': 'OTP verified. You may now reset your password'})
     except Exception as e:
@@ -294,7 +319,7 @@ def password_reset_confirm(request):
 @permission_classes([IsAuthenticated])
 def update_profile(request):
     try:
-        user = request.user
+        user = get_full_user(request)
         serializer = ProfileSerializer(
             user,
             data=request.data,
@@ -317,23 +342,50 @@ def update_profile(request):
 @permission_classes([IsAuthenticated])
 def upload_avatar(request):
     try:
-        user = request.user
+        # Declared too large: refuse without reading the body
+        if is_too_large(request.META.get('CONTENT_LENGTH')):
+            return Response(
+                {'error': f'File too large (max {AVATAR_MAX_UPLOAD_BYTES // (1024 * 1024)} MB)'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        # Stream straight to disk and stop at the size cap; must be set
+        # before request.FILES is first touched
+        upload_handler = CappedTemporaryFileUploadHandler(request._request)
+        request._request.upload_handlers = [upload_handler]
+
+        user = get_full_user(request)
         file = request.FILES.get('profile_image')
 
+        if upload_handler.too_large:
+            return Response(
+                {'error': f'File too large (max {AVATAR_MAX_UPLOAD_BYTES // (1024 * 1024)} MB)'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
         if not file:
             return Response(
                 {'error': 'No file provided'},
                 status=400
             )
 
+        error = validate_avatar(file)
+        if error:
+            return Response({'error': error}, status=400)
+
+        old_image = user.profile_image.name if user.profile_image else None
+
         user.profile_image = file
-        user.save()
+        user.thumbnail_pending = True
+        user.save(update_fields=['profile_image', 'thumbnail_pending'])
+
+        if old_image and old_image != user.profile_image.name:
+            user.profile_image.storage.delete(old_image)
 
         return Response({
             'message': 'Profile picture updated successfully',
-            'profile_image_url': request.build_absolute_uri(
-                user.profile_image.url
-            )
+            'profile_image_url': signed_media_url(request, user.profile_image.name),
+            'thumbnail_pending': True
         })
     except Exception as e:
         return Response(
@@ -1,18 +1,25 @@
 from django.contrib import admin
+from proj_expense_track.admin_utils import CSVExportMixin, DefaultShardAdminMixin, EstimatedCountPaginator
 from .models import BudgetCategory
 from .models import Budget
 
 
 @admin.register(BudgetCategory)
-class BudgetCategoryAdmin(admin.ModelAdmin):
+class BudgetCategoryAdmin(DefaultShardAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'name', 'user', 'created_at')
     search_fields = ('name', 'user__email')
-    list_filter = ('created_at',)
+    date_hierarchy = 'created_at'
+
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 
 @admin.register(Budget)
-class BudgetAdmin(admin.ModelAdmin):
+class BudgetAdmin(CSVExportMixin, DefaultShardAdminMixin, admin.ModelAdmin):
     list_display = (
         'user',
         'category',
@@ -20,6 +27,23 @@ class BudgetAdmin(admin.ModelAdmin):
         'amount',
         'created_at',
     )
-    list_filter = ('month', 'category')
+    # A `category` filter would list every user's categories
+    date_hierarchy = 'month'
     search_fields = ('user__email',)
-    ordering = ('-month',)
\ No newline at end of file
+    ordering = ('-id',)
+
+    # BudgetCategory.__str__ reads the category owner's email
+    list_select_related = ('user', 'category__user')
+    autocomplete_fields = ('user',)
+    raw_id_fields = ('category',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    csv_export_columns = (
+        ('id', 'ID'),
+        ('user__email', 'User'),
+        ('category__name', 'Category'),
+        ('month', 'Month'),
+        ('amount', 'Amount'),
+        ('created_at', 'Created at'),
+    )
\ No newline at end of file
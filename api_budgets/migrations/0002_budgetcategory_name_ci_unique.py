@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:17
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+
+def merge_case_duplicates(apps, schema_editor):
+    """
+    Fold categories whose names differ only in case ("Food" / "food") into
+    the oldest one, so the case-insensitive unique constraint can be added.
+    Budgets and expenses move to the kept category; where both had a budget
+    for the same month the kept category's budget wins. Spend stats are
+    combined (exact for count/mean/variance, the EWMA of the larger side is
+    kept; `rebuild_expense_stats` recomputes it exactly).
+    """
+    BudgetCategory = apps.get_model('api_budgets', 'BudgetCategory')
+    Budget = apps.get_model('api_budgets', 'Budget')
+    Expense = apps.get_model('api_expenses', 'Expense')
+    CategorySpendStats = apps.get_model('api_expenses', 'CategorySpendStats')
+    db = schema_editor.connection.alias
+
+    keepers = {}
+    duplicates = []
+    rows = (
+        BudgetCategory.objects.using(db)
+        .annotate(name_lower=Lower('name'))
+        .order_by('user_id', 'id')
+        .values_list('id', 'user_id', 'name_lower')
+    )
+    for category_id, user_id, name_lower in rows:
+        keeper_id = keepers.setdefault((user_id, name_lower), category_id)
+        if keeper_id != category_id:
+            duplicates.append((category_id, keeper_id))
+
+    for duplicate_id, keeper_id in duplicates:
+        taken_months = set(
+            Budget.objects.using(db).filter(category_id=keeper_id).values_list('month', flat=True)
+        )
+        Budget.objects.using(db).filter(category_id=duplicate_id).exclude(month__in=taken_months).update(category_id=keeper_id)
+        Expense.objects.using(db).filter(category_id=duplicate_id).update(category_id=keeper_id)
+
+        extra = CategorySpendStats.objects.using(db).filter(category_id=duplicate_id).first()
+        if extra is not None:
+            stats = CategorySpendStats.objects.using(db).filter(category_id=keeper_id).first()
+            if stats is None:
+                extra.category_id = keeper_id
+                extra.save(update_fields=['category'])
+            else:
+                # Chan et al. pairwise merge of the Welford accumulators
+                count = stats.count + extra.count
+                if count:
+                    delta = extra.mean - stats.mean
+                    stats.mean += delta * extra.count / count
+                    stats.m2 += extra.m2 + delta * delta * stats.count * extra.count / count
+                if extra.count > stats.count:
+                    stats.ewma, stats.ewm_var = extra.ewma, extra.ewm_var
+                stats.count = count
+                stats.save(update_fields=['count', 'mean', 'm2', 'ewma', 'ewm_var'])
+
+        # Cascades to the leftover budget months and stats row
+        BudgetCategory.objects.using(db).filter(id=duplicate_id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_budgets', '0001_initial'),
+        ('api_expenses', '0002_expense_anomaly_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_case_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='budgetcategory',
+            constraint=models.UniqueConstraint(models.F('user'), django.db.models.functions.text.Lower('name'), name='budgetcategory_user_name_ci_uniq'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='budgetcategory',
+            unique_together=set(),
+        ),
+    ]
@@ -1,17 +1,45 @@
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Lower
 from django.conf import settings
 
+
+class BudgetCategoryQuerySet(models.QuerySet):
+    def with_name(self, name):
+        """
+        Case-insensitive exact name match that can use the
+        (user, Lower(name)) unique index - unlike `name__iexact`.
+        Both sides are folded by the database, as in the index: SQLite's
+        LOWER() only folds ASCII, Python's str.lower() folds everything.
+        """
+        return self.alias(name_lower=Lower('name')).filter(name_lower=Lower(Value(name.strip())))
+
+
 class BudgetCategory(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        # The user row lives on 'default', this one on the user's shard
+        db_constraint=False,
         related_name='budget_categories'
     )
     name = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = BudgetCategoryQuerySet.as_manager()
+
     class Meta:
-        unique_together = ('user', 'name')
+        constraints = [
+            # Case-insensitive: "Food" and "food" are the same category.
+            # SQLite's LOWER() only folds ASCII, so there "Café" and "CAFÉ"
+            # stay distinct; PostgreSQL folds them by the database locale.
+            # Names are kept as typed rather than casefolded in Python.
+            models.UniqueConstraint(
+                'user',
+                Lower('name'),
+                name='budgetcategory_user_name_ci_uniq',
+            ),
+        ]
         ordering = ['name']
 
     def __str__(self):
@@ -24,6 +52,7 @@ class Budget(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_constraint=False,
         related_name='budgets'
     )
 
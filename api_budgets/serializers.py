@@ -37,7 +37,12 @@ class BudgetSerializer(serializers.ModelSerializer):
         return value
 
     def validate_month(self, value):
-        """Validate that month is in valid format and not too far in the past."""
+        """
+        Validate that month is in valid format and not too far in the past.
+        Returns the first day of the month: budgets are stored that way, and
+        the (user, category, month) unique constraint only holds if every
+        write path normalises the same.
+        """
         if isinstance(value, str):
             try:
                 value = datetime.strptime(value, '%Y-%m-%d').date()
@@ -54,10 +59,19 @@ class BudgetSerializer(serializers.ModelSerializer):
         if year_diff > 24:
             raise serializers.ValidationError("Cannot create budgets more than 24 months in the future.")
         
-        return value
+        return month_date
 
     def validate_category(self, value):
         """Validate that category exists."""
         if not value:
             raise serializers.ValidationError("Category is required.")
         return value
+
+
+class BudgetBulkItemSerializer(BudgetSerializer):
+    """
+    One row of a bulk upsert. Category is taken as a plain ID so a large
+    payload does not issue one lookup per row; ownership is checked in bulk
+    by the view.
+    """
+    category = serializers.IntegerField(min_value=1)
@@ -0,0 +1,84 @@
+"""
+Budget suggestions from rolling category averages.
+
+Monthly spend per category for the 12 months before the target month is
+loaded in one grouped query; the 3-, 6- and 12-month averages and a trend
+are derived from that in memory.
+"""
+
+import math
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+from api_expenses.models import Expense
+
+
+WINDOWS = (3, 6, 12)
+
+# Blend of the rolling averages used for the suggested amount
+WEIGHTS = {3: 0.5, 6: 0.3, 12: 0.2}
+
+ROUND_TO = 10
+
+
+def _round_up(value, step=ROUND_TO):
+    return float(math.ceil(value / step) * step) if value > 0 else 0.0
+
+
+def suggest_budgets(user, target_month, category_ids=None):
+    """
+    Return one suggestion dict per category that had spend in the
+    12 months before `target_month`, ordered by suggested amount.
+    """
+    start = target_month - relativedelta(months=max(WINDOWS))
+
+    expenses = Expense.objects.filter(
+        user=user,
+        category__isnull=False,
+        date__gte=start,
+        date__lt=target_month
+    )
+    if category_ids is not None:
+        expenses = expenses.filter(category_id__in=category_ids)
+
+    rows = (
+        expenses
+        .annotate(month=TruncMonth('date'))
+        .values('category_id', 'category__name', 'month')
+        .annotate(total=Sum('amount'))
+        .values_list('category_id', 'category__name', 'month', 'total')
+    )
+
+    # category_id -> (name, [spend for month -12 .. -1])
+    series = {}
+    for category_id, name, month, total in rows:
+        offset = (month.year - start.year) * 12 + (month.month - start.month)
+        entry = series.setdefault(category_id, (name, [0.0] * max(WINDOWS)))
+        entry[1][offset] += float(total)
+
+    suggestions = []
+    for category_id, (name, monthly) in series.items():
+        averages = {w: sum(monthly[-w:]) / w for w in WINDOWS}
+
+        # Trend: recent quarter relative to the full year
+        trend_percent = round(
+            (averages[3] - averages[12]) / averages[12] * 100, 2
+        ) if averages[12] > 0 else 0
+
+        blended = sum(averages[w] * WEIGHTS[w] for w in WINDOWS)
+
+        suggestions.append({
+            'category_id': category_id,
+            'category_name': name,
+            'average_3_months': round(averages[3], 2),
+            'average_6_months': round(averages[6], 2),
+            'average_12_months': round(averages[12], 2),
+            'trend_percent': trend_percent,
+            'trend': 'up' if trend_percent > 5 else 'down' if trend_percent < -5 else 'stable',
+            'suggested_amount': _round_up(blended),
+        })
+
+    suggestions.sort(key=lambda x: x['suggested_amount'], reverse=True)
+    return suggestions
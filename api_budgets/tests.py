@@ -1,3 +1,229 @@
-from django.test import TestCase
+import math
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from api_expenses.models import Expense
+from . import forecast
+from .forecast import forecast_month
+from .models import Budget, BudgetCategory
+from .suggestions import suggest_budgets
+
+
+User = get_user_model()
+
+
+class NormalTailTests(SimpleTestCase):
+
+    def test_matches_math_erfc(self):
+        z = np.linspace(-6, 6, 241)
+        expected = [0.5 * math.erfc(v / math.sqrt(2)) for v in z]
+
+        np.testing.assert_allclose(forecast._normal_sf(z), expected, atol=2e-7)
+
+    def test_known_values(self):
+        np.testing.assert_allclose(
+            forecast._normal_sf(np.array([0.0, 1.645, -1.645])), [0.5, 0.05, 0.95], atol=1e-3
+        )
+
+
+class ForecastMonthTests(TestCase):
+    month = date(2026, 3, 1)
+    today = date(2026, 3, 10)
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='forecast@example.com', username='forecast', password='S3cure-pass!'
+        )
+        self.steady = BudgetCategory.objects.create(user=self.user, name='Rent')
+        self.bumpy = BudgetCategory.objects.create(user=self.user, name='Food')
+        for day in range(10):
+            when = self.month + timedelta(days=day)
+            Expense.objects.create(user=self.user, category=self.steady, amount='10.00', date=when)
+            if day % 2:
+                Expense.objects.create(user=self.user, category=self.bumpy, amount='20.00', date=when)
+
+    def _forecast(self, budgets):
+        return forecast_month(
+            self.user, self.month, [self.steady.pk, self.bumpy.pk], budgets, self.today, lookback_days=10
+        )
+
+    def test_projection_from_daily_history(self):
+        result = self._forecast([0, 0])
+
+        self.assertEqual(result['remaining_days'], 21)
+        np.testing.assert_allclose(result['spent'], [100, 100])
+        np.testing.assert_allclose(result['mean_daily'], [10, 10])
+        np.testing.assert_allclose(result['projected'], [310, 310])
+        # No variance: no spread around the projection
+        self.assertAlmostEqual(result['projected_low'][0], result['projected_high'][0])
+        self.assertLess(result['projected_low'][1], 310)
+        self.assertGreater(result['projected_high'][1], 310)
+
+    def test_over_budget_probability(self):
+        prob = self._forecast([300, 310])['over_budget_probability']
+        # Steady spend crosses 300 for sure; the bumpy one is a coin flip
+        self.assertEqual(prob[0], 1.0)
+        self.assertAlmostEqual(prob[1], 0.5, places=6)
+
+        prob = self._forecast([50, 5000])['over_budget_probability']
+        # Already over budget, and far below it
+        self.assertEqual(prob[0], 1.0)
+        self.assertLess(prob[1], 1e-6)
+
+    def test_past_month_has_nothing_remaining(self):
+        result = forecast_month(
+            self.user, self.month, [self.steady.pk], [400], date(2026, 5, 1), lookback_days=90
+        )
+        self.assertEqual(result['remaining_days'], 0)
+        np.testing.assert_allclose(result['projected'], [100])
+        self.assertEqual(result['over_budget_probability'][0], 0.0)
+
+
+class SuggestBudgetsTests(TestCase):
+    target = date(2026, 3, 1)
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='suggest@example.com', username='suggest', password='S3cure-pass!'
+        )
+        self.steady = BudgetCategory.objects.create(user=self.user, name='Rent')
+        self.rising = BudgetCategory.objects.create(user=self.user, name='Travel')
+        for back in range(1, 13):
+            month = self.target - relativedelta(months=back)
+            Expense.objects.create(user=self.user, category=self.steady, amount='100.00', date=month)
+            if back <= 3:
+                Expense.objects.create(user=self.user, category=self.rising, amount='300.00', date=month)
+        # Outside the 12-month window
+        Expense.objects.create(
+            user=self.user, category=self.steady, amount='999.00', date=self.target - relativedelta(months=13)
+        )
+
+    def test_rolling_averages_and_trend(self):
+        with self.assertNumQueries(1):
+            suggestions = suggest_budgets(self.user, self.target)
+
+        rising, steady = suggestions
+        self.assertEqual(rising['category_id'], self.rising.pk)
+        self.assertEqual(
+            (rising['average_3_months'], rising['average_6_months'], rising['average_12_months']),
+            (300, 150, 75)
+        )
+        self.assertEqual((rising['trend_percent'], rising['trend']), (300, 'up'))
+        # 0.5 * 300 + 0.3 * 150 + 0.2 * 75
+        self.assertEqual(rising['suggested_amount'], 210)
+
+        self.assertEqual((steady['trend'], steady['suggested_amount']), ('stable', 100))
+
+    def test_apply_skips_existing_budgets(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        month = date.today().replace(day=1)
+        Expense.objects.create(
+            user=self.user, category=self.rising, amount='55.00', date=month - relativedelta(months=1)
+        )
+        Expense.objects.create(
+            user=self.user, category=self.steady, amount='40.00', date=month - relativedelta(months=1)
+        )
+        Budget.objects.create(user=self.user, category=self.steady, month=month, amount='1.00')
+
+        response = client.post('/api/budgets/suggestions/apply/', {'month': f'{month:%Y-%m}'}, format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((response.data['created_count'], response.data['skipped_count']), (1, 1))
+        self.assertEqual(Budget.objects.get(category=self.steady, month=month).amount, Decimal('1.00'))
+        self.assertTrue(Budget.objects.filter(category=self.rising, month=month).exists())
+
+
+class BulkBudgetTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='bulk@example.com', username='bulk', password='S3cure-pass!'
+        )
+        self.food = BudgetCategory.objects.create(user=self.user, name='Food')
+        self.rent = BudgetCategory.objects.create(user=self.user, name='Rent')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.month = date.today().replace(day=1)
+
+    def _upsert(self, budgets):
+        return self.client.post('/api/budgets/budgets/bulk-upsert/', {'budgets': budgets}, format='json')
+
+    def _amounts(self):
+        return dict(
+            ((category_id, month), str(amount))
+            for category_id, month, amount in Budget.objects.values_list('category_id', 'month', 'amount')
+        )
+
+    def test_upsert_inserts_then_updates(self):
+        month = f'{self.month:%Y-%m-%d}'
+        self.assertEqual(self._upsert([
+            {'category': self.food.pk, 'month': month, 'amount': '100.00'},
+            {'category': self.rent.pk, 'month': month, 'amount': '900.00'},
+        ]).status_code, 200)
+
+        response = self._upsert([
+            {'category': self.food.pk, 'month': month, 'amount': '150.00'},
+            {'category': self.food.pk, 'month': month, 'amount': '175.00'},
+        ])
+
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(self._amounts(), {
+            (self.food.pk, self.month): '175.00',
+            (self.rent.pk, self.month): '900.00',
+        })
+
+    def test_upsert_rejects_foreign_categories(self):
+        other = User.objects.create_user(email='other@example.com', username='other', password='S3cure-pass!')
+        theirs = BudgetCategory.objects.create(user=other, name='Theirs')
+
+        response = self._upsert([
+            {'category': self.food.pk, 'month': f'{self.month:%Y-%m-%d}', 'amount': '10.00'},
+            {'category': theirs.pk, 'month': f'{self.month:%Y-%m-%d}', 'amount': '10.00'},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['details'], {'category_ids': [theirs.pk]})
+        self.assertFalse(Budget.objects.exists())
+
+    def test_create_and_upsert_share_the_month_key(self):
+        mid_month = f'{self.month.replace(day=15):%Y-%m-%d}'
+        response = self.client.post('/api/budgets/budgets/create/', {
+            'category': self.food.pk, 'month': mid_month, 'amount': '100.00'
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['data']['month'], f'{self.month:%Y-%m-%d}')
+
+        self._upsert([{'category': self.food.pk, 'month': mid_month, 'amount': '120.00'}])
+        duplicate = self.client.post('/api/budgets/budgets/create/', {
+            'category': self.food.pk, 'month': f'{self.month.replace(day=2):%Y-%m-%d}', 'amount': '1.00'
+        }, format='json')
+
+        self.assertEqual(duplicate.status_code, 400)
+        self.assertEqual(self._amounts(), {(self.food.pk, self.month): '120.00'})
+
+    def test_copy_to_range_keeps_or_overwrites_existing(self):
+        source = self.month
+        first, last = source + relativedelta(months=1), source + relativedelta(months=3)
+        Budget.objects.create(user=self.user, category=self.food, month=source, amount='100.00')
+        Budget.objects.create(user=self.user, category=self.rent, month=source, amount='900.00')
+        Budget.objects.create(user=self.user, category=self.food, month=first, amount='5.00')
+        url = f'/api/budgets/budgets/copy/?from={source:%Y-%m}&to={first:%Y-%m}..{last:%Y-%m}'
+
+        response = self.client.post(url)
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(response.data['to']), 3)
+        self.assertEqual(Budget.objects.count(), 8)
+        self.assertEqual(self._amounts()[(self.food.pk, first)], '5.00')
+
+        self.client.post(url + '&overwrite=true')
+
+        self.assertEqual(Budget.objects.count(), 8)
+        self.assertEqual(self._amounts()[(self.food.pk, first)], '100.00')
@@ -10,7 +10,14 @@ urlpatterns = [
     # Budgets
     path('budgets/', views.list_budgets),
     path('budgets/create/', views.create_budget),
+    path('budgets/bulk-upsert/', views.bulk_upsert_budgets),
+    path('budgets/copy/', views.copy_budgets),
     path('budgets/<int:pk>/update/', views.update_budget),
     path('budgets/<int:pk>/delete/', views.delete_budget),
     path('budgets/utilization/', views.budget_utilization),
+    path('budgets/forecast/', views.budget_forecast),
+
+    # Suggestions
+    path('suggestions/', views.budget_suggestions),
+    path('suggestions/apply/', views.apply_budget_suggestions),
 ]
\ No newline at end of file
@@ -1,20 +1,26 @@
 """
 Budget API Views - Complete Implementation
-Includes: Categories CRUD + Monthly Budgets CRUD + Utilization
+Includes: Categories CRUD + Monthly Budgets CRUD + Bulk Upsert/Copy + Utilization
+          + Forecast + Suggestions
 """
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import status, serializers
+from django.db import IntegrityError, transaction
 from django.db.models import Sum
 from django.utils import timezone
 from datetime import datetime
+from dateutil.relativedelta import relativedelta
 from decimal import Decimal
 
 from .models import BudgetCategory, Budget
-from .serializers import BudgetCategorySerializer, BudgetSerializer
+from .serializers import BudgetCategorySerializer, BudgetSerializer, BudgetBulkItemSerializer
+from .forecast import forecast_month, DEFAULT_LOOKBACK_DAYS
+from .suggestions import suggest_budgets
 from api_expenses.models import Expense
+from proj_expense_track.sharding import current_shard
 
 
 # ==================== BUDGET CATEGORY ENDPOINTS ====================
@@ -52,16 +58,16 @@ def create_category(request):
                 'message': 'Validation failed'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Check if category already exists for this user
-        name = serializer.validated_data['name']
-        if BudgetCategory.objects.filter(user=request.user, name__iexact=name).exists():
+        # Duplicate names (case-insensitive) are rejected by the unique index
+        try:
+            with transaction.atomic(using=current_shard()):
+                category = serializer.save(user=request.user)
+        except IntegrityError:
             return Response({
                 'error': 'A category with this name already exists',
                 'message': 'Duplicate category'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        category = serializer.save(user=request.user)
-        
         return Response({
             'message': 'Category created successfully',
             'data': BudgetCategorySerializer(category).data
@@ -102,19 +108,15 @@ def update_category(request, pk):
                 'message': 'Validation failed'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Check for duplicate name (excluding current category)
-        if 'name' in request.data:
-            name = serializer.validated_data['name']
-            if BudgetCategory.objects.filter(
-                user=request.user,
-                name__iexact=name
-            ).exclude(pk=pk).exists():
-                return Response({
-                    'error': 'A category with this name already exists',
-                    'message': 'Duplicate category'
-                }, status=status.HTTP_400_BAD_REQUEST)
-        
-        serializer.save()
+        # Duplicate names (case-insensitive) are rejected by the unique index
+        try:
+            with transaction.atomic(using=current_shard()):
+                serializer.save()
+        except IntegrityError:
+            return Response({
+                'error': 'A category with this name already exists',
+                'message': 'Duplicate category'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'message': 'Category updated successfully',
@@ -251,22 +253,17 @@ def create_budget(request):
                 'message': 'Invalid category'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Check for duplicate budget (same user, category, month)
-        month = serializer.validated_data['month']
-        category = serializer.validated_data['category']
-        
-        if Budget.objects.filter(
-            user=request.user,
-            category=category,
-            month=month
-        ).exists():
+        # Duplicate budget (same user, category, month) is enforced by the
+        # unique constraint - no check-then-insert race
+        try:
+            with transaction.atomic(using=current_shard()):
+                budget = serializer.save(user=request.user)
+        except IntegrityError:
             return Response({
                 'error': 'Budget already exists for this category and month',
                 'message': 'Duplicate budget'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        budget = serializer.save(user=request.user)
-        
         return Response({
             'message': 'Budget created successfully',
             'data': BudgetSerializer(budget).data
@@ -359,6 +356,199 @@ def delete_budget(request, pk):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# ==================== BULK BUDGET ENDPOINTS ====================
+
+MAX_BULK_BUDGETS = 500
+MAX_COPY_MONTHS = 24
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_upsert_budgets(request):
+    """
+    Create or update many budgets in one statement.
+    Rows are keyed on (user, category, month); existing rows get the new amount.
+
+    Body: {"budgets": [{"category": 1, "month": "2026-10-01", "amount": "500.00"}, ...]}
+    """
+    try:
+        items = request.data.get('budgets') if isinstance(request.data, dict) else request.data
+
+        if not isinstance(items, list) or not items:
+            return Response({
+                'error': 'budgets must be a non-empty list',
+                'message': 'Validation failed'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(items) > MAX_BULK_BUDGETS:
+            return Response({
+                'error': f'At most {MAX_BULK_BUDGETS} budgets per request',
+                'message': 'Validation failed'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = BudgetBulkItemSerializer(data=items, many=True)
+        if not serializer.is_valid():
+            return Response({
+                'error': serializer.errors,
+                'message': 'Validation failed'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Verify every category belongs to user (one query)
+        category_ids = {row['category'] for row in serializer.validated_data}
+        owned = set(
+            BudgetCategory.objects.filter(
+                id__in=category_ids,
+                user=request.user
+            ).values_list('id', flat=True)
+        )
+        if owned != category_ids:
+            return Response({
+                'error': 'Category not found or does not belong to you',
+                'message': 'Invalid category',
+                'details': {'category_ids': sorted(category_ids - owned)}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Last row wins when the payload repeats a (category, month) pair;
+        # months are already the first of the month (see validate_month)
+        rows = {}
+        for row in serializer.validated_data:
+            rows[(row['category'], row['month'])] = Budget(
+                user=request.user,
+                category_id=row['category'],
+                month=row['month'],
+                amount=row['amount']
+            )
+
+        Budget.objects.bulk_create(
+            list(rows.values()),
+            update_conflicts=True,
+            unique_fields=['user', 'category', 'month'],
+            update_fields=['amount']
+        )
+
+        return Response({
+            'message': 'Budgets saved successfully',
+            'count': len(rows)
+        })
+
+    except Exception as e:
+        return Response({
+            'error': str(e),
+            'message': 'Failed to save budgets'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def copy_budgets(request):
+    """
+    Copy one month's budgets to a month or a range of months.
+
+    Query Parameters:
+    - from: YYYY-MM source month
+    - to: YYYY-MM or YYYY-MM..YYYY-MM target range (inclusive)
+    - overwrite: true/false (default: false) - replace existing target budgets
+    """
+    try:
+        from_param = request.GET.get('from', '').strip()
+        to_param = request.GET.get('to', '').strip()
+
+        if not from_param or not to_param:
+            return Response({
+                'error': 'Both "from" and "to" parameters are required',
+                'message': 'Invalid parameter'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            source_month = datetime.strptime(from_param, '%Y-%m').date()
+            range_start, _, range_end = to_param.partition('..')
+            first_month = datetime.strptime(range_start, '%Y-%m').date()
+            last_month = datetime.strptime(range_end or range_start, '%Y-%m').date()
+        except ValueError:
+            return Response({
+                'error': 'Invalid month format. Use YYYY-MM or YYYY-MM..YYYY-MM',
+                'message': 'Invalid parameter'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if first_month > last_month:
+            return Response({
+                'error': 'Start of range must be before or equal to end of range',
+                'message': 'Invalid parameter'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        target_months = []
+        month = first_month
+        while month <= last_month:
+            if month != source_month:
+                target_months.append(month)
+            month += relativedelta(months=1)
+
+        if len(target_months) > MAX_COPY_MONTHS:
+            return Response({
+                'error': f'At most {MAX_COPY_MONTHS} target months per request',
+                'message': 'Invalid parameter'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Same window as single budget creation
+        try:
+            for month in target_months:
+                BudgetSerializer().validate_month(month)
+        except serializers.ValidationError as e:
+            return Response({
+                'error': e.detail,
+                'message': 'Invalid target month'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        source = list(
+            Budget.objects.filter(
+                user=request.user,
+                month=source_month
+            ).values_list('category_id', 'amount')
+        )
+
+        if not source:
+            return Response({
+                'error': 'No budgets found for the source month',
+                'message': 'Nothing to copy'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        overwrite = request.GET.get('overwrite', 'false').lower() == 'true'
+        new_budgets = [
+            Budget(
+                user=request.user,
+                category_id=category_id,
+                month=month,
+                amount=amount
+            )
+            for month in target_months
+            for category_id, amount in source
+        ]
+
+        if overwrite:
+            Budget.objects.bulk_create(
+                new_budgets,
+                update_conflicts=True,
+                unique_fields=['user', 'category', 'month'],
+                update_fields=['amount']
+            )
+        else:
+            Budget.objects.bulk_create(new_budgets, ignore_conflicts=True)
+
+        return Response({
+            'message': 'Budgets copied successfully',
+            'from': source_month.strftime('%Y-%m'),
+            'to': [m.strftime('%Y-%m') for m in target_months],
+            'categories_count': len(source),
+            'overwrite': overwrite
+        }, status=status.HTTP_201_CREATED)
+
+    except Exception as e:
+        return Response({
+            'error': str(e),
+            'message': 'Failed to copy budgets'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 # ==================== BUDGET UTILIZATION ENDPOINT ====================
 
 @api_view(['GET'])
@@ -471,4 +661,255 @@ def budget_utilization(request):
         return Response({
             'error': str(e),
             'message': 'Failed to retrieve budget utilization'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# ==================== BUDGET FORECAST ENDPOINT ====================
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def budget_forecast(request):
+    """
+    Project month-end spend and over-budget probability per category.
+    All categories are computed together from one grouped daily-spend query.
+
+    Query Parameters:
+    - month: YYYY-MM format (default: current month)
+    - lookback_days: days of history used for the daily rate (default: 90, max: 730)
+    """
+    try:
+        user = request.user
+
+        month_param = request.GET.get('month', '').strip()
+        if month_param:
+            try:
+                target_month = datetime.strptime(month_param, '%Y-%m').date().replace(day=1)
+            except ValueError:
+                return Response({
+                    'error': 'Invalid month format. Use YYYY-MM',
+                    'message': 'Invalid parameter'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            target_month = timezone.now().date().replace(day=1)
+
+        try:
+            lookback_days = int(request.GET.get('lookback_days', DEFAULT_LOOKBACK_DAYS))
+            if lookback_days < 7 or lookback_days > 730:
+                raise ValueError
+        except ValueError:
+            return Response({
+                'error': 'lookback_days must be an integer between 7 and 730',
+                'message': 'Invalid parameter'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        categories = list(
+            BudgetCategory.objects.filter(user=user).order_by('name').values_list('id', 'name')
+        )
+        budget_by_category = dict(
+            Budget.objects.filter(user=user, month=target_month).values_list('category_id', 'amount')
+        )
+
+        category_ids = [cid for cid, _ in categories]
+        result = forecast_month(
+            user,
+            target_month,
+            category_ids,
+            [float(budget_by_category.get(cid, 0)) for cid in category_ids],
+            timezone.now().date(),
+            lookback_days=lookback_days
+        )
+
+        forecast_data = []
+        for i, (category_id, name) in enumerate(categories):
+            budget = budget_by_category.get(category_id)
+            projected = round(float(result['projected'][i]), 2)
+
+            # Skip categories with no budget and no spend in the window
+            if budget is None and projected == 0 and result['spent'][i] == 0:
+                continue
+
+            forecast_data.append({
+                'category_id': category_id,
+                'category_name': name,
+                'budget': float(budget) if budget is not None else None,
+                'spent': round(float(result['spent'][i]), 2),
+                'average_daily_spend': round(float(result['mean_daily'][i]), 2),
+                'projected_spend': projected,
+                'projected_range': [
+                    round(float(result['projected_low'][i]), 2),
+                    round(float(result['projected_high'][i]), 2),
+                ],
+                'over_budget_probability': round(
+                    float(result['over_budget_probability'][i]), 4
+                ) if budget is not None else None,
+            })
+
+        forecast_data.sort(
+            key=lambda x: x['over_budget_probability'] or 0, reverse=True
+        )
+
+        total_budget = sum(float(v) for v in budget_by_category.values())
+        total_projected = round(sum(d['projected_spend'] for d in forecast_data), 2)
+
+        return Response({
+            'message': 'Budget forecast retrieved successfully',
+            'month': target_month.strftime('%Y-%m'),
+            'month_name': target_month.strftime('%B %Y'),
+            'as_of': result['as_of'].isoformat(),
+            'remaining_days': result['remaining_days'],
+            'lookback_days': lookback_days,
+            'summary': {
+                'total_budget': total_budget,
+                'total_spent': round(sum(d['spent'] for d in forecast_data), 2),
+                'total_projected': total_projected,
+                'projected_remaining': round(total_budget - total_projected, 2),
+                'at_risk_count': len([
+                    d for d in forecast_data
+                    if (d['over_budget_probability'] or 0) >= 0.5
+                ])
+            },
+            'data': forecast_data
+        })
+
+    except Exception as e:
+        return Response({
+            'error': str(e),
+            'message': 'Failed to retrieve budget forecast'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# ==================== BUDGET SUGGESTION ENDPOINTS ====================
+
+def _parse_suggestion_month(value):
+    """Parse YYYY-MM (default: current month) into the first day of the month."""
+    if value:
+        return datetime.strptime(value, '%Y-%m').date().replace(day=1)
+    return timezone.now().date().replace(day=1)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def budget_suggestions(request):
+    """
+    Suggest a budget per category from 3-, 6- and 12-month rolling averages.
+
+    Query Parameters:
+    - month: YYYY-MM format (default: current month)
+    """
+    try:
+        try:
+            target_month = _parse_suggestion_month(request.GET.get('month', '').strip())
+        except ValueError:
+            return Response({
+                'error': 'Invalid month format. Use YYYY-MM',
+                'message': 'Invalid parameter'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        suggestions = suggest_budgets(request.user, target_month)
+
+        existing = dict(
+            Budget.objects.filter(
+                user=request.user,
+                month=target_month
+            ).values_list('category_id', 'amount')
+        )
+        for item in suggestions:
+            current = existing.get(item['category_id'])
+            item['current_budget'] = float(current) if current is not None else None
+
+        return Response({
+            'message': 'Budget suggestions retrieved successfully',
+            'month': target_month.strftime('%Y-%m'),
+            'month_name': target_month.strftime('%B %Y'),
+            'count': len(suggestions),
+            'total_suggested': sum(item['suggested_amount'] for item in suggestions),
+            'data': suggestions
+        })
+
+    except Exception as e:
+        return Response({
+            'error': str(e),
+            'message': 'Failed to retrieve budget suggestions'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def apply_budget_suggestions(request):
+    """
+    Create budgets from the current suggestions in one bulk insert.
+    Categories that already have a budget for the month are left untouched.
+
+    Body:
+    - month: YYYY-MM format (default: current month)
+    - categories: optional list of category IDs to limit the apply to
+    """
+    try:
+        try:
+            target_month = _parse_suggestion_month(str(request.data.get('month', '')).strip())
+        except ValueError:
+            return Response({
+                'error': 'Invalid month format. Use YYYY-MM',
+                'message': 'Invalid parameter'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            BudgetSerializer().validate_month(target_month)
+        except serializers.ValidationError as e:
+            return Response({
+                'error': e.detail,
+                'message': 'Invalid month'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        category_ids = request.data.get('categories')
+        if category_ids is not None:
+            if not isinstance(category_ids, list):
+                return Response({
+                    'error': 'categories must be a list of category IDs',
+                    'message': 'Invalid parameter'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                category_ids = [int(cid) for cid in category_ids]
+            except (TypeError, ValueError):
+                return Response({
+                    'error': 'Category IDs must be valid integers',
+                    'message': 'Invalid parameter'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Suggestions only cover categories with the user's own expenses
+        suggestions = [
+            item for item in suggest_budgets(request.user, target_month, category_ids)
+            if item['suggested_amount'] > 0
+        ]
+
+        existing = set(
+            Budget.objects.filter(
+                user=request.user,
+                month=target_month
+            ).values_list('category_id', flat=True)
+        )
+
+        Budget.objects.bulk_create([
+            Budget(
+                user=request.user,
+                category_id=item['category_id'],
+                month=target_month,
+                amount=Decimal(str(item['suggested_amount']))
+            )
+            for item in suggestions
+        ], ignore_conflicts=True)
+
+        created = [item for item in suggestions if item['category_id'] not in existing]
+
+        return Response({
+            'message': 'Budget suggestions applied successfully',
+            'month': target_month.strftime('%Y-%m'),
+            'created_count': len(created),
+            'skipped_count': len(suggestions) - len(created),
+            'data': created
+        }, status=status.HTTP_201_CREATED)
+
+    except Exception as e:
+        return Response({
+            'error': str(e),
+            'message': 'Failed to apply budget suggestions'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1,15 +1,73 @@
 from django.contrib import admin
-from .models import Expense
+from proj_expense_track.admin_utils import CSVExportMixin, DefaultShardAdminMixin, EstimatedCountPaginator
+from .models import Expense, CategorySpendStats, ReceiptAttachment, ReceiptBlob, ReceiptUpload
 
 @admin.register(Expense)
-class ExpenseAdmin(admin.ModelAdmin):
+class ExpenseAdmin(CSVExportMixin, DefaultShardAdminMixin, admin.ModelAdmin):
     list_display = (
         'id',
         'user',
         'amount',
         'notes',
         'date',
+        'is_anomalous',
         'created_at',
     )
-    list_filter = ('date', 'notes')
-    search_fields = ('user__email', 'notes')
\ No newline at end of file
+    # Low-cardinality filters only: a filter on `notes` lists every distinct note
+    list_filter = ('expense_type', 'is_anomalous', 'is_recurring')
+    date_hierarchy = 'date'
+    search_fields = ('user__email', 'notes')
+
+    list_select_related = ('user',)
+    raw_id_fields = ('user', 'category')
+    # Primary-key order pages without sorting the table
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    csv_export_columns = (
+        ('id', 'ID'),
+        ('user__email', 'User'),
+        ('date', 'Date'),
+        ('amount', 'Amount'),
+        ('category__name', 'Category'),
+        ('expense_type', 'Type'),
+        ('notes', 'Notes'),
+        ('is_recurring', 'Recurring'),
+        ('is_anomalous', 'Anomalous'),
+        ('created_at', 'Created at'),
+    )
+
+
+@admin.register(CategorySpendStats)
+class CategorySpendStatsAdmin(DefaultShardAdminMixin, admin.ModelAdmin):
+    list_display = ('user', 'category', 'count', 'mean', 'ewma', 'updated_at')
+    search_fields = ('user__email', 'category__name')
+    list_select_related = ('user', 'category__user')
+    raw_id_fields = ('user', 'category')
+    readonly_fields = ('count', 'mean', 'm2', 'ewma', 'ewm_var', 'updated_at')
+
+
+class ReceiptAttachmentInline(admin.TabularInline):
+    model = ReceiptAttachment
+    fk_name = 'blob'
+    extra = 0
+    raw_id_fields = ('expense',)
+    readonly_fields = ('filename', 'created_at')
+
+
+@admin.register(ReceiptBlob)
+class ReceiptBlobAdmin(DefaultShardAdminMixin, admin.ModelAdmin):
+    list_display = ('sha256', 'content_type', 'size', 'ref_count', 'thumbnail_pending', 'created_at')
+    list_filter = ('content_type', 'thumbnail_pending')
+    search_fields = ('sha256',)
+    readonly_fields = ('sha256', 'file', 'size', 'content_type', 'ref_count', 'thumbnail', 'created_at')
+    inlines = [ReceiptAttachmentInline]
+
+
+@admin.register(ReceiptUpload)
+class ReceiptUploadAdmin(DefaultShardAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'user', 'expense', 'filename', 'size', 'created_at', 'expires_at')
+    search_fields = ('user__email', 'filename')
+    list_select_related = ('user', 'expense__user')
+    raw_id_fields = ('user', 'expense')
@@ -0,0 +1,169 @@
+"""
+Incremental anomaly detection for expenses.
+
+Each (user, category) pair keeps a CategorySpendStats row with Welford
+accumulators (all-time mean/variance) and an EWMA mean/variance (recent
+behaviour). Every create/update/delete adjusts that row in O(1), and a new
+amount is scored against the statistics as they were *before* it was added.
+Observations are folded in the order the expenses were added (by id), both
+live and in `rebuild_expense_stats`, so a rebuild reproduces the EWMA.
+
+Standard deviations are floored at EXPENSE_ANOMALY_STD_FLOOR times the mean
+(and at least one cent): a category with a constant history still flags an
+amount far from it.
+
+Note: the EWMA cannot be un-applied exactly, so deletes only roll back the
+Welford accumulators. `rebuild_expense_stats` recomputes everything from
+history when exact values are needed.
+"""
+
+import math
+
+from django.conf import settings
+from django.db import router, transaction
+
+from .models import CategorySpendStats
+
+
+MIN_SAMPLES = getattr(settings, 'EXPENSE_ANOMALY_MIN_SAMPLES', 5)
+Z_THRESHOLD = getattr(settings, 'EXPENSE_ANOMALY_Z_THRESHOLD', 3.0)
+EWMA_ALPHA = getattr(settings, 'EXPENSE_ANOMALY_EWMA_ALPHA', 0.3)
+STD_FLOOR = getattr(settings, 'EXPENSE_ANOMALY_STD_FLOOR', 0.05)
+MIN_STD = 0.01
+
+
+# ==================== PURE STATISTICS HELPERS ====================
+
+def welford_add(count, mean, m2, x):
+    """Add one observation to Welford accumulators."""
+    count += 1
+    delta = x - mean
+    mean += delta / count
+    m2 += delta * (x - mean)
+    return count, mean, m2
+
+
+def welford_remove(count, mean, m2, x):
+    """Remove one previously added observation from Welford accumulators."""
+    if count <= 1:
+        return 0, 0.0, 0.0
+    new_count = count - 1
+    new_mean = (count * mean - x) / new_count
+    m2 -= (x - new_mean) * (x - mean)
+    return new_count, new_mean, max(m2, 0.0)
+
+
+def ewma_add(count, ewma, ewm_var, x, alpha=EWMA_ALPHA):
+    """Fold one observation into the exponentially weighted mean/variance."""
+    if count == 0:
+        return x, 0.0
+    diff = x - ewma
+    incr = alpha * diff
+    return ewma + incr, (1 - alpha) * (ewm_var + diff * incr)
+
+
+def score(count, mean, m2, ewma, ewm_var, x):
+    """
+    Return (anomaly_score, is_anomalous) for amount x.
+    Score is the larger of the z-scores against the all-time and the
+    recent (EWMA) distribution. No score until MIN_SAMPLES are seen.
+    """
+    if count < MIN_SAMPLES:
+        return None, False
+
+    std = math.sqrt(m2 / (count - 1)) if count > 1 else 0.0
+    ewm_std = math.sqrt(ewm_var)
+    # A flat history has no spread; without a floor nothing would ever stand out
+    floor = max(abs(mean) * STD_FLOOR, MIN_STD)
+
+    z = round(max(
+        abs(x - mean) / max(std, floor),
+        abs(x - ewma) / max(ewm_std, floor),
+    ), 4)
+    return z, z >= Z_THRESHOLD
+
+
+# ==================== STATS ROW UPDATES ====================
+
+def _locked_stats(user_id, category_id, using):
+    stats, _ = CategorySpendStats.objects.using(using).select_for_update().get_or_create(
+        user_id=user_id,
+        category_id=category_id
+    )
+    return stats
+
+
+def lock_stats(user_id, category_ids, using):
+    """
+    Lock the existing stats rows of several categories in id order, so
+    edits moving expenses between the same categories cannot deadlock.
+    Call inside a transaction.
+    """
+    category_ids = sorted({c for c in category_ids if c})
+    if len(category_ids) > 1:
+        list(
+            CategorySpendStats.objects.using(using).select_for_update()
+            .filter(user_id=user_id, category_id__in=category_ids)
+            .order_by('category_id').values_list('pk', flat=True)
+        )
+
+
+def add_to_stats(expense, using=None):
+    """
+    Score the expense against current stats, then fold it in.
+    `using` is the database the expense is written to (its user's shard).
+    """
+    if not expense.category_id:
+        expense.anomaly_score, expense.is_anomalous = None, False
+        return
+
+    using = using or router.db_for_write(CategorySpendStats, instance=expense)
+    with transaction.atomic(using=using):
+        stats = _locked_stats(expense.user_id, expense.category_id, using)
+        _fold(stats, expense)
+        stats.save(update_fields=['count', 'mean', 'm2', 'ewma', 'ewm_var', 'updated_at'])
+
+
+def replace_in_stats(expense, old_amount, using=None):
+    """
+    Amount changed within the same category: take the old amount out, score
+    and add the new one, with a single write to the stats row.
+    """
+    using = using or router.db_for_write(CategorySpendStats, instance=expense)
+    with transaction.atomic(using=using):
+        stats = _locked_stats(expense.user_id, expense.category_id, using)
+        stats.count, stats.mean, stats.m2 = welford_remove(
+            stats.count, stats.mean, stats.m2, float(old_amount)
+        )
+        _fold(stats, expense)
+        stats.save(update_fields=['count', 'mean', 'm2', 'ewma', 'ewm_var', 'updated_at'])
+
+
+def _fold(stats, expense):
+    """Score the expense against `stats`, then add it to them."""
+    x = float(expense.amount)
+    expense.anomaly_score, expense.is_anomalous = score(
+        stats.count, stats.mean, stats.m2, stats.ewma, stats.ewm_var, x
+    )
+    stats.ewma, stats.ewm_var = ewma_add(stats.count, stats.ewma, stats.ewm_var, x)
+    stats.count, stats.mean, stats.m2 = welford_add(stats.count, stats.mean, stats.m2, x)
+
+
+def remove_from_stats(user_id, category_id, amount, using=None):
+    """Roll one amount back out of the Welford accumulators."""
+    if not category_id:
+        return
+
+    using = using or router.db_for_write(CategorySpendStats)
+    with transaction.atomic(using=using):
+        stats = CategorySpendStats.objects.using(using).select_for_update().filter(
+            user_id=user_id,
+            category_id=category_id
+        ).first()
+        if not stats:
+            return
+
+        stats.count, stats.mean, stats.m2 = welford_remove(
+            stats.count, stats.mean, stats.m2, float(amount)
+        )
+        stats.save(update_fields=['count', 'mean', 'm2', 'updated_at'])
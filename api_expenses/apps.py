@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ApiExpensesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api_expenses'
+
+    def ready(self):
+        from . import signals  # noqa: F401
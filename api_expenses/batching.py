@@ -0,0 +1,244 @@
+"""
+Group commit for expense inserts.
+
+SQLite has a single writer and every `create_expense` is its own
+transaction, so under load each request pays for its own lock round trip
+and WAL sync. With EXPENSE_WRITE_COALESCING on, concurrent creates within
+one process are handed to a writer thread that waits up to
+EXPENSE_WRITE_MAX_DELAY_MS for company and commits up to
+EXPENSE_WRITE_BATCH_SIZE of them in one transaction.
+
+Every write runs in its own savepoint, so one failing insert does not take
+the rest of the batch with it: each caller gets back its own object or its
+own exception, exactly as if it had written directly. Errors that only
+surface at COMMIT (SQLite checks foreign keys there) roll back the whole
+batch; its writes are then retried one transaction each, so submitted
+callables must be safe to run again.
+
+Writes carry the database they belong to (the user's shard); a batch is
+committed as one transaction per database. Each of those transactions runs
+in a fresh `contextvars.Context`, so router and shard state set by one
+batch never leaks into the next; the calling request is marked as having
+written (read-your-writes) on its own thread.
+
+A caller waits at most EXPENSE_WRITE_TIMEOUT_SECONDS for its write. A write
+still queued by then is dropped and the caller gets `WriteTimeout`; a dead
+writer thread is replaced on the next submit.
+"""
+
+import contextvars
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from proj_expense_track.routers import mark_wrote
+from proj_expense_track.sharding import current_shard, use_shard
+
+
+class WriteTimeout(Exception):
+    """The writer thread did not get to a write in time."""
+
+
+class _PendingWrite:
+    __slots__ = ('func', 'using', 'done', 'result', 'error', 'state', 'lock')
+
+    def __init__(self, func, using):
+        self.func = func
+        self.using = using
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # queued -> started, or queued -> cancelled by a caller that gave up
+        self.state = 'queued'
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.state == 'cancelled':
+                return False
+            self.state = 'started'
+            return True
+
+    def cancel(self):
+        with self.lock:
+            if self.state == 'queued':
+                self.state = 'cancelled'
+            return self.state == 'cancelled'
+
+
+class WriteCoalescer:
+    """Runs submitted write callables in shared transactions on one thread."""
+
+    def __init__(self, max_batch=64, max_delay=0.005, timeout=30):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, using=DEFAULT_DB_ALIAS):
+        """Run `func()` on database `using` in the next batch and return its result (or raise its error)."""
+        pending = _PendingWrite(func, using)
+        self._ensure_thread()
+        self._queue.put(pending)
+        if not pending.done.wait(self.timeout):
+            if pending.cancel():
+                raise WriteTimeout(f"Write not started within {self.timeout}s; it was not applied")
+            # Started: it finishes (or fails) in its batch shortly
+            if not pending.done.wait(self.timeout):
+                raise WriteTimeout(f"Write not finished within {2 * self.timeout}s; it may have been applied")
+
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def stop(self):
+        """Finish queued writes and end the writer thread."""
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+
+    def _ensure_thread(self):
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='expense-write-coalescer', daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self, first):
+        """Gather more writes until the batch is full or max_delay has passed."""
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        stop = False
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+
+        return batch, stop
+
+    def _run(self):
+        try:
+            while True:
+                first = self._queue.get()
+                if first is None:
+                    return
+                batch, stop = self._collect(first)
+                try:
+                    self._commit_batch(batch)
+                except Exception as e:
+                    # Nobody may be left waiting on a write the thread gave up on
+                    for pending in batch:
+                        if not pending.done.is_set():
+                            pending.error = pending.error or e
+                            pending.done.set()
+                if stop:
+                    return
+        finally:
+            connections.close_all()
+
+    def _commit_batch(self, batch):
+        by_alias = {}
+        for pending in batch:
+            by_alias.setdefault(pending.using, []).append(pending)
+        for using, writes in by_alias.items():
+            contextvars.Context().run(self._commit_on, writes, using)
+
+    def _commit_on(self, batch, using):
+        with use_shard(using):
+            self._commit(batch, using)
+
+    def _commit(self, batch, using):
+        try:
+            try:
+                with transaction.atomic(using=using):
+                    for pending in batch:
+                        self._apply(pending, using)
+            except Exception:
+                # The commit itself failed, so nothing was written: retry
+                # the successful writes alone to find the one that broke it
+                for pending in batch:
+                    if pending.error is not None:
+                        continue
+                    try:
+                        with transaction.atomic(using=using):
+                            self._apply(pending, using)
+                    except Exception as e:
+                        pending.result = None
+                        pending.error = e
+        except Exception as e:
+            # Connection-level failure
+            for pending in batch:
+                pending.result = None
+                pending.error = pending.error or e
+            connections[using].close()
+        finally:
+            for pending in batch:
+                pending.done.set()
+
+    @staticmethod
+    def _apply(pending, using):
+        if not pending.start():
+            # Its caller timed out and was told it was not applied
+            return
+        pending.result = None
+        pending.error = None
+        try:
+            with transaction.atomic(using=using):
+                pending.result = pending.func()
+        except Exception as e:
+            pending.error = e
+
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_write_coalescer():
+    """The process-wide coalescer, or None when EXPENSE_WRITE_COALESCING is off."""
+    global _coalescer
+    if not getattr(settings, 'EXPENSE_WRITE_COALESCING', False):
+        return None
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                _coalescer = WriteCoalescer(
+                    max_batch=getattr(settings, 'EXPENSE_WRITE_BATCH_SIZE', 64),
+                    max_delay=getattr(settings, 'EXPENSE_WRITE_MAX_DELAY_MS', 5) / 1000,
+                    timeout=getattr(settings, 'EXPENSE_WRITE_TIMEOUT_SECONDS', 30)
+                )
+    return _coalescer
+
+
+def run_write(func, using=None):
+    """
+    Run a write through the coalescer when it is enabled, otherwise directly.
+    `using` is the database `func` writes to (default: the current shard).
+    Callers already inside a transaction always write directly, so their
+    write stays part of it.
+    """
+    using = using or current_shard()
+    coalescer = get_write_coalescer()
+    if coalescer is None or connections[using].in_atomic_block:
+        return func()
+    # The writer thread's router state is not this request's: pin the
+    # user to the primary from here
+    mark_wrote()
+    return coalescer.submit(func, using)
@@ -0,0 +1,195 @@
+# api_expenses/management/commands/bench_db_connections.py
+# Benchmark list_expenses with per-request, persistent and pooled database connections
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api_expenses.management.commands.sqlite_stress import use_database
+from api_expenses.views import list_expenses
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve list_expenses from concurrent client threads, going through the request "
+        "start/finish signals like a real request, with a new connection per request, "
+        "persistent connections (CONN_MAX_AGE) and Django's psycopg pool (Postgres only). "
+        "Runs against a scratch database: a test database on the configured Postgres "
+        "server, or a temporary SQLite file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=4, help='Concurrent client threads (default: 4)')
+        parser.add_argument('--requests', type=int, default=250, help='Requests per client (default: 250)')
+        parser.add_argument('--expenses', type=int, default=200, help="Expenses in the user's list (default: 200)")
+
+    def handle(self, *args, **kwargs):
+        connection = connections['default']
+        vendor = connection.vendor
+        if vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f"Unsupported database vendor {vendor!r}")
+
+        # settings_dict is settings.DATABASES['default'] itself; copy before switching
+        original = dict(connection.settings_dict)
+        original_options = dict(original.get('OPTIONS', {}))
+        base_options = {k: v for k, v in original_options.items() if k != 'pool'}
+
+        modes = ['per-request', 'persistent']
+        if vendor == 'postgresql':
+            modes.append('pooled')
+
+        workdir = None
+        connection.settings_dict.update(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False, OPTIONS=dict(base_options))
+        if vendor == 'postgresql':
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        else:
+            workdir = tempfile.mkdtemp(prefix='bench_db_connections_')
+            use_database(os.path.join(workdir, 'bench.sqlite3'), base_options)
+            call_command('migrate', verbosity=0)
+
+        try:
+            user = self._seed(kwargs['expenses'])
+            results = {}
+            for mode in modes:
+                self._configure(mode, base_options, kwargs['clients'])
+                results[mode] = self._run(mode, user, kwargs)
+        finally:
+            connections['default'].close()
+            if hasattr(connections['default'], 'close_pool'):
+                connections['default'].close_pool()
+            connections['default'].settings_dict.update(CONN_MAX_AGE=0, OPTIONS=dict(base_options))
+            if vendor == 'postgresql':
+                connections['default'].creation.destroy_test_db(old_name, verbosity=0)
+            connections['default'].settings_dict.clear()
+            connections['default'].settings_dict.update(original)
+            connections['default'].settings_dict['OPTIONS'] = original_options
+            if workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\nlist_expenses on {vendor}: {kwargs['clients']} clients x {kwargs['requests']} requests"
+        ))
+        baseline = results['per-request'][0]
+        for mode, (rate, p50, p99, connects) in results.items():
+            self.stdout.write(
+                f"  {mode:11}  {rate:8.1f} req/s   p50 {p50 * 1000:6.2f} ms   "
+                f"p99 {p99 * 1000:6.2f} ms   connections opened: {connects:5}   "
+                f"{rate / baseline:4.1f}x"
+            )
+        best = max(results, key=lambda mode: results[mode][0])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {best}: {results[best][0] / baseline:.1f}x the throughput of a connection per request"
+        ))
+
+    def _configure(self, mode, base_options, clients):
+        connection = connections['default']
+        connection.close()
+        if hasattr(connection, 'close_pool'):
+            connection.close_pool()
+
+        options = dict(base_options)
+        if mode == 'pooled':
+            options['pool'] = {'min_size': clients, 'max_size': clients, 'timeout': 10}
+        connection.settings_dict.update(
+            CONN_MAX_AGE=600 if mode == 'persistent' else 0,
+            CONN_HEALTH_CHECKS=mode == 'persistent',
+            OPTIONS=options
+        )
+
+    def _seed(self, count):
+        from django.contrib.auth import get_user_model
+        from api_budgets.models import BudgetCategory
+        from api_expenses.models import Expense
+
+        user = get_user_model().objects.create_user(
+            email='bench-connections@example.com', username='bench-connections', password=None
+        )
+        category = BudgetCategory.objects.create(user=user, name='Bench')
+        today = date.today()
+        Expense.objects.bulk_create([
+            Expense(
+                user=user,
+                category=category,
+                amount=Decimal(10 + i % 90),
+                date=today - timedelta(days=i % 60),
+                notes=f'bench {i}'
+            )
+            for i in range(count)
+        ])
+        connections['default'].close()
+        return user
+
+    def _run(self, mode, user, kwargs):
+        factory = APIRequestFactory()
+        latencies = []
+        latencies_lock = threading.Lock()
+        connects = [0]
+        errors = []
+        start_gate = threading.Event()
+
+        def count_connection(sender, connection, **kw):
+            with latencies_lock:
+                connects[0] += 1
+
+        def client():
+            mine = []
+            start_gate.wait()
+            try:
+                for _ in range(kwargs['requests']):
+                    started = time.monotonic()
+                    # Django's handler fires these; they close or recycle the connection
+                    request_started.send(sender=self.__class__)
+                    request = factory.get('/api/expenses/', {'page': 1})
+                    force_authenticate(request, user=user)
+                    response = list_expenses(request)
+                    response.render()
+                    request_finished.send(sender=self.__class__)
+                    if response.status_code != 200:
+                        raise CommandError(f"list_expenses returned {response.status_code}")
+                    mine.append(time.monotonic() - started)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections['default'].close()
+            with latencies_lock:
+                latencies.extend(mine)
+
+        connection_created.connect(count_connection)
+        try:
+            threads = [threading.Thread(target=client) for _ in range(kwargs['clients'])]
+            for thread in threads:
+                thread.start()
+            started = time.monotonic()
+            start_gate.set()
+            for thread in threads:
+                thread.join()
+            elapsed = time.monotonic() - started
+        finally:
+            connection_created.disconnect(count_connection)
+
+        if errors:
+            raise CommandError(f"{mode}: {errors[0]!r}")
+
+        # With the pool, connection_created fires per checkout: report real connections
+        if mode == 'pooled':
+            connects[0] = connections['default'].pool.get_stats().get('connections_num', 0)
+
+        return len(latencies) / elapsed, _percentile(latencies, 0.5), _percentile(latencies, 0.99), connects[0]
@@ -0,0 +1,120 @@
+# api_expenses/management/commands/bench_expense_writes.py
+# Benchmark create_expense throughput with and without group commit
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api_expenses import batching
+from api_expenses.management.commands.sqlite_stress import use_database
+from api_expenses.views import create_expense
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive create_expense from concurrent client threads against a scratch SQLite "
+        "database, once writing directly and once through the write coalescer"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=32, help='Concurrent client threads (default: 32)')
+        parser.add_argument('--requests', type=int, default=50, help='Creates per client (default: 50)')
+        parser.add_argument('--batch-size', type=int, default=64, help='Coalescer batch size (default: 64)')
+        parser.add_argument('--max-delay-ms', type=float, default=5, help='Coalescer max wait (default: 5)')
+
+    def handle(self, *args, **kwargs):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError("The default database is not SQLite")
+
+        original = dict(connections['default'].settings_dict)
+        options = dict(original.get('OPTIONS', {}))
+        workdir = tempfile.mkdtemp(prefix='bench_expense_writes_')
+
+        try:
+            results = {}
+            for mode in ('direct', 'coalesced'):
+                with override_settings(
+                    EXPENSE_WRITE_COALESCING=mode == 'coalesced',
+                    EXPENSE_WRITE_BATCH_SIZE=kwargs['batch_size'],
+                    EXPENSE_WRITE_MAX_DELAY_MS=kwargs['max_delay_ms']
+                ):
+                    results[mode] = self._run(os.path.join(workdir, f'{mode}.sqlite3'), options, kwargs)
+        finally:
+            connections['default'].close()
+            connections['default'].settings_dict.update(original)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        for mode, (created, errors, elapsed) in results.items():
+            self.stdout.write(
+                f"  {mode:9}  {created / elapsed:9.1f} inserts/s   "
+                f"created: {created:6}   errors: {errors:4}   {elapsed:6.2f} s"
+            )
+
+        speedup = (results['coalesced'][0] / results['coalesced'][2]) / (results['direct'][0] / results['direct'][2])
+        self.stdout.write(self.style.SUCCESS(f"✅ Group commit: {speedup:.1f}x direct throughput"))
+
+    def _run(self, path, options, kwargs):
+        from django.contrib.auth import get_user_model
+        from api_budgets.models import BudgetCategory
+
+        # New coalescer per run so it picks up the overridden settings
+        batching._coalescer = None
+
+        use_database(path, options)
+        call_command('migrate', verbosity=0)
+        user = get_user_model().objects.create_user(
+            email='bench@example.com', username='bench', password=None
+        )
+        category = BudgetCategory.objects.create(user=user, name='Bench')
+        connections['default'].close()
+
+        factory = APIRequestFactory()
+        payload = {
+            'amount': '12.50',
+            'category': category.pk,
+            'date': date.today().isoformat(),
+            'notes': 'bench'
+        }
+        counts = {'created': 0, 'errors': 0}
+        counts_lock = threading.Lock()
+        start_gate = threading.Event()
+
+        def client():
+            created = errors = 0
+            start_gate.wait()
+            for _ in range(kwargs['requests']):
+                request = factory.post('/api/expenses/create/', payload, format='json')
+                force_authenticate(request, user=user)
+                if create_expense(request).status_code == 201:
+                    created += 1
+                else:
+                    errors += 1
+            connections.close_all()
+            with counts_lock:
+                counts['created'] += created
+                counts['errors'] += errors
+
+        threads = [threading.Thread(target=client) for _ in range(kwargs['clients'])]
+        for thread in threads:
+            thread.start()
+
+        started = time.monotonic()
+        start_gate.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        coalescer = batching.get_write_coalescer()
+        if coalescer is not None:
+            coalescer.stop()
+
+        return counts['created'], counts['errors'], elapsed
@@ -0,0 +1,76 @@
+# api_expenses/management/commands/process_receipt_thumbnails.py
+# Background worker that renders receipt thumbnails off the request path
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from api_expenses.models import ReceiptBlob
+from api_expenses.receipts import build_receipt_thumbnail
+from proj_expense_track.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    help = "Render thumbnails for newly stored image receipts (once, or continuously with --loop)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help='Receipts processed per poll (default: 20)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling instead of exiting when nothing is pending'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Seconds to sleep between polls when idle (default: 2)'
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs.get('batch_size')
+        loop = kwargs.get('loop')
+        interval = kwargs.get('interval')
+
+        processed = failed = 0
+
+        try:
+            while True:
+                # Blobs live on their owners' shards: take a batch from each
+                blobs = [
+                    blob
+                    for alias in shard_aliases()
+                    for blob in (
+                        ReceiptBlob.objects.using(alias)
+                        .filter(thumbnail_pending=True)
+                        .only('id', 'sha256', 'file')
+                        .order_by('id')[:batch_size]
+                    )
+                ]
+
+                for blob in blobs:
+                    try:
+                        build_receipt_thumbnail(blob)
+                        processed += 1
+                    except Exception as e:
+                        # Unreadable image: clear the flag so it is not retried forever
+                        ReceiptBlob.objects.using(blob._state.db).filter(pk=blob.pk).update(thumbnail_pending=False)
+                        failed += 1
+                        self.stdout.write(self.style.ERROR(f"❌ Receipt {blob.sha256[:12]}: {e}"))
+
+                if len(blobs) >= batch_size:
+                    continue
+                if not loop:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Receipt thumbnails rendered: {processed}, failed: {failed}")
+        )
@@ -0,0 +1,59 @@
+# api_expenses/management/commands/purge_receipt_uploads.py
+# Remove expired chunked receipt uploads, orphaned chunk directories and stale assembled files
+
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api_expenses.models import ReceiptUpload
+from api_expenses.receipts import (
+    ASSEMBLY_DIR, COMPLETE_CLAIM_SECONDS, UPLOADS_DIR, media_path, remove_upload_files,
+)
+from proj_expense_track.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    help = "Purge unfinished receipt uploads past their expiry (safe to run from cron)"
+
+    def handle(self, *args, **kwargs):
+        # Chunk directories are removed by the post_delete signal
+        now = timezone.now()
+        expired = sum(
+            ReceiptUpload.objects.using(alias).filter(expires_at__lte=now).delete()[0]
+            for alias in shard_aliases()
+        )
+
+        # Directories whose row is already gone (e.g. a crash between delete and cleanup)
+        orphaned = 0
+        root = media_path(UPLOADS_DIR)
+        if os.path.isdir(root):
+            names = set(os.listdir(root))
+            live = {
+                str(pk)
+                for alias in shard_aliases()
+                for pk in ReceiptUpload.objects.using(alias).values_list('pk', flat=True)
+            }
+            for name in names - live:
+                remove_upload_files(name)
+                orphaned += 1
+
+        # Assembled files left behind by a complete that crashed
+        stale_files = 0
+        root = media_path(ASSEMBLY_DIR)
+        if os.path.isdir(root):
+            cutoff = time.time() - COMPLETE_CLAIM_SECONDS
+            for name in os.listdir(root):
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        stale_files += 1
+                except FileNotFoundError:
+                    pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Purged {expired} expired uploads, {orphaned} orphaned directories "
+            f"and {stale_files} stale assembled files"
+        ))
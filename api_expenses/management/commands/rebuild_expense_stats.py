@@ -0,0 +1,120 @@
+# api_expenses/management/commands/rebuild_expense_stats.py
+# Recompute per-category running statistics and anomaly flags from history
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.contrib.auth import get_user_model
+
+from api_expenses.models import Expense, CategorySpendStats
+from api_expenses.anomalies import welford_add, ewma_add, score
+from proj_expense_track.sharding import user_shard
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-(user, category) spend statistics and anomaly scores from expense history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email',
+            type=str,
+            help='Only rebuild for this user (default: all users)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per bulk_update batch (default: 1000)'
+        )
+
+    def handle(self, *args, **kwargs):
+        email = kwargs.get('email')
+        batch_size = kwargs.get('batch_size')
+
+        if email:
+            users = User.objects.filter(email=email)
+            if not users.exists():
+                self.stdout.write(self.style.ERROR(f"❌ User with email {email} not found!"))
+                return
+        else:
+            users = User.objects.all()
+
+        total_users = 0
+        total_expenses = 0
+
+        for user_id in users.values_list('id', flat=True).iterator():
+            with user_shard(user_id) as alias:
+                total_expenses += self._rebuild_user(user_id, batch_size, alias)
+            total_users += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Rebuilt stats for {total_users} users ({total_expenses} expenses scored)"
+            )
+        )
+
+    def _rebuild_user(self, user_id, batch_size, alias):
+        """
+        Replay one user's expenses (on their shard) per category, in the
+        order they were added - the order live updates folded them in.
+        """
+        rows = (
+            Expense.objects
+            .filter(user_id=user_id, category__isnull=False)
+            .order_by('category_id', 'id')
+            .values_list('id', 'category_id', 'amount')
+            .iterator(chunk_size=batch_size)
+        )
+
+        stats_by_category = {}
+        pending = []
+        scored = 0
+
+        with transaction.atomic(using=alias):
+            for expense_id, category_id, amount in rows:
+                x = float(amount)
+                acc = stats_by_category.setdefault(category_id, [0, 0.0, 0.0, 0.0, 0.0])
+                count, mean, m2, ewma, ewm_var = acc
+
+                anomaly_score, is_anomalous = score(count, mean, m2, ewma, ewm_var, x)
+                pending.append(Expense(
+                    id=expense_id,
+                    anomaly_score=anomaly_score,
+                    is_anomalous=is_anomalous
+                ))
+
+                ewma, ewm_var = ewma_add(count, ewma, ewm_var, x)
+                count, mean, m2 = welford_add(count, mean, m2, x)
+                stats_by_category[category_id] = [count, mean, m2, ewma, ewm_var]
+
+                if len(pending) >= batch_size:
+                    Expense.objects.bulk_update(pending, ['anomaly_score', 'is_anomalous'])
+                    scored += len(pending)
+                    pending = []
+
+            if pending:
+                Expense.objects.bulk_update(pending, ['anomaly_score', 'is_anomalous'])
+                scored += len(pending)
+
+            # Uncategorized expenses are never scored
+            Expense.objects.filter(user_id=user_id, category__isnull=True).update(
+                anomaly_score=None,
+                is_anomalous=False
+            )
+
+            CategorySpendStats.objects.filter(user_id=user_id).delete()
+            CategorySpendStats.objects.bulk_create([
+                CategorySpendStats(
+                    user_id=user_id,
+                    category_id=category_id,
+                    count=count,
+                    mean=mean,
+                    m2=m2,
+                    ewma=ewma,
+                    ewm_var=ewm_var
+                )
+                for category_id, (count, mean, m2, ewma, ewm_var) in stats_by_category.items()
+            ], batch_size=batch_size)
+
+        return scored
@@ -11,6 +11,7 @@ from decimal import Decimal
 from django.contrib.auth import get_user_model
 from api_expenses.models import Expense
 from api_budgets.models import BudgetCategory, Budget
+from proj_expense_track.sharding import shard_for_user, user_shard
 
 User = get_user_model()
 
@@ -84,7 +85,8 @@ class Command(BaseCommand):
                 
                 self.stdout.write(
                     f"{idx}. {user_type} | Email: {user.email} | "
-                    f"Verified: {email_verified} | ID: {user.id}"
+                    f"Verified: {email_verified} | ID: {user.id} | "
+                    f"Shard: {shard_for_user(user.id)}"
                 )
             
             self.stdout.write(self.style.WARNING("=" * 70))
@@ -103,22 +105,24 @@ class Command(BaseCommand):
         # ═══════════════════════════════════════════════
         
         for user in users:
-            self.stdout.write(
-                self.style.SUCCESS(f"\n{'='*70}")
-            )
-            self.stdout.write(
-                self.style.SUCCESS(f"👤 Processing User: {user.email} (ID: {user.id})")
-            )
-            self.stdout.write(
-                self.style.SUCCESS(f"{'='*70}\n")
-            )
-            
-            # Clean existing data if requested
-            if clean:
-                self._clean_user_data(user)
-            
-            # Seed the data
-            self._seed_user_data(user)
+            # The user's categories, budgets and expenses all live on their shard
+            with user_shard(user.id) as alias:
+                self.stdout.write(
+                    self.style.SUCCESS(f"\n{'='*70}")
+                )
+                self.stdout.write(
+                    self.style.SUCCESS(f"👤 Processing User: {user.email} (ID: {user.id}, shard: {alias})")
+                )
+                self.stdout.write(
+                    self.style.SUCCESS(f"{'='*70}\n")
+                )
+
+                # Clean existing data if requested
+                if clean:
+                    self._clean_user_data(user)
+
+                # Seed the data
+                self._seed_user_data(user)
 
         self.stdout.write(
             self.style.SUCCESS(
@@ -198,7 +202,7 @@ class Command(BaseCommand):
             budget_month = (today + relativedelta(months=month_offset)).replace(day=1)
             
             for category_name, percentage in budget_config.items():
-                cat = BudgetCategory.objects.get(user=user, name=category_name)
+                cat = BudgetCategory.objects.with_name(category_name).get(user=user)
                 allocated_amount = (total_budget * percentage / Decimal('100')).quantize(Decimal('0.01'))
                 
                 budget, budget_created = Budget.objects.get_or_create(
@@ -0,0 +1,176 @@
+# api_expenses/management/commands/sqlite_stress.py
+# Multi-process write/read stress test for the SQLite configuration
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+
+# Python's sqlite3 defaults: rollback journal, full sync, 5 s timeout,
+# deferred transactions
+BASELINE_OPTIONS = {
+    'timeout': 5,
+    'init_command': 'PRAGMA journal_mode=DELETE;PRAGMA synchronous=FULL;',
+}
+
+
+def use_database(path, options):
+    """Point the default connection at another SQLite file (closes the current one)."""
+    connection = connections['default']
+    connection.close()
+    connection.settings_dict['NAME'] = path
+    connection.settings_dict['OPTIONS'] = dict(options)
+
+
+def _writer(path, options, user_id, category_id, deadline, results):
+    """Insert expenses one transaction each, like create_expense does."""
+    from api_expenses.models import Expense
+
+    use_database(path, options)
+    ok = locked = 0
+    latencies = []
+
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            with transaction.atomic():
+                Expense.objects.create(
+                    user_id=user_id,
+                    category_id=category_id,
+                    amount=Decimal('12.50'),
+                    date=date.today(),
+                    notes='stress'
+                )
+            ok += 1
+            latencies.append(time.monotonic() - started)
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            locked += 1
+
+    connections['default'].close()
+    results.put(('write', ok, locked, latencies))
+
+
+def _reader(path, options, user_id, deadline, results):
+    """Page through the user's expenses, like list_expenses does."""
+    from api_expenses.models import Expense
+
+    use_database(path, options)
+    ok = locked = 0
+    latencies = []
+
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            list(Expense.objects.filter(user_id=user_id).order_by('-date', '-id')[:20])
+            Expense.objects.filter(user_id=user_id).count()
+            ok += 1
+            latencies.append(time.monotonic() - started)
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            locked += 1
+
+    connections['default'].close()
+    results.put(('read', ok, locked, latencies))
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress a scratch SQLite database with concurrent writer and reader processes, "
+        "comparing SQLite defaults ('baseline') with the configured pragmas ('tuned')"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4, help='Writer processes (default: 4)')
+        parser.add_argument('--readers', type=int, default=4, help='Reader processes (default: 4)')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per run (default: 10)')
+        parser.add_argument(
+            '--mode',
+            choices=['baseline', 'tuned', 'both'],
+            default='both',
+            help='Which configuration to run (default: both)'
+        )
+
+    def handle(self, *args, **kwargs):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError("The default database is not SQLite")
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError("Needs the 'fork' start method (Linux/macOS)")
+
+        modes = ['baseline', 'tuned'] if kwargs['mode'] == 'both' else [kwargs['mode']]
+        # settings_dict is settings.DATABASES['default'] itself; copy before switching
+        original = dict(connections['default'].settings_dict)
+        tuned_options = dict(original.get('OPTIONS', {}))
+        workdir = tempfile.mkdtemp(prefix='sqlite_stress_')
+
+        try:
+            for mode in modes:
+                options = BASELINE_OPTIONS if mode == 'baseline' else tuned_options
+                self._run(mode, options, workdir, kwargs)
+        finally:
+            connections['default'].close()
+            connections['default'].settings_dict.update(original)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _run(self, mode, options, workdir, kwargs):
+        from django.contrib.auth import get_user_model
+        from api_budgets.models import BudgetCategory
+
+        path = os.path.join(workdir, f'{mode}.sqlite3')
+        use_database(path, options)
+        call_command('migrate', verbosity=0)
+
+        user = get_user_model().objects.create_user(
+            email='stress@example.com', username='stress', password=None
+        )
+        category = BudgetCategory.objects.create(user=user, name='Stress')
+        connections['default'].close()
+
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        deadline = time.monotonic() + kwargs['duration']
+
+        processes = [
+            context.Process(target=_writer, args=(path, options, user.pk, category.pk, deadline, results))
+            for _ in range(kwargs['writers'])
+        ] + [
+            context.Process(target=_reader, args=(path, options, user.pk, deadline, results))
+            for _ in range(kwargs['readers'])
+        ]
+        for process in processes:
+            process.start()
+
+        totals = {'write': [0, 0, []], 'read': [0, 0, []]}
+        for _ in processes:
+            kind, ok, locked, latencies = results.get()
+            totals[kind][0] += ok
+            totals[kind][1] += locked
+            totals[kind][2].extend(latencies)
+        for process in processes:
+            process.join()
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n{mode} ({options.get('init_command', '') or 'no pragmas'})"))
+        for kind, (ok, locked, latencies) in totals.items():
+            self.stdout.write(
+                f"  {kind:5}  {ok / kwargs['duration']:9.1f} ops/s   "
+                f"locked errors: {locked:5}   "
+                f"p50 {_percentile(latencies, 0.5) * 1000:7.1f} ms   "
+                f"p99 {_percentile(latencies, 0.99) * 1000:7.1f} ms"
+            )
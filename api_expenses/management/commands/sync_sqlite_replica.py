@@ -0,0 +1,59 @@
+# api_expenses/management/commands/sync_sqlite_replica.py
+# Copy the primary SQLite database onto the replica file (local replica testing)
+
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from proj_expense_track.routers import REPLICA_ALIAS
+
+
+class Command(BaseCommand):
+    help = "Refresh the SQLite read replica from the primary (once, or every --interval seconds with --loop)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep copying, simulating replication lag of about --interval seconds'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Seconds between copies with --loop (default: 2)'
+        )
+
+    def handle(self, *args, **kwargs):
+        loop = kwargs.get('loop')
+        interval = kwargs.get('interval')
+
+        replica = settings.DATABASES.get(REPLICA_ALIAS)
+        primary = settings.DATABASES['default']
+        if replica is None:
+            raise CommandError("No replica configured (set DATABASE_REPLICA_NAME)")
+        if 'sqlite3' not in primary['ENGINE'] or 'sqlite3' not in replica['ENGINE']:
+            raise CommandError("Both databases must be SQLite; use real replication otherwise")
+
+        copies = 0
+        try:
+            while True:
+                # The online backup API gives a consistent snapshot while writers keep going
+                source = sqlite3.connect(str(primary['NAME']))
+                target = sqlite3.connect(str(replica['NAME']))
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                    source.close()
+                copies += 1
+
+                if not loop:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Replica refreshed {copies} time(s)"))
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_budgets', '0001_initial'),
+        ('api_expenses', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategorySpendStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('mean', models.FloatField(default=0.0)),
+                ('m2', models.FloatField(default=0.0)),
+                ('ewma', models.FloatField(default=0.0)),
+                ('ewm_var', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Category spend stats',
+            },
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='anomaly_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='is_anomalous',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(condition=models.Q(('is_anomalous', True)), fields=['user', '-date'], name='expense_anomaly_idx'),
+        ),
+        migrations.AddField(
+            model_name='categoryspendstats',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spend_stats', to='api_budgets.budgetcategory'),
+        ),
+        migrations.AddField(
+            model_name='categoryspendstats',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_spend_stats', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='categoryspendstats',
+            unique_together={('user', 'category')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_expenses', '0004_user_fk_no_db_constraint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receiptupload',
+            name='completing_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
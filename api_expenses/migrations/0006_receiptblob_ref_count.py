@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_references(apps, schema_editor):
+    ReceiptBlob = apps.get_model('api_expenses', 'ReceiptBlob')
+    ReceiptAttachment = apps.get_model('api_expenses', 'ReceiptAttachment')
+    using = schema_editor.connection.alias
+
+    references = (
+        ReceiptAttachment.objects.using(using)
+        .filter(blob=OuterRef('pk'))
+        .values('blob')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    ReceiptBlob.objects.using(using).update(ref_count=Coalesce(Subquery(references), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_expenses', '0005_receiptupload_completing_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receiptblob',
+            name='ref_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
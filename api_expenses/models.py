@@ -1,4 +1,6 @@
-from django.db import models
+import uuid
+
+from django.db import models, router, transaction
 from django.conf import settings
 from api_budgets.models import BudgetCategory
 
@@ -6,6 +8,8 @@ class Expense(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        # The user row lives on 'default', this one on the user's shard
+        db_constraint=False,
         related_name='expenses'
     )
 
@@ -38,8 +42,194 @@ class Expense(models.Model):
     due_date = models.DateField(null=True, blank=True)
     auto_pay = models.BooleanField(default=False)
 
+    # Set on every write from the per-category running statistics
+    # (see api_expenses/anomalies.py)
+    anomaly_score = models.FloatField(null=True, blank=True)
+    is_anomalous = models.BooleanField(default=False)
+
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # Partial index: only flagged rows are stored, so the
+            # anomalies listing stays cheap regardless of table size.
+            models.Index(
+                fields=['user', '-date'],
+                condition=models.Q(is_anomalous=True),
+                name='expense_anomaly_idx',
+            ),
+        ]
+
+    # (amount, category_id) as last loaded or saved, i.e. what the stats
+    # hold for this row
+    stats_values = None
+    STATS_FIELDS = ('amount', 'category', 'anomaly_score', 'is_anomalous')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = instance.__dict__
+        if 'amount' in loaded and 'category_id' in loaded:
+            instance.stats_values = (loaded['amount'], loaded['category_id'])
+        return instance
+
+    def save(self, *args, **kwargs):
+        # The pre_save stats update (signals.py) commits or rolls back
+        # together with the row itself
+        if (self.stats_values is not None and not self._state.adding
+                and kwargs.get('update_fields') is None and not kwargs.get('force_insert')
+                and self.stats_values == (self.amount, self.category_id)):
+            # Amount and category untouched (e.g. only notes edited): leave
+            # them and the score alone, so the stats need no queries and a
+            # concurrent amount edit is not overwritten with the loaded value
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.STATS_FIELDS and f.attname not in deferred
+            ]
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.email} - {self.amount}"
+
+
+class CategorySpendStats(models.Model):
+    """
+    Running spend statistics for one (user, category) pair.
+    Updated in O(1) on every expense write - never recomputed from history
+    except by the `rebuild_expense_stats` management command.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name='category_spend_stats'
+    )
+
+    category = models.ForeignKey(
+        BudgetCategory,
+        on_delete=models.CASCADE,
+        related_name='spend_stats'
+    )
+
+    # Welford accumulators (all-time mean / variance)
+    count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0.0)
+    m2 = models.FloatField(default=0.0)
+
+    # Exponentially weighted mean / variance (recent behaviour)
+    ewma = models.FloatField(default=0.0)
+    ewm_var = models.FloatField(default=0.0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'category')
+        verbose_name_plural = 'Category spend stats'
+
+    def __str__(self):
+        return f"{self.user_id} - {self.category_id} (n={self.count})"
+
+
+class ReceiptBlob(models.Model):
+    """
+    One stored receipt file, content-addressed by SHA-256: identical
+    uploads share a single blob however many expenses reference it.
+    Deleted together with its last ReceiptAttachment.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    content_type = models.CharField(max_length=100)
+
+    # Attachments referencing this row; kept by the ReceiptAttachment
+    # signals, the blob is released when it drops to zero
+    ref_count = models.PositiveIntegerField(default=0)
+
+    # Rendered by `process_receipt_thumbnails`, never on the request path
+    thumbnail = models.FileField(max_length=255, blank=True)
+    thumbnail_pending = models.BooleanField(default=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['id'],
+                condition=models.Q(thumbnail_pending=True),
+                name='receiptblob_thumb_pending_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.size} bytes)"
+
+
+class ReceiptAttachment(models.Model):
+    expense = models.ForeignKey(
+        Expense,
+        on_delete=models.CASCADE,
+        related_name='receipts'
+    )
+
+    blob = models.ForeignKey(
+        ReceiptBlob,
+        on_delete=models.PROTECT,
+        related_name='attachments'
+    )
+
+    filename = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at']
+        unique_together = ('expense', 'blob')
+
+    def __str__(self):
+        return f"{self.expense_id} - {self.filename}"
+
+
+class ReceiptUpload(models.Model):
+    """
+    An in-progress chunked upload. Chunks live as separate files in the
+    upload's directory, so which chunks arrived is read from disk and a
+    client can resume after a dropped connection without resending them.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name='receipt_uploads'
+    )
+
+    expense = models.ForeignKey(
+        Expense,
+        on_delete=models.CASCADE,
+        related_name='receipt_uploads'
+    )
+
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    # Optional client-declared digest, checked on completion
+    sha256 = models.CharField(max_length=64, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    # Set while a complete request assembles the file (see complete_upload)
+    completing_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    def chunk_length(self, index):
+        if index < self.total_chunks - 1:
+            return self.chunk_size
+        return self.size - self.chunk_size * (self.total_chunks - 1)
+
+    def __str__(self):
+        return f"{self.id} ({self.filename})"
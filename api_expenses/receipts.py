@@ -0,0 +1,402 @@
+"""
+Receipt attachments: chunked resumable uploads and content-addressed storage.
+
+Protocol (see the receipt views):
+1. init     - declare expense, filename, size (and optionally the SHA-256);
+              returns an upload id and the chunk size.
+2. chunk N  - PUT the raw bytes of chunk N. A declared Content-Length other
+              than the chunk's size is refused before anything is read.
+              Each chunk is streamed to its own file and renamed into place
+              only when complete, so a dropped connection never leaves a
+              half chunk that counts as received.
+3. status   - lists the chunks already on disk; a reconnecting client only
+              sends the missing ones.
+4. complete - concatenates the chunks while hashing, then stores the result
+              under receipts/blobs/<sha256>. An existing blob with the same
+              digest is reused, so identical receipts are stored once.
+              The upload is claimed first, so concurrent completes of the
+              same upload cannot both store it.
+
+Blob files are written with plain os calls under MEDIA_ROOT (the default
+FileSystemStorage); thumbnails are rendered by `process_receipt_thumbnails`.
+Blob rows live on the owning user's shard next to their attachments. Each
+shard has its own file names for its blobs (hard links, so the content is
+still stored once), which makes a file's only references the attachments
+of one blob row: `ReceiptBlob.ref_count`, kept by the attachment signals.
+
+Blob reuse and release race on the same row and file. File I/O never
+happens under the row lock: `complete_upload` links the assembled file into
+place before its transaction and again after commit, in case a concurrent
+release removed it; `release_blob` deletes a row whose count dropped to
+zero under the row lock, then moves the file aside before unlinking it,
+putting it back if a blob for the digest appeared meanwhile.
+"""
+
+import hashlib
+import os
+import shutil
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from PIL import Image
+
+from account.avatars import render_thumbnail
+from proj_expense_track.sharding import DEFAULT_SHARD
+from .models import ReceiptAttachment, ReceiptBlob, ReceiptUpload
+
+
+MAX_UPLOAD_BYTES = getattr(settings, 'RECEIPT_MAX_UPLOAD_BYTES', 20 * 1024 * 1024)
+CHUNK_SIZE = getattr(settings, 'RECEIPT_CHUNK_SIZE', 1024 * 1024)
+UPLOAD_TTL_HOURS = getattr(settings, 'RECEIPT_UPLOAD_TTL_HOURS', 24)
+THUMBNAIL_SIZE = getattr(settings, 'RECEIPT_THUMBNAIL_SIZE', 320)
+
+# An interrupted complete stops blocking new attempts after this long
+COMPLETE_CLAIM_SECONDS = 10 * 60
+
+UPLOADS_DIR = 'receipts/uploads'
+# Assembled files, outside the upload directory that is removed on commit
+ASSEMBLY_DIR = 'receipts/tmp'
+BLOBS_DIR = 'receipts/blobs'
+THUMBNAILS_DIR = 'receipts/thumbnails'
+
+# PIL format -> (content type, file extension)
+IMAGE_TYPES = {
+    'JPEG': ('image/jpeg', '.jpg'),
+    'PNG': ('image/png', '.png'),
+    'WEBP': ('image/webp', '.webp'),
+}
+PDF_TYPE = ('application/pdf', '.pdf')
+
+_COPY_BUFFER = 64 * 1024
+
+
+def media_path(name):
+    return os.path.join(settings.MEDIA_ROOT, name)
+
+
+def _shard_dir(using):
+    # 'default' keeps the unprefixed names blobs had before sharding
+    return '' if using == DEFAULT_SHARD else f'{using}/'
+
+
+def blob_file_name(sha256, extension, using):
+    return f'{BLOBS_DIR}/{_shard_dir(using)}{sha256[:2]}/{sha256}{extension}'
+
+
+def thumbnail_file_name(sha256, extension, using):
+    return f'{THUMBNAILS_DIR}/{_shard_dir(using)}{sha256[:2]}/{sha256}{extension}'
+
+
+# ==================== UPLOAD SESSIONS ====================
+
+def clean_filename(filename):
+    # Ends up in Content-Disposition headers
+    name = ''.join(ch for ch in os.path.basename(filename) if ch.isprintable() and ch != '"')
+    return name.strip()[:255] or 'receipt'
+
+
+def create_upload(user, expense, filename, size, sha256=''):
+    return ReceiptUpload.objects.using(expense._state.db).create(
+        user=user,
+        expense=expense,
+        filename=clean_filename(filename),
+        size=size,
+        chunk_size=CHUNK_SIZE,
+        sha256=sha256.lower(),
+        expires_at=timezone.now() + timedelta(hours=UPLOAD_TTL_HOURS)
+    )
+
+
+def upload_dir(upload):
+    return media_path(f'{UPLOADS_DIR}/{upload.pk}')
+
+
+def received_chunks(upload):
+    """Indexes of the chunks fully written to disk."""
+    try:
+        names = os.listdir(upload_dir(upload))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[:-5]) for name in names if name.endswith('.part'))
+
+
+def write_chunk(upload, index, stream, content_length=None):
+    """
+    Stream one chunk from `stream` to disk. Returns an error message, or
+    None once the chunk is in place. Re-sending a chunk simply replaces it.
+    `content_length` is the request's declared body size, if any.
+    """
+    if not 0 <= index < upload.total_chunks:
+        return 'Chunk index out of range'
+
+    expected = upload.chunk_length(index)
+    if content_length not in (None, '') and content_length != str(expected):
+        # Refused unread
+        return f'Chunk {index} must be exactly {expected} bytes'
+    directory = upload_dir(upload)
+    os.makedirs(directory, exist_ok=True)
+
+    final_path = os.path.join(directory, f'{index}.part')
+    temp_path = f'{final_path}.{uuid.uuid4().hex}.tmp'
+
+    written = 0
+    try:
+        with open(temp_path, 'wb') as out:
+            while written <= expected:
+                data = stream.read(min(_COPY_BUFFER, expected + 1 - written))
+                if not data:
+                    break
+                out.write(data)
+                written += len(data)
+
+        if written != expected:
+            os.remove(temp_path)
+            return f'Chunk {index} must be exactly {expected} bytes'
+
+        os.replace(temp_path, final_path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return None
+
+
+def remove_upload_files(upload_id):
+    shutil.rmtree(media_path(f'{UPLOADS_DIR}/{upload_id}'), ignore_errors=True)
+
+
+# ==================== COMPLETION ====================
+
+def detect_content_type(path):
+    """(content type, extension) from the file's own header, or None."""
+    with open(path, 'rb') as f:
+        if f.read(5) == b'%PDF-':
+            return PDF_TYPE
+
+    try:
+        with Image.open(path) as img:
+            return IMAGE_TYPES.get(img.format)
+    except Exception:
+        return None
+
+
+def _assemble(upload, target_path):
+    """Concatenate the chunks into `target_path`; returns the hex digest."""
+    digest = hashlib.sha256()
+    directory = upload_dir(upload)
+
+    with open(target_path, 'wb') as out:
+        for index in range(upload.total_chunks):
+            with open(os.path.join(directory, f'{index}.part'), 'rb') as part:
+                while True:
+                    data = part.read(_COPY_BUFFER)
+                    if not data:
+                        break
+                    digest.update(data)
+                    out.write(data)
+
+    return digest.hexdigest()
+
+
+def _place_file(source_path, name):
+    """Hard-link `source_path` to media file `name` unless it already exists."""
+    path = media_path(name)
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        os.link(source_path, path)
+    except FileExistsError:
+        # Same content under the same name from a racing writer
+        pass
+
+
+def store_blob(sha256, size, file_type, using):
+    """
+    Return the blob row for `sha256`, creating it if needed; no file I/O.
+    Runs inside the caller's transaction: the row stays locked until the
+    attachment referencing it is committed.
+    """
+    blob = ReceiptBlob.objects.using(using).select_for_update().filter(sha256=sha256).first()
+    if blob is None:
+        content_type, extension = file_type
+        try:
+            with transaction.atomic(using=using):
+                blob = ReceiptBlob.objects.using(using).create(
+                    sha256=sha256,
+                    file=blob_file_name(sha256, extension, using),
+                    size=size,
+                    content_type=content_type,
+                    thumbnail_pending=content_type != PDF_TYPE[0]
+                )
+        except IntegrityError:
+            blob = ReceiptBlob.objects.using(using).select_for_update().get(sha256=sha256)
+    return blob
+
+
+def ensure_blob_file(blob, temp_path):
+    """After commit: put the file back if a concurrent release removed it."""
+    _place_file(temp_path, blob.file.name)
+
+
+def attach_blob(expense, blob, filename):
+    """
+    Attach `blob` to `expense` (the attachment signal counts the reference).
+    None if the blob was released meanwhile.
+    """
+    try:
+        with transaction.atomic(using=blob._state.db):
+            attachment, _ = ReceiptAttachment.objects.using(blob._state.db).get_or_create(
+                expense=expense,
+                blob=blob,
+                defaults={'filename': filename}
+            )
+    except ReceiptBlob.DoesNotExist:
+        return None
+    return attachment
+
+
+def link_blob_files(blob, using):
+    """
+    File names for a copy of `blob` on database `using`, hard-linked to
+    the blob's files (moving a user between shards).
+    """
+    names = []
+    for name, make_name in ((blob.file.name, blob_file_name), (blob.thumbnail.name, thumbnail_file_name)):
+        if not name:
+            names.append('')
+            continue
+        new_name = make_name(blob.sha256, os.path.splitext(name)[1], using)
+        _place_file(media_path(name), new_name)
+        names.append(new_name)
+    return names
+
+
+def _claim_upload(upload):
+    """Mark the upload as being completed; False if another request holds it."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=COMPLETE_CLAIM_SECONDS)
+    return ReceiptUpload.objects.using(upload._state.db).filter(
+        Q(completing_at__isnull=True) | Q(completing_at__lt=stale),
+        pk=upload.pk,
+    ).update(completing_at=now) == 1
+
+
+def _release_upload_claim(upload):
+    ReceiptUpload.objects.using(upload._state.db).filter(pk=upload.pk).update(completing_at=None)
+
+
+def complete_upload(upload):
+    """
+    Assemble, verify and store a finished upload.
+    Returns (attachment, None) or (None, error message).
+    """
+    missing = sorted(set(range(upload.total_chunks)) - set(received_chunks(upload)))
+    if missing:
+        return None, f'Missing chunks: {missing[:20]}'
+
+    if not _claim_upload(upload):
+        return None, 'This upload is already being completed'
+
+    using = upload._state.db
+    os.makedirs(media_path(ASSEMBLY_DIR), exist_ok=True)
+    temp_path = media_path(f'{ASSEMBLY_DIR}/{uuid.uuid4().hex}.tmp')
+    completed = False
+    try:
+        sha256 = _assemble(upload, temp_path)
+
+        file_type = detect_content_type(temp_path)
+        if upload.sha256 and upload.sha256 != sha256:
+            return None, 'Checksum mismatch; re-send the chunks and complete again'
+        if file_type is None:
+            return None, 'Unsupported file type. Allowed: JPEG, PNG, WEBP, PDF'
+
+        # Linked before the transaction: no file I/O while the blob row is locked
+        _place_file(temp_path, blob_file_name(sha256, file_type[1], using))
+
+        with transaction.atomic(using=using):
+            blob = store_blob(sha256, upload.size, file_type, using)
+            attachment = attach_blob(upload.expense, blob, upload.filename)
+            # Chunk files are removed by the ReceiptUpload post_delete signal
+            upload.delete()
+        completed = True
+
+        ensure_blob_file(blob, temp_path)
+        return attachment, None
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        if not completed:
+            _release_upload_claim(upload)
+
+
+def find_user_blob(user, sha256):
+    """
+    A blob with this digest already attached to one of the user's expenses.
+    Only the user's own blobs qualify: attaching someone else's blob by
+    digest alone would hand out a file the client never had.
+    """
+    return ReceiptBlob.objects.filter(
+        sha256=sha256.lower(),
+        attachments__expense__user=user
+    ).first()
+
+
+# ==================== CLEANUP ====================
+
+def count_attachment(blob_id, using, delta):
+    """Add `delta` to the blob's reference count; False if the row is gone."""
+    return ReceiptBlob.objects.using(using).filter(pk=blob_id).update(ref_count=F('ref_count') + delta) == 1
+
+
+def _remove_unreferenced_file(name, sha256, using):
+    """Unlink a blob file, unless a blob for its digest shows up meanwhile."""
+    path = media_path(name)
+    aside = f'{path}.{uuid.uuid4().hex}.deleting'
+    try:
+        os.replace(path, aside)
+    except FileNotFoundError:
+        return
+    # A complete_upload that started before the move restores its own copy
+    # after commit; one committed by now is seen here. File names are per
+    # database, so no other shard can reference this one.
+    if ReceiptBlob.objects.using(using).filter(sha256=sha256).exists() and not os.path.exists(path):
+        os.replace(aside, path)
+    else:
+        os.remove(aside)
+
+
+def release_blob(blob_id, using):
+    """Delete a blob and its files once its reference count is down to zero."""
+    with transaction.atomic(using=using):
+        # Same row lock store_blob holds while attaching to a reused blob
+        blob = ReceiptBlob.objects.using(using).select_for_update().filter(pk=blob_id).first()
+        if blob is None or blob.ref_count > 0:
+            return False
+        names = [blob.file.name, blob.thumbnail.name]
+        blob.delete(using=using)
+
+    for name in names:
+        if name:
+            _remove_unreferenced_file(name, blob.sha256, using)
+    return True
+
+
+# ==================== THUMBNAILS ====================
+
+def build_receipt_thumbnail(blob):
+    """Render the thumbnail for an image blob (worker side)."""
+    data, extension = render_thumbnail(media_path(blob.file.name), size=THUMBNAIL_SIZE)
+
+    name = thumbnail_file_name(blob.sha256, f'.{extension}', blob._state.db)
+    os.makedirs(os.path.dirname(media_path(name)), exist_ok=True)
+    with open(media_path(name), 'wb') as f:
+        f.write(data)
+
+    ReceiptBlob.objects.using(blob._state.db).filter(pk=blob.pk).update(thumbnail=name, thumbnail_pending=False)
+    return name
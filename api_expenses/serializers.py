@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import Expense
+from django.urls import reverse
+from .models import Expense, ReceiptAttachment
+from .receipts import MAX_UPLOAD_BYTES
 from datetime import datetime, date
 from decimal import Decimal
 
@@ -17,8 +19,11 @@ class ExpenseSerializer(serializers.ModelSerializer):
             'is_recurring',
             'due_date',
             'auto_pay',
+            'anomaly_score',
+            'is_anomalous',
             'created_at',
         ]
+        read_only_fields = ['anomaly_score', 'is_anomalous']
 
     def validate_amount(self, value):
         """Validate that amount is positive and within reasonable limits."""
@@ -47,3 +52,47 @@ class ExpenseSerializer(serializers.ModelSerializer):
         if value and len(value) > 255:
             raise serializers.ValidationError("Notes cannot exceed 255 characters.")
         return value
+
+
+class ReceiptUploadInitSerializer(serializers.Serializer):
+    expense = serializers.IntegerField()
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False, allow_blank=True)
+
+    def validate_size(self, value):
+        if value > MAX_UPLOAD_BYTES:
+            raise serializers.ValidationError(
+                f"File too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)."
+            )
+        return value
+
+
+class ReceiptAttachmentSerializer(serializers.ModelSerializer):
+    size = serializers.IntegerField(source='blob.size', read_only=True)
+    content_type = serializers.CharField(source='blob.content_type', read_only=True)
+    sha256 = serializers.CharField(source='blob.sha256', read_only=True)
+    file_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReceiptAttachment
+        fields = [
+            'id',
+            'expense',
+            'filename',
+            'size',
+            'content_type',
+            'sha256',
+            'file_url',
+            'thumbnail_url',
+            'created_at',
+        ]
+
+    def get_file_url(self, obj):
+        return reverse('serve_receipt', args=[obj.pk])
+
+    def get_thumbnail_url(self, obj):
+        if not obj.blob.thumbnail:
+            return None
+        return reverse('serve_receipt_thumbnail', args=[obj.pk])
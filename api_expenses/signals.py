@@ -0,0 +1,75 @@
+"""
+Keep CategorySpendStats in step with Expense writes, and receipt files in
+step with their rows.
+Runs on model signals so admin edits, cascades and seed data are covered too.
+"""
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Expense, ReceiptAttachment, ReceiptBlob, ReceiptUpload
+from .anomalies import add_to_stats, lock_stats, remove_from_stats, replace_in_stats
+from .receipts import count_attachment, release_blob, remove_upload_files
+
+
+@receiver(pre_save, sender=Expense)
+def expense_pre_save(sender, instance, raw=False, using=None, update_fields=None, **kwargs):
+    """
+    Score the expense before it is written so the score lands in the same
+    INSERT/UPDATE. Expense.save wraps this and the write in one transaction,
+    so a failed save leaves the stats untouched.
+    """
+    if raw:
+        return
+
+    # Saves that do not touch amount/category (e.g. rebuild writing scores back)
+    if update_fields is not None and not {'amount', 'category'} & set(update_fields):
+        return
+
+    if instance.pk:
+        # Locked: a concurrent edit of the same expense waits, then sees our amount
+        old = Expense.objects.using(using).select_for_update().filter(
+            pk=instance.pk
+        ).values('amount', 'category_id').first()
+        if old:
+            if old['amount'] == instance.amount and old['category_id'] == instance.category_id:
+                return
+            if old['category_id'] == instance.category_id and instance.category_id:
+                replace_in_stats(instance, old['amount'], using)
+                return
+            lock_stats(instance.user_id, [old['category_id'], instance.category_id], using)
+            remove_from_stats(instance.user_id, old['category_id'], old['amount'], using)
+
+    add_to_stats(instance, using)
+
+
+@receiver(post_save, sender=Expense)
+def expense_post_save(sender, instance, **kwargs):
+    instance.stats_values = (instance.amount, instance.category_id)
+
+
+@receiver(post_delete, sender=Expense)
+def expense_post_delete(sender, instance, using=None, **kwargs):
+    remove_from_stats(instance.user_id, instance.category_id, instance.amount, using)
+
+
+@receiver(post_save, sender=ReceiptAttachment)
+def receipt_attachment_post_save(sender, instance, created, raw=False, using=None, **kwargs):
+    # Raw saves (fixtures, shard moves) carry their counts already
+    if created and not raw and not count_attachment(instance.blob_id, using, 1):
+        raise ReceiptBlob.DoesNotExist(f"Receipt blob {instance.blob_id} was released")
+
+
+@receiver(post_delete, sender=ReceiptAttachment)
+def receipt_attachment_post_delete(sender, instance, using=None, **kwargs):
+    blob_id = instance.blob_id
+    count_attachment(blob_id, using, -1)
+    # After commit, so a rolled-back delete never loses the file
+    transaction.on_commit(lambda: release_blob(blob_id, using), using=using)
+
+
+@receiver(post_delete, sender=ReceiptUpload)
+def receipt_upload_post_delete(sender, instance, using=None, **kwargs):
+    upload_id = instance.pk
+    transaction.on_commit(lambda: remove_upload_files(upload_id), using=using)
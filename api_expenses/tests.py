@@ -1,3 +1,420 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from unittest import mock
+
+from django.db import IntegrityError, connection, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api_budgets.models import BudgetCategory
+from proj_expense_track import routers
+from proj_expense_track.admin_utils import estimate_row_count
+from . import anomalies, receipts
+from .batching import WriteCoalescer, WriteTimeout
+from .models import CategorySpendStats, Expense, ReceiptBlob
+
+
+User = get_user_model()
+
+
+class WriteCoalescerTests(TransactionTestCase):
+    # The writer thread has its own connection: rows must really be committed
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='writer@example.com', username='writer', password='S3cure-pass!'
+        )
+        self.coalescer = WriteCoalescer(max_batch=16, max_delay=0.2, timeout=5)
+        self.addCleanup(self.coalescer.stop)
+
+    def _submit_together(self, funcs):
+        """Submit every func from its own thread at once; returns [(result, error)]."""
+        outcomes = [None] * len(funcs)
+        barrier = threading.Barrier(len(funcs))
+
+        def call(index, func):
+            barrier.wait()
+            try:
+                outcomes[index] = (self.coalescer.submit(func), None)
+            except Exception as e:
+                outcomes[index] = (None, e)
+
+        threads = [threading.Thread(target=call, args=(i, f)) for i, f in enumerate(funcs)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def _create(self, amount):
+        return lambda: Expense.objects.create(user_id=self.user.pk, amount=amount, date=date(2026, 1, 1))
+
+    def test_failing_write_gets_its_own_error(self):
+        batches = []
+        original = self.coalescer._commit_batch
+        self.coalescer._commit_batch = lambda batch: (batches.append(len(batch)), original(batch))
+
+        outcomes = self._submit_together([
+            self._create('10.00'),
+            self._create(None),         # NOT NULL violation
+            self._create('12.00'),
+            self._create('14.00'),
+        ])
+
+        self.assertEqual(batches, [4])
+        self.assertIsInstance(outcomes[1][1], IntegrityError)
+        for index in (0, 2, 3):
+            expense, error = outcomes[index]
+            self.assertIsNone(error)
+            self.assertTrue(Expense.objects.filter(pk=expense.pk).exists())
+        self.assertEqual(
+            sorted(str(a) for a in Expense.objects.values_list('amount', flat=True)),
+            ['10.00', '12.00', '14.00']
+        )
+
+    def test_queued_write_times_out_and_is_dropped(self):
+        self.coalescer.max_delay = 0
+        self.coalescer.timeout = 0.2
+        release = threading.Event()
+        ran = []
+
+        blocker = threading.Thread(target=self.coalescer.submit, args=(release.wait,))
+        blocker.start()
+        try:
+            with self.assertRaises(WriteTimeout):
+                self.coalescer.submit(lambda: ran.append(True))
+        finally:
+            release.set()
+            blocker.join()
+
+        self.coalescer.stop()
+        self.assertEqual(ran, [])
+
+    def test_dead_writer_thread_is_replaced(self):
+        self.coalescer.submit(lambda: None)
+        dead = self.coalescer._thread
+        self.coalescer._queue.put(None)
+        dead.join()
+
+        expense = self.coalescer.submit(self._create('10.00'))
+
+        self.assertIsNot(self.coalescer._thread, dead)
+        self.assertTrue(self.coalescer._thread.is_alive())
+        self.assertTrue(Expense.objects.filter(pk=expense.pk).exists())
+
+
+class AnomalyMathTests(SimpleTestCase):
+
+    def test_welford_matches_statistics(self):
+        values = [12.5, 3.0, 7.25, 100.0, 42.0]
+        count, mean, m2 = 0, 0.0, 0.0
+        for x in values:
+            count, mean, m2 = anomalies.welford_add(count, mean, m2, x)
+
+        self.assertEqual(count, 5)
+        self.assertAlmostEqual(mean, statistics.mean(values))
+        self.assertAlmostEqual(m2 / (count - 1), statistics.variance(values))
+
+    def test_welford_remove_undoes_add(self):
+        count, mean, m2 = 0, 0.0, 0.0
+        for x in [10.0, 20.0, 30.0]:
+            count, mean, m2 = anomalies.welford_add(count, mean, m2, x)
+
+        added = anomalies.welford_add(count, mean, m2, 55.5)
+        removed = anomalies.welford_remove(*added, 55.5)
+
+        for before, after in zip((count, mean, m2), removed):
+            self.assertAlmostEqual(before, after)
+        self.assertEqual(anomalies.welford_remove(1, 5.0, 0.0, 5.0), (0, 0.0, 0.0))
+
+    def _stats(self, values):
+        count, mean, m2, ewma, ewm_var = 0, 0.0, 0.0, 0.0, 0.0
+        for x in values:
+            ewma, ewm_var = anomalies.ewma_add(count, ewma, ewm_var, x)
+            count, mean, m2 = anomalies.welford_add(count, mean, m2, x)
+        return count, mean, m2, ewma, ewm_var
+
+    def test_no_score_below_min_samples(self):
+        stats = self._stats([10.0] * (anomalies.MIN_SAMPLES - 1))
+        self.assertEqual(anomalies.score(*stats, 900.0), (None, False))
+
+    def test_usual_amount_is_not_flagged(self):
+        stats = self._stats([10.0, 12.0, 11.0, 9.5, 10.5, 11.5, 10.0, 12.5])
+        _, flagged = anomalies.score(*stats, 11.0)
+        self.assertFalse(flagged)
+
+    def test_outlier_is_flagged(self):
+        stats = self._stats([10.0, 12.0, 11.0, 9.5, 10.5, 11.5, 10.0, 12.5])
+        z, flagged = anomalies.score(*stats, 300.0)
+        self.assertTrue(flagged)
+        self.assertGreaterEqual(z, anomalies.Z_THRESHOLD)
+
+    def test_flat_history_still_flags_outliers(self):
+        stats = self._stats([10.0] * 8)
+        self.assertEqual(anomalies.score(*stats, 10.0), (0.0, False))
+        self.assertTrue(anomalies.score(*stats, 900.0)[1])
+
+
+class ExpenseStatsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='stats@example.com', username='stats', password='S3cure-pass!'
+        )
+        self.category = BudgetCategory.objects.create(user=self.user, name='Food')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _create(self, amount, **extra):
+        response = self.client.post('/api/expenses/create/', {
+            'amount': amount,
+            'category': self.category.pk,
+            'date': '2026-01-01',
+            **extra,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Expense.objects.get(pk=response.data['data']['id'])
+
+    def _stats(self):
+        return CategorySpendStats.objects.get(user=self.user, category=self.category)
+
+    def test_outlier_after_flat_history_is_flagged(self):
+        for _ in range(8):
+            self._create('10.00')
+
+        expense = self._create('900.00')
+
+        self.assertTrue(expense.is_anomalous)
+        self.assertEqual(self._stats().count, 9)
+
+    def test_notes_edit_leaves_stats_alone(self):
+        expense = self._create('10.00')
+        before = self._stats()
+
+        expense = Expense.objects.get(pk=expense.pk)
+        expense.notes = 'lunch'
+        # Savepoint, UPDATE, release: no stats queries
+        with self.assertNumQueries(3):
+            expense.save()
+
+        after = self._stats()
+        self.assertEqual((after.count, after.mean), (before.count, before.mean))
+
+    def test_amount_edit_replaces_the_old_amount(self):
+        expense = self._create('10.00')
+        self._create('20.00')
+
+        expense = Expense.objects.get(pk=expense.pk)
+        expense.amount = Decimal('40.00')
+        expense.save()
+
+        stats = self._stats()
+        self.assertEqual(stats.count, 2)
+        self.assertAlmostEqual(stats.mean, 30.0)
+
+    def test_delete_removes_the_amount(self):
+        self._create('10.00')
+        expense = self._create('20.00')
+
+        expense.delete()
+
+        stats = self._stats()
+        self.assertEqual(stats.count, 1)
+        self.assertAlmostEqual(stats.mean, 10.0)
+
+    def test_rebuild_reproduces_live_stats(self):
+        # Dates out of order: both paths fold in the order expenses were added
+        for day, amount in [(5, '10.00'), (1, '14.00'), (3, '11.00'), (2, '9.00'),
+                            (9, '12.00'), (4, '10.50'), (8, '95.00')]:
+            self._create(amount, date=f'2026-01-0{day}')
+        live = self._stats()
+        live_scores = list(Expense.objects.order_by('id').values_list('anomaly_score', 'is_anomalous'))
+
+        CategorySpendStats.objects.all().delete()
+        Expense.objects.update(anomaly_score=None, is_anomalous=False)
+        call_command('rebuild_expense_stats', stdout=io.StringIO())
+
+        rebuilt = self._stats()
+        for field in ('count', 'mean', 'm2', 'ewma', 'ewm_var'):
+            self.assertAlmostEqual(getattr(rebuilt, field), getattr(live, field), msg=field)
+        self.assertEqual(
+            list(Expense.objects.order_by('id').values_list('anomaly_score', 'is_anomalous')),
+            live_scores
+        )
+
+
+class ReadYourWritesTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='ryw@example.com', username='ryw', password='S3cure-pass!'
+        )
+        self.category = BudgetCategory.objects.create(user=self.user, name='Food')
+
+    def _wrote_during(self, work):
+        seen = []
+
+        def get_response(request):
+            work()
+            seen.append(routers._wrote.get())
+            return None
+
+        routers.ReadYourWritesMiddleware(get_response)(RequestFactory().get('/'))
+        return seen[0]
+
+    def test_reads_through_write_aliases_do_not_count(self):
+        def work():
+            BudgetCategory.objects.get_or_create(user=self.user, name='Food')
+            with transaction.atomic():
+                list(Expense.objects.select_for_update().filter(user=self.user))
+
+        self.assertFalse(self._wrote_during(work))
+
+    def test_insert_counts(self):
+        self.assertTrue(self._wrote_during(
+            lambda: Expense.objects.create(user=self.user, category=self.category, amount='5.00', date=date(2026, 1, 1))
+        ))
+
+
+class RowEstimateTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='estimate@example.com', username='estimate', password='S3cure-pass!'
+        )
+        Expense.objects.bulk_create(
+            Expense(user=self.user, amount='1.00', date=date(2026, 1, 1)) for _ in range(50)
+        )
+
+    def test_estimate_follows_analyze_after_deletes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('sqlite_stat1 only')
+        Expense.objects.filter(pk__in=Expense.objects.order_by('id').values('pk')[:20]).delete()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        self.assertEqual(estimate_row_count(Expense.objects.all()), 30)
+
+
+class ExpenseSearchTests(TestCase):
+    url = '/api/expenses/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='search@example.com', username='search', password='S3cure-pass!'
+        )
+        food = BudgetCategory.objects.create(user=self.user, name='Food')
+        rent = BudgetCategory.objects.create(user=self.user, name='Rent')
+        Expense.objects.create(user=self.user, category=food, amount='12.00', date=date(2026, 1, 1))
+        Expense.objects.create(user=self.user, category=rent, amount='900.00', date=date(2026, 1, 1), notes='food court')
+        Expense.objects.create(user=self.user, category=rent, amount='55.00', date=date(2026, 1, 2))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _amounts(self, search):
+        response = self.client.get(self.url, {'search': search})
+        self.assertEqual(response.status_code, 200, response.data)
+        return sorted(row['amount'] for row in response.data['data'])
+
+    def test_category_name_ignores_case_and_notes_match_substrings(self):
+        self.assertEqual(self._amounts('FOOD'), ['12.00', '900.00'])
+
+    def test_amount_search(self):
+        self.assertEqual(self._amounts('55'), ['55.00'])
+
+
+class ReceiptUploadTests(TransactionTestCase):
+    # Blob release runs on commit: the deletes must really commit
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(
+            email='receipts@example.com', username='receipts', password='S3cure-pass!'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (32, 32), (10, 200, 10)).save(buffer, 'PNG')
+        self.content = buffer.getvalue()
+        self.sha256 = hashlib.sha256(self.content).hexdigest()
+
+    def _expense(self):
+        return Expense.objects.create(user=self.user, amount='5.00', date=date(2026, 1, 1))
+
+    def _init(self, expense, **extra):
+        response = self.client.post('/api/expenses/receipts/uploads/', {
+            'expense': expense.pk, 'filename': 'r.png', 'size': len(self.content), **extra
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def _put_chunk(self, upload_id, body, **extra):
+        return self.client.generic(
+            'PUT', f'/api/expenses/receipts/uploads/{upload_id}/chunks/0/', body,
+            content_type='application/octet-stream', **extra
+        )
+
+    def _upload(self, expense):
+        upload_id = self._init(expense)['data']['upload_id']
+        self.assertEqual(self._put_chunk(upload_id, self.content).status_code, 200)
+        response = self.client.post(f'/api/expenses/receipts/uploads/{upload_id}/complete/')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['data']
+
+    def test_reference_count_follows_attachments(self):
+        first, second = self._expense(), self._expense()
+        self._upload(first)
+        deduplicated = self._init(second, sha256=self.sha256)
+        self.assertTrue(deduplicated['deduplicated'])
+
+        blob = ReceiptBlob.objects.get()
+        path = receipts.media_path(blob.file.name)
+        self.assertEqual(blob.ref_count, 2)
+
+        first.delete()
+        self.assertEqual(ReceiptBlob.objects.get().ref_count, 1)
+        self.assertTrue(os.path.exists(path))
+
+        second.delete()
+        self.assertFalse(ReceiptBlob.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_files_are_placed_outside_the_transaction(self):
+        in_transaction = []
+        place_file = receipts._place_file
+
+        def record(*args):
+            in_transaction.append(connection.in_atomic_block)
+            return place_file(*args)
+
+        with mock.patch.object(receipts, '_place_file', side_effect=record):
+            self._upload(self._expense())
+
+        self.assertTrue(in_transaction)
+        self.assertNotIn(True, in_transaction)
+
+    def test_wrong_declared_length_is_refused_unread(self):
+        upload_id = self._init(self._expense())['data']['upload_id']
+
+        response = self._put_chunk(upload_id, self.content + b'extra')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(receipts.received_chunks(receipts.ReceiptUpload.objects.get(pk=upload_id)), [])
+        self.assertFalse(os.path.exists(os.path.join(receipts.media_path(receipts.UPLOADS_DIR), upload_id)))
@@ -6,7 +6,22 @@ urlpatterns = [
     path('create/', views.create_expense),
     path('update/<int:pk>/', views.update_expense),
     path('delete/<int:pk>/', views.delete_expense),
+    path('anomalies/', views.list_anomalies),
     path('expenses/export/pdf/', views.export_expenses_pdf),
+
+    path('<int:pk>/receipts/', views.list_receipts),
+    path('receipts/uploads/', views.init_receipt_upload),
+    path('receipts/uploads/<uuid:upload_id>/', views.receipt_upload_status),
+    path('receipts/uploads/<uuid:upload_id>/chunks/<int:index>/', views.upload_receipt_chunk),
+    path('receipts/uploads/<uuid:upload_id>/complete/', views.complete_receipt_upload),
+    path('receipts/<int:attachment_id>/', views.serve_receipt, name='serve_receipt'),
+    path(
+        'receipts/<int:attachment_id>/thumbnail/',
+        views.serve_receipt,
+        {'thumbnail': True},
+        name='serve_receipt_thumbnail'
+    ),
+    path('receipts/<int:attachment_id>/delete/', views.delete_receipt),
 ]
 
 
@@ -14,4 +29,13 @@ urlpatterns = [
 # localhost:8000/api/expenses/create/ -> Create new expense
 # localhost:8000/api/expenses/update/<id>/ -> Update expense by ID
 # localhost:8000/api/expenses/delete/<id>/ -> Delete expense by ID
+# localhost:8000/api/expenses/anomalies/ -> List expenses flagged as unusual for their category
 # localhost:8000/api/expenses/expenses/export/pdf/ -> Export expenses as PDF
+# localhost:8000/api/expenses/<id>/receipts/ -> List receipts attached to an expense
+# localhost:8000/api/expenses/receipts/uploads/ -> Start a chunked receipt upload (POST)
+# localhost:8000/api/expenses/receipts/uploads/<uuid>/ -> Upload status for resuming (GET) / cancel (DELETE)
+# localhost:8000/api/expenses/receipts/uploads/<uuid>/chunks/<n>/ -> Upload chunk n as raw bytes (PUT)
+# localhost:8000/api/expenses/receipts/uploads/<uuid>/complete/ -> Assemble and attach the receipt (POST)
+# localhost:8000/api/expenses/receipts/<id>/ -> Download a receipt (Range/ETag aware)
+# localhost:8000/api/expenses/receipts/<id>/thumbnail/ -> Download a receipt thumbnail
+# localhost:8000/api/expenses/receipts/<id>/delete/ -> Delete a receipt
@@ -6,8 +6,15 @@ from django.db import IntegrityError
 from datetime import datetime, date
 from django.http import HttpResponse, request
 from decimal import InvalidOperation, Decimal
-from .models import Expense
-from .serializers import ExpenseSerializer
+from django.utils import timezone
+from .models import Expense, ReceiptAttachment, ReceiptUpload
+from api_budgets.models import BudgetCategory
+from .serializers import ExpenseSerializer, ReceiptAttachmentSerializer, ReceiptUploadInitSerializer
+from . import receipts
+from .batching import WriteTimeout, run_write
+from proj_expense_track import metrics
+from proj_expense_track.fileserve import serve_file
+from proj_expense_track.routers import replica_reads
 from django.db.models import Q
 
 
@@ -17,6 +24,7 @@ from io import BytesIO
 
 # ------------------Export Expenses as PDF (user-scoped)---------------------------
 @api_view(['GET'])
+@replica_reads
 def export_expenses_pdf(request):
     user = request.user
 
@@ -60,6 +68,7 @@ def export_expenses_pdf(request):
     p.save()
 
     buffer.seek(0)
+    metrics.observe('export_size_bytes', buffer.getbuffer().nbytes, format='pdf')
 
     response = HttpResponse(
         buffer,
@@ -101,7 +110,10 @@ def create_expense(request):
                 'message': 'Validation failed'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        expense = serializer.save(user=request.user)
+        # Group-committed with concurrent creates when EXPENSE_WRITE_COALESCING is on;
+        # the callable may be retried, so it builds a fresh instance each time
+        data = serializer.validated_data
+        expense = run_write(lambda: Expense.objects.create(user=request.user, **data))
 
         return Response({
             'message': 'Expense created successfully',
@@ -113,6 +125,12 @@ def create_expense(request):
             'error': 'A database constraint was violated',
             'message': 'Failed to create expense'
         }, status=status.HTTP_400_BAD_REQUEST)
+
+    except WriteTimeout as e:
+        return Response({
+            'error': str(e),
+            'message': 'Failed to create expense'
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     
     except Exception as e:
         return Response({
@@ -122,6 +140,7 @@ def create_expense(request):
         
 # ----------------------Updated Expenses with Search (user-scoped with pagination)-----------------------
 @api_view(['GET'])
+@replica_reads
 def list_expenses(request):
     """List all expenses with filtering, search, and pagination."""
     try:
@@ -137,22 +156,18 @@ def list_expenses(request):
                     'message': 'Invalid search parameter'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Search in both notes AND category name
-            expenses_qs = expenses_qs.filter(
-                Q(notes__icontains=search) | 
-                Q(category__name__icontains=search)
+            # Notes by substring; category by case-insensitive name, resolved
+            # through the (user, Lower(name)) index instead of a LIKE over the
+            # joined category of every expense
+            search_query = Q(notes__icontains=search) | Q(
+                category_id__in=BudgetCategory.objects.filter(user=user).with_name(search).values('id')
             )
 
-            # Build search query across multiple fields
-            # search_query = Q(notes__icontains=search)
-            # Search in category name if category relation exists
-            # search_query |= Q(category__name__icontains=search)
-
             # Search by amount if it's a valid number
             try:
                 amount_search = Decimal(search)
                 search_query |= Q(amount=amount_search)
-            except:
+            except InvalidOperation:
                 pass  # Not a number, skip amount search
             
             expenses_qs = expenses_qs.filter(search_query)
@@ -396,3 +411,302 @@ def delete_expense(request, pk):
             'message': 'Failed to delete expense'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+# ------------------LIST Anomalous Expenses (own only)---------------------------
+@api_view(['GET'])
+@replica_reads
+def list_anomalies(request):
+    """
+    List expenses flagged as unusual for their category.
+    Served from the partial (user, -date) index on is_anomalous rows.
+    """
+    try:
+        expenses_qs = Expense.objects.filter(
+            user=request.user,
+            is_anomalous=True
+        ).select_related('category').order_by('-date')
+
+        page_number = request.GET.get('page', 1)
+        page_size_param = request.GET.get('page_size', 10)
+
+        try:
+            page_size = int(page_size_param)
+            if page_size < 1 or page_size > 100:
+                page_size = 10
+        except ValueError:
+            page_size = 10
+
+        page, paginator, error = paginate_results(expenses_qs, page_number, page_size)
+
+        if error:
+            return Response({
+                'error': error,
+                'message': 'Pagination error'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = ExpenseSerializer(page, many=True)
+
+        return Response({
+            'message': 'Anomalous expenses retrieved successfully',
+            'count': paginator.count,
+            'num_pages': paginator.num_pages,
+            'current_page': page.number,
+            'has_next': page.has_next(),
+            'has_previous': page.has_previous(),
+            'page_size': page_size,
+            'data': serializer.data
+        })
+
+    except Exception as e:
+        return Response({
+            'error': str(e),
+            'message': 'Failed to retrieve anomalous expenses'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# ==================== RECEIPT ENDPOINTS ====================
+
+def _get_upload(request, upload_id):
+    return ReceiptUpload.objects.filter(
+        pk=upload_id,
+        user=request.user,
+        expires_at__gt=timezone.now()
+    ).first()
+
+
+def _upload_state(upload):
+    received = receipts.received_chunks(upload)
+    return {
+        'upload_id': str(upload.pk),
+        'chunk_size': upload.chunk_size,
+        'total_chunks': upload.total_chunks,
+        'received_chunks': received,
+        'missing_chunks': sorted(set(range(upload.total_chunks)) - set(received)),
+        'expires_at': upload.expires_at,
+    }
+
+
+# ------------------START Receipt Upload (own expense only)---------------------------
+@api_view(['POST'])
+def init_receipt_upload(request):
+    """
+    Start a chunked receipt upload. If `sha256` matches a receipt the user
+    already stored, the file is attached straight away and nothing is sent.
+    """
+    try:
+        serializer = ReceiptUploadInitSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'error': serializer.errors,
+                'message': 'Validation failed'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+
+        expense = Expense.objects.filter(pk=data['expense'], user=request.user).first()
+        if not expense:
+            return Response({
+                'error': 'Expense not found or you do not have permission to access it',
+                'message': 'Expense not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        sha256 = data.get('sha256', '')
+        blob = receipts.find_user_blob(request.user, sha256) if sha256 else None
+        if blob and blob.size == data['size']:
+            attachment = receipts.attach_blob(expense, blob, receipts.clean_filename(data['filename']))
+            # None: released since it was found; the client uploads it again
+            if attachment is not None:
+                return Response({
+                    'message': 'Receipt already stored; attached without upload',
+                    'deduplicated': True,
+                    'data': ReceiptAttachmentSerializer(attachment).data
+                }, status=status.HTTP_201_CREATED)
+
+        upload = receipts.create_upload(
+            request.user, expense, data['filename'], data['size'], sha256
+        )
+
+        return Response({
+            'message': 'Upload started',
+            'deduplicated': False,
+            'data': _upload_state(upload)
+        }, status=status.HTTP_201_CREATED)
+
+    except Exception as e:
+        return Response({
+            'error': str(e),
+            'message': 'Failed to start receipt upload'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# ------------------Receipt Upload STATUS / ABORT (own only)---------------------------
+@api_view(['GET', 'DELETE'])
+def receipt_upload_status(request, upload_id):
+    """Chunks received so far (to resume after a reconnect), or abort the upload."""
+    try:
+        upload = _get_upload(request, upload_id)
+        if not upload:
+            return Response({
+                'error': 'Upload not found or expired',
+                'message': 'Upload not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        if request.method == 'DELETE':
+            upload.delete()
+            return Response({'message': 'Upload cancelled'})
+
+        return Response({
+            'message': 'Upload status retrieved successfully',
+            'data': _upload_state(upload)
+        })
+
+    except Exception as e:
+        return Response({
+            'error': str(e),
+            'message': 'Failed to retrieve upload status'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# ------------------UPLOAD Receipt Chunk (own only)---------------------------
+@api_view(['PUT'])
+def upload_receipt_chunk(request, upload_id, index):
+    """
+    Store chunk `index` from the raw request body (Content-Type:
+    application/octet-stream). The body is streamed to disk, never parsed.
+    """
+    try:
+        upload = _get_upload(request, upload_id)
+        if not upload:
+            return Response({
+                'error': 'Upload not found or expired',
+                'message': 'Upload not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        error = receipts.write_chunk(
+            upload, index, request.stream or BytesIO(), request.META.get('CONTENT_LENGTH')
+        )
+        if error:
+            return Response({
+                'error': error,
+                'message': 'Chunk rejected'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'message': f'Chunk {index} stored',
+            'data': _upload_state(upload)
+        })
+
+    except Exception as e:
+        return Response({
+            'error': str(e),
+            'message': 'Failed to store chunk'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# ------------------COMPLETE Receipt Upload (own only)---------------------------
+@api_view(['POST'])
+def complete_receipt_upload(request, upload_id):
+    """Assemble the chunks, verify the digest and attach the receipt."""
+    try:
+        upload = _get_upload(request, upload_id)
+        if not upload:
+            return Response({
+                'error': 'Upload not found or expired',
+                'message': 'Upload not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        attachment, error = receipts.complete_upload(upload)
+        if error:
+            return Response({
+                'error': error,
+                'message': 'Upload incomplete or invalid',
+                'data': _upload_state(upload)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'message': 'Receipt attached successfully',
+            'data': ReceiptAttachmentSerializer(attachment).data
+        }, status=status.HTTP_201_CREATED)
+
+    except Exception as e:
+        return Response({
+            'error': str(e),
+            'message': 'Failed to complete receipt upload'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# ------------------LIST Receipts of an Expense (own only)---------------------------
+@api_view(['GET'])
+def list_receipts(request, pk):
+    try:
+        if not Expense.objects.filter(pk=pk, user=request.user).exists():
+            return Response({
+                'error': 'Expense not found or you do not have permission to access it',
+                'message': 'Expense not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        attachments = ReceiptAttachment.objects.filter(expense_id=pk).select_related('blob')
+
+        return Response({
+            'message': 'Receipts retrieved successfully',
+            'data': ReceiptAttachmentSerializer(attachments, many=True).data
+        })
+
+    except Exception as e:
+        return Response({
+            'error': str(e),
+            'message': 'Failed to retrieve receipts'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _get_attachment(request, attachment_id):
+    return ReceiptAttachment.objects.filter(
+        pk=attachment_id,
+        expense__user=request.user
+    ).select_related('blob').first()
+
+
+# ------------------DOWNLOAD Receipt / Thumbnail (own only)---------------------------
+@api_view(['GET', 'HEAD'])
+def serve_receipt(request, attachment_id, thumbnail=False):
+    """
+    Send the receipt file (or its thumbnail). Blobs never change once
+    stored, so clients may cache privately for a long time.
+    """
+    attachment = _get_attachment(request, attachment_id)
+    name = None
+    if attachment:
+        name = attachment.blob.thumbnail.name if thumbnail else attachment.blob.file.name
+
+    if not name:
+        return Response({'error': 'File not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    return serve_file(
+        request,
+        receipts.media_path(name),
+        content_type=None if thumbnail else attachment.blob.content_type,
+        cache_control='private, max-age=31536000, immutable',
+        filename=None if thumbnail else attachment.filename
+    )
+
+
+# ------------------DELETE Receipt (own only)---------------------------
+@api_view(['DELETE'])
+def delete_receipt(request, attachment_id):
+    """Detach a receipt; the stored file goes once no expense references it."""
+    try:
+        attachment = _get_attachment(request, attachment_id)
+        if not attachment:
+            return Response({
+                'error': 'Receipt not found or you do not have permission to delete it',
+                'message': 'Receipt not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        attachment.delete()
+        return Response({'message': 'Receipt deleted successfully'})
+
+    except Exception as e:
+        return Response({
+            'error': str(e),
+            'message': 'Failed to delete receipt'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1,9 +1,21 @@
 from django.contrib import admin
+from proj_expense_track.admin_utils import CSVExportMixin
 from .models import ContactMessage
 
 # Register your models here.
 @admin.register(ContactMessage)
-class ContactMessageAdmin(admin.ModelAdmin):
-    list_display = ('full_name', 'email', 'subject', 'is_resolved', 'created_at')
+class ContactMessageAdmin(CSVExportMixin, admin.ModelAdmin):
+    list_display = ('full_name', 'email', 'subject', 'is_resolved', 'created_at', 'notified_at')
     list_filter = ('is_resolved', 'created_at')
     search_fields = ('email', 'subject', 'message')
+
+    csv_export_columns = (
+        ('id', 'ID'),
+        ('created_at', 'Received'),
+        ('full_name', 'Name'),
+        ('email', 'Email'),
+        ('subject', 'Subject'),
+        ('message', 'Message'),
+        ('ip_address', 'IP address'),
+        ('is_resolved', 'Resolved'),
+    )
@@ -0,0 +1,49 @@
+# contact/management/commands/send_contact_digest.py
+# Queue a staff digest of new contact messages (delivered by send_outbox_emails)
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from contact.notifications import NOTIFY_EMAILS, queue_contact_digest
+
+
+class Command(BaseCommand):
+    help = "Queue one digest email for contact messages not yet notified (cron, or --loop)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running, queuing a digest every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=300.0,
+            help='Seconds between digests with --loop (default: 300)'
+        )
+
+    def handle(self, *args, **kwargs):
+        loop = kwargs.get('loop')
+        interval = kwargs.get('interval')
+
+        if not NOTIFY_EMAILS:
+            self.stdout.write(self.style.WARNING("⚠️ CONTACT_NOTIFY_EMAILS is empty; nothing to do"))
+            return
+
+        total = 0
+        try:
+            while True:
+                count = queue_contact_digest()
+                total += count
+                if count:
+                    self.stdout.write(f"📧 Queued digest covering {count} message(s)")
+
+                if not loop:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Messages included in digests: {total}"))
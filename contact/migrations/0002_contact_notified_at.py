@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:31
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def mark_existing_notified(apps, schema_editor):
+    # Messages from before digests existed were handled in the admin already
+    ContactMessage = apps.get_model('contact', 'ContactMessage')
+    ContactMessage.objects.update(notified_at=Coalesce('notified_at', 'created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactmessage',
+            name='notified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_existing_notified, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(condition=models.Q(('notified_at__isnull', True)), fields=['id'], name='contact_unnotified_idx'),
+        ),
+    ]
@@ -13,5 +13,17 @@ class ContactMessage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_resolved = models.BooleanField(default=False)
 
+    # Set once the message went out in a staff digest (send_contact_digest)
+    notified_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['id'],
+                condition=models.Q(notified_at__isnull=True),
+                name='contact_unnotified_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.subject} - {self.email}"
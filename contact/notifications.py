@@ -0,0 +1,69 @@
+"""
+Staff notification for contact messages.
+
+Instead of one email per submission, `queue_contact_digest` gathers every
+message not yet notified into a single digest and queues it in the account
+email outbox, which handles delivery and retries. Run it periodically via
+the `send_contact_digest` command.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from account.outbox import enqueue_email
+from .models import ContactMessage
+
+
+NOTIFY_EMAILS = getattr(settings, 'CONTACT_NOTIFY_EMAILS', [])
+DIGEST_MAX_MESSAGES = getattr(settings, 'CONTACT_DIGEST_MAX_MESSAGES', 100)
+
+PREVIEW_CHARS = 500
+
+
+def _format_message(contact):
+    text = contact.message.strip()
+    if len(text) > PREVIEW_CHARS:
+        text = text[:PREVIEW_CHARS] + '...'
+    return (
+        f"From: {contact.full_name} <{contact.email}>\n"
+        f"Subject: {contact.subject}\n"
+        f"Received: {contact.created_at:%Y-%m-%d %H:%M} UTC\n\n"
+        f"{text}\n"
+    )
+
+
+def queue_contact_digest(max_messages=DIGEST_MAX_MESSAGES):
+    """
+    Queue one digest email covering up to `max_messages` un-notified
+    messages. Returns how many messages were included (0 if none, or if no
+    recipients are configured).
+    """
+    if not NOTIFY_EMAILS:
+        return 0
+
+    with transaction.atomic():
+        messages = list(
+            ContactMessage.objects
+            .select_for_update(skip_locked=True)
+            .filter(notified_at__isnull=True)
+            .order_by('id')[:max_messages]
+        )
+        if not messages:
+            return 0
+
+        separator = '\n' + '-' * 40 + '\n'
+        body = (
+            f"{len(messages)} new contact message(s):\n\n"
+            + separator.join(_format_message(m) for m in messages)
+        )
+        subject = f"[Expense Tracker] {len(messages)} new contact message(s)"
+
+        for recipient in NOTIFY_EMAILS:
+            enqueue_email(recipient, subject, body)
+
+        ContactMessage.objects.filter(
+            id__in=[m.id for m in messages]
+        ).update(notified_at=timezone.now())
+
+    return len(messages)
@@ -1,3 +1,51 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import DatabaseError
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .models import ContactMessage
+
+
+class ContactSubmitTests(TestCase):
+    url = '/api/contact/submit/'
+    payload = {
+        'full_name': 'Jane Doe',
+        'email': 'jane@example.com',
+        'subject': 'Hello',
+        'message': 'A message long enough to pass validation.',
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_duplicate_is_stored_once(self):
+        first = self.client.post(self.url, self.payload, format='json')
+        again = self.client.post(self.url, {**self.payload, 'subject': '  HELLO '}, format='json')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(again.status_code, 201)
+        self.assertEqual(ContactMessage.objects.count(), 1)
+
+    def test_failed_save_does_not_swallow_the_retry(self):
+        client = APIClient(raise_request_exception=False)
+        with mock.patch.object(ContactMessage, 'save', side_effect=DatabaseError('disk full')):
+            failed = client.post(self.url, self.payload, format='json')
+
+        retry = client.post(self.url, self.payload, format='json')
+
+        self.assertEqual(failed.status_code, 500)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(ContactMessage.objects.count(), 1)
+
+    def test_burst_is_rate_limited(self):
+        for index in range(5):
+            response = self.client.post(self.url, {**self.payload, 'subject': f'Hello {index}'}, format='json')
+            self.assertEqual(response.status_code, 201)
+
+        response = self.client.post(self.url, {**self.payload, 'subject': 'One more'}, format='json')
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
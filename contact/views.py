@@ -2,30 +2,63 @@ from django.shortcuts import render
 
 # Create your views here.
 
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
+from account.throttling import client_ip, take_token
 from .serializers import ContactMessageSerializer
 from .models import ContactMessage
 
+
+# (messages allowed per IP in a burst, seconds to refill the burst)
+RATE_LIMIT = getattr(settings, 'CONTACT_RATE_LIMIT', (5, 600))
+# Identical submissions within this window are stored once
+DEDUPE_SECONDS = getattr(settings, 'CONTACT_DEDUPE_SECONDS', 3600)
+
+
 class ContactUsAPIView(APIView):
     authentication_classes = []  # Public
     permission_classes = []
 
     def post(self, request):
+        # Throttle and dedupe in the cache so floods never reach the database
+        retry_after = take_token('contact', self.get_client_ip(request), RATE_LIMIT)
+        if retry_after:
+            response = Response(
+                {
+                    'error': 'Too many messages. Please try again later.',
+                    'retry_after': retry_after
+                },
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+            response['Retry-After'] = str(retry_after)
+            return response
+
         serializer = ContactMessageSerializer(data=request.data)
 
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        contact = serializer.save(
-            ip_address=self.get_client_ip(request),
-            user_agent=request.META.get('HTTP_USER_AGENT', '')
-        )
+        # add() only succeeds for the first copy within the window; repeats
+        # get the same answer so a double submit looks normal to the sender
+        dedupe_key = self.get_content_key(serializer.validated_data)
+        if cache.add(dedupe_key, 1, DEDUPE_SECONDS):
+            try:
+                serializer.save(
+                    ip_address=self.get_client_ip(request),
+                    user_agent=request.META.get('HTTP_USER_AGENT', '')
+                )
+            except Exception:
+                # Not stored: a retry must not be taken for a duplicate
+                cache.delete(dedupe_key)
+                raise
 
-        # Optional: trigger email async later
-        # send_contact_email(contact)
+        # Staff are notified in batches by the send_contact_digest command
 
         return Response(
             {"message": "Your message has been sent successfully."},
@@ -33,7 +66,12 @@ class ContactUsAPIView(APIView):
         )
 
     def get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            return x_forwarded_for.split(',')[0]
-        return request.META.get('REMOTE_ADDR')
+        return client_ip(request) or None
+
+    def get_content_key(self, data):
+        """Cache key from the normalised sender and text (case and whitespace ignored)."""
+        normalised = '\x00'.join(
+            ' '.join(str(data[field]).lower().split())
+            for field in ('email', 'subject', 'message')
+        )
+        return f"contact:dedupe:{hashlib.sha256(normalised.encode()).hexdigest()}"
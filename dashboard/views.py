@@ -17,12 +17,14 @@ from decimal import Decimal
 from api_expenses.models import Expense
 from api_expenses.serializers import ExpenseSerializer
 from api_budgets.models import Budget, BudgetCategory
-from usersettings.models import UserSettings
+from usersettings.cache import get_settings_for_request
+from proj_expense_track.routers import replica_reads
 
 
 # ==================== DASHBOARD SUMMARY API ====================
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def dashboard_summary(request):
     """
     Main dashboard summary with all key metrics.
@@ -111,8 +113,7 @@ def dashboard_summary(request):
         savings = remaining if remaining > 0 else Decimal('0.00')
         
         # Get user currency
-        user_settings, _ = UserSettings.objects.get_or_create(user=user)
-        currency = user_settings.currency
+        currency = get_settings_for_request(request).currency
         
         return Response({
             'message': 'Dashboard summary retrieved successfully',
@@ -145,6 +146,7 @@ def dashboard_summary(request):
 # ==================== SPENDING TRENDS API ====================
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def spending_trends(request):
     """
     Get spending trends over time for charts.
@@ -241,6 +243,7 @@ def spending_trends(request):
 # ==================== CATEGORY BREAKDOWN API ====================
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def category_breakdown(request):
     """
     Get expense breakdown by category for pie/donut charts.
@@ -332,6 +335,7 @@ def category_breakdown(request):
 # ==================== BUDGET ADHERENCE API ====================
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def budget_adherence(request):
     """
     Calculate budget adherence score and insights.
@@ -428,6 +432,7 @@ def budget_adherence(request):
 # ==================== MONTH COMPARISON API ====================
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def month_comparison(request):
     """
     Compare current month with previous month.
@@ -528,6 +533,7 @@ def month_comparison(request):
 # ==================== EXPENSE STATISTICS API ====================
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def expense_statistics(request):
     """
     Get detailed expense statistics.
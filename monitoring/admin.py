@@ -0,0 +1,174 @@
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.db.models import Avg, Count, Max, Sum
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+
+from .models import RequestProfile, SlowQuery
+from .profiling import collapsed_to_speedscope
+
+
+# ═══════════════════════════════════════════════════════════
+# SLOW QUERY LOG ADMIN
+# ═══════════════════════════════════════════════════════════
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    """Read-only view of the slow-query log, plus a per-fingerprint summary"""
+
+    list_display = ('created_at', 'duration_ms', 'short_sql', 'view', 'user_id', 'database')
+    list_filter = ('database', 'view')
+    search_fields = ('sql', 'fingerprint', 'path')
+    date_hierarchy = 'created_at'
+    ordering = ('-id',)
+    readonly_fields = (
+        'created_at', 'duration_ms', 'database', 'view', 'path', 'user_id',
+        'fingerprint', 'sql', 'plan',
+    )
+    fields = readonly_fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='SQL')
+    def short_sql(self, obj):
+        return obj.sql[:120]
+
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path(
+                'fingerprints/',
+                self.admin_site.admin_view(self.fingerprints_view),
+                name=f'{opts.app_label}_{opts.model_name}_fingerprints'
+            ),
+        ] + super().get_urls()
+
+    def fingerprints_view(self, request):
+        """Slow queries grouped by fingerprint, most total time first."""
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+
+        groups = list(
+            SlowQuery.objects.values('fingerprint')
+            .annotate(
+                count=Count('id'),
+                total_ms=Sum('duration_ms'),
+                avg_ms=Avg('duration_ms'),
+                max_ms=Max('duration_ms'),
+                last_seen=Max('created_at'),
+                views=Count('view', distinct=True),
+            )
+            .order_by('-total_ms')[:200]
+        )
+        # One normalized statement per group (all rows of a group share it)
+        sql_by_fingerprint = dict(
+            SlowQuery.objects.filter(fingerprint__in=[g['fingerprint'] for g in groups])
+            .order_by('fingerprint', '-id').values_list('fingerprint', 'sql')
+        )
+        for group in groups:
+            group['sql'] = sql_by_fingerprint.get(group['fingerprint'], '')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Slow queries by fingerprint',
+            'groups': groups,
+        }
+        return TemplateResponse(request, 'admin/monitoring/slowquery/fingerprints.html', context)
+
+
+# ═══════════════════════════════════════════════════════════
+# REQUEST PROFILE ADMIN
+# ═══════════════════════════════════════════════════════════
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Profiles taken with X-Profile / ?_profile=, with their files for download"""
+
+    list_display = ('created_at', 'method', 'path', 'status_code', 'duration_ms', 'mode', 'user_id')
+    list_filter = ('mode', 'method')
+    search_fields = ('path', 'view')
+    date_hierarchy = 'created_at'
+    ordering = ('-id',)
+    # The pstats blob and collapsed stacks are offered as downloads instead
+    fields = (
+        'created_at', 'method', 'path', 'view', 'status_code', 'duration_ms',
+        'mode', 'user_id', 'sample_interval_ms', 'downloads', 'summary_text',
+    )
+    readonly_fields = fields
+
+    # kind -> (file suffix, content type)
+    DOWNLOADS = {
+        'pstats': ('prof', 'application/octet-stream'),
+        'collapsed': ('collapsed.txt', 'text/plain; charset=utf-8'),
+        'speedscope': ('speedscope.json', 'application/json'),
+    }
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        # Keep the profile data out of the changelist query
+        return super().get_queryset(request).defer('pstats', 'collapsed', 'summary')
+
+    @admin.display(description='Files')
+    def downloads(self, obj):
+        kinds = [k for k in self.DOWNLOADS if k != 'pstats' or obj.mode == 'cprofile']
+        opts = self.model._meta
+        return format_html_join(
+            ' | ', '<a href="{}">{}</a>',
+            (
+                (reverse(f'admin:{opts.app_label}_{opts.model_name}_download', args=[obj.pk, kind]),
+                 f'{kind} (.{self.DOWNLOADS[kind][0]})')
+                for kind in kinds
+            )
+        )
+
+    @admin.display(description='cProfile summary')
+    def summary_text(self, obj):
+        if not obj.summary:
+            return '-'
+        return format_html('<pre style="white-space: pre; overflow-x: auto;">{}</pre>', obj.summary)
+
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path(
+                '<int:pk>/download/<str:kind>/',
+                self.admin_site.admin_view(self.download_view),
+                name=f'{opts.app_label}_{opts.model_name}_download'
+            ),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk, kind):
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        if kind not in self.DOWNLOADS:
+            raise Http404
+
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        if kind == 'pstats':
+            if not profile.pstats:
+                raise Http404
+            content = bytes(profile.pstats)
+        elif kind == 'collapsed':
+            content = profile.collapsed
+        else:
+            content = collapsed_to_speedscope(
+                profile.collapsed, profile.sample_interval_ms, f"{profile.method} {profile.path}"
+            )
+
+        suffix, content_type = self.DOWNLOADS[kind]
+        response = HttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="profile_{profile.pk}.{suffix}"'
+        return response
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(db_index=True, max_length=40)),
+                ('sql', models.TextField()),
+                ('duration_ms', models.FloatField()),
+                ('database', models.CharField(max_length=64)),
+                ('view', models.CharField(blank=True, max_length=255)),
+                ('path', models.CharField(blank=True, max_length=255)),
+                ('user_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('plan', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name_plural': 'slow queries',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
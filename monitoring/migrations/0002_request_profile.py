@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user_id', models.BigIntegerField(blank=True, null=True)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=255)),
+                ('view', models.CharField(blank=True, max_length=255)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('duration_ms', models.FloatField()),
+                ('mode', models.CharField(choices=[('cprofile', 'cProfile + stack samples'), ('sample', 'Stack samples only')], max_length=10)),
+                ('summary', models.TextField(blank=True)),
+                ('pstats', models.BinaryField(blank=True, default=b'')),
+                ('collapsed', models.TextField(blank=True)),
+                ('sample_interval_ms', models.FloatField()),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
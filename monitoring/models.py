@@ -0,0 +1,59 @@
+
+from django.db import models
+
+
+class SlowQuery(models.Model):
+    """One SQL statement that ran over SLOW_QUERY_MS (see slow_queries.py)"""
+
+    # sha1 of the normalized SQL: the same query with other values
+    fingerprint = models.CharField(max_length=40, db_index=True)
+    sql = models.TextField()
+    duration_ms = models.FloatField()
+    database = models.CharField(max_length=64)
+
+    view = models.CharField(max_length=255, blank=True)
+    path = models.CharField(max_length=255, blank=True)
+    # Not a foreign key: entries outlive deleted users
+    user_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+
+    plan = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = 'slow queries'
+
+    def __str__(self):
+        return f"{self.duration_ms:.0f} ms - {self.sql[:80]}"
+
+
+class RequestProfile(models.Model):
+    """A request run under the profiler on a staff user's request (see profiling.py)"""
+
+    MODE_CHOICES = [
+        ('cprofile', 'cProfile + stack samples'),
+        ('sample', 'Stack samples only'),
+    ]
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    user_id = models.BigIntegerField(null=True, blank=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=255)
+    view = models.CharField(max_length=255, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES)
+
+    # Top functions by cumulative time (cProfile mode)
+    summary = models.TextField(blank=True)
+    # marshal-ed pstats data, as written by cProfile.Profile.dump_stats
+    pstats = models.BinaryField(blank=True, default=b'')
+    # "frame;frame;frame count" lines (flamegraph.pl / speedscope input)
+    collapsed = models.TextField(blank=True)
+    sample_interval_ms = models.FloatField()
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
@@ -0,0 +1,243 @@
+"""
+On-demand request profiling.
+
+A staff user (session, or JWT bearer token) asks for a profile with an
+`X-Profile` header or a `_profile` query parameter:
+- `cprofile` (or `1`): cProfile for exact call counts and times, plus
+  stack samples for a flame graph;
+- `sample`: stack samples only, lower overhead for timing-sensitive work.
+
+Stack samples are taken by a helper thread every PROFILING_INTERVAL_MS
+from the request thread's current frame (`sys._current_frames()`), from the
+view down. The result is stored as a `RequestProfile` and its id returned
+in an `X-Profile-Id` header. The admin shows the cProfile summary and
+offers the raw pstats file (snakeviz, `python -m pstats`), the collapsed
+stacks (flamegraph.pl) and a speedscope JSON file (speedscope.app).
+
+Requests without the flag only pay for the flag lookup; with
+PROFILING_ENABLED off the middleware removes itself. The profile covers
+the view and the middleware after this one: content streamed after the
+view returned is not included.
+"""
+
+import cProfile
+import io
+import json
+import logging
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+from rest_framework.exceptions import AuthenticationFailed
+
+from proj_expense_track.metrics import request_view_name
+
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'HTTP_X_PROFILE'
+QUERY_PARAM = '_profile'
+MODES = {'1': 'cprofile', 'cprofile': 'cprofile', 'sample': 'sample'}
+
+INTERVAL_MS = getattr(settings, 'PROFILING_INTERVAL_MS', 5)
+MAX_ROWS = getattr(settings, 'PROFILING_MAX_ROWS', 200)
+SUMMARY_LINES = 60
+
+
+def requested_mode(request):
+    value = request.META.get(HEADER) or request.GET.get(QUERY_PARAM)
+    if not value:
+        return None
+    return MODES.get(value.strip().lower())
+
+
+def _staff_user(request):
+    """The staff user behind the request, or None (session first, then JWT)."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        from account.authentication import LeanJWTAuthentication
+        try:
+            result = LeanJWTAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        user = result[0] if result else None
+    if user is None or not user.is_active or not user.is_staff:
+        return None
+    return user
+
+
+# ==================== STACK SAMPLER ====================
+
+_path_prefixes = sorted({os.path.join(p, '') for p in sys.path if p}, key=len, reverse=True)
+_frame_labels = {}
+
+
+def _frame_label(code):
+    label = _frame_labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        for prefix in _path_prefixes:
+            if filename.startswith(prefix):
+                filename = filename[len(prefix):]
+                break
+        label = _frame_labels[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+    return label
+
+
+class StackSampler:
+    """Counts the call stacks of one thread, sampled at a fixed interval."""
+
+    def __init__(self, interval_ms=INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self._thread_id = threading.get_ident()
+        # Stacks are cut at the caller's frame: server and middleware frames
+        # above it are the same in every sample
+        self._root = sys._getframe(1)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None and frame is not self._root:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+def collapsed_to_speedscope(collapsed, interval_ms, name):
+    """Speedscope "sampled" profile from collapsed stack lines."""
+    frames = []
+    frame_index = {}
+    samples = []
+    weights = []
+    for line in collapsed.splitlines():
+        stack, _, count = line.rpartition(' ')
+        sample = []
+        for label in stack.split(';'):
+            if label not in frame_index:
+                frame_index[label] = len(frames)
+                frames.append({'name': label})
+            sample.append(frame_index[label])
+        samples.append(sample)
+        weights.append(int(count) * interval_ms)
+
+    return json.dumps({
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': name,
+        'exporter': 'expense-tracker',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': sum(weights),
+            'samples': samples,
+            'weights': weights,
+        }],
+    })
+
+
+# ==================== MIDDLEWARE ====================
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+
+        user = _staff_user(request)
+        if user is None:
+            # Not for everyone: profiling costs CPU and exposes code paths
+            return self.get_response(request)
+
+        return self._profile(request, mode, user)
+
+    def _profile(self, request, mode, user):
+        profiler = cProfile.Profile() if mode == 'cprofile' else None
+        sampler = StackSampler()
+
+        started = time.perf_counter()
+        sampler.start()
+        if profiler is not None:
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler (a debugger, coverage) owns the hook
+                profiler, mode = None, 'sample'
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            sampler.stop()
+        elapsed = time.perf_counter() - started
+
+        try:
+            profile = self._save(request, response, mode, user, elapsed, profiler, sampler)
+        except DatabaseError:
+            logger.exception("Could not save the profile of %s", request.path)
+        else:
+            response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+    def _save(self, request, response, mode, user, elapsed, profiler, sampler):
+        from .models import RequestProfile
+
+        summary = ''
+        stats_data = b''
+        if profiler is not None:
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(SUMMARY_LINES)
+            summary = stream.getvalue()
+            profiler.create_stats()
+            stats_data = marshal.dumps(profiler.stats)
+
+        profile = RequestProfile.objects.using(DEFAULT_DB_ALIAS).create(
+            user_id=user.pk,
+            method=request.method,
+            path=request.path[:255],
+            view=request_view_name(request)[:255],
+            status_code=response.status_code,
+            duration_ms=round(elapsed * 1000, 2),
+            mode=mode,
+            summary=summary,
+            pstats=stats_data,
+            collapsed=sampler.collapsed(),
+            sample_interval_ms=INTERVAL_MS,
+        )
+
+        # Keep the newest MAX_ROWS
+        cutoff = list(
+            RequestProfile.objects.using(DEFAULT_DB_ALIAS)
+            .order_by('-pk').values_list('pk', flat=True)[MAX_ROWS:MAX_ROWS + 1]
+        )
+        if cutoff:
+            RequestProfile.objects.using(DEFAULT_DB_ALIAS).filter(pk__lte=cutoff[0]).delete()
+        return profile
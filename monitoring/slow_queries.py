@@ -0,0 +1,249 @@
+"""
+Slow-query log.
+
+`SlowQueryMiddleware` watches every SQL statement of a request (through
+`connection.execute_wrapper`, on all database aliases). Statements slower
+than SLOW_QUERY_MS are kept, a SLOW_QUERY_SAMPLE_RATE fraction of them and
+at most SLOW_QUERY_MAX_PER_REQUEST per request. Once the response is ready
+they are handed to a background thread (`SlowQueryWriter`), so the request
+pays for neither the EXPLAIN nor the insert, and saved as `SlowQuery` rows
+on 'default' with:
+- the normalized SQL (literals and placeholders as `?`, IN lists and
+  multi-row VALUES collapsed) and its fingerprint;
+- duration, database alias, view, path and user id;
+- the plan: EXPLAIN QUERY PLAN (SQLite) / EXPLAIN (Postgres) of SELECTs,
+  run on the same alias with the same parameters. Parameters stay in
+  memory; they are never stored.
+If SLOW_QUERY_QUEUE_SIZE requests are already waiting, entries are dropped.
+
+The writer thread keeps the newest SLOW_QUERY_MAX_ROWS rows, pruning at
+most every SLOW_QUERY_PRUNE_SECONDS in batches of PRUNE_BATCH_SIZE rows
+(one short transaction each). The admin lists them and groups them by
+fingerprint.
+
+Queries made while a streaming response is sent (CSV exports) run after
+the middleware returned and are not seen.
+"""
+
+import hashlib
+import logging
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+
+from proj_expense_track.metrics import request_view_name
+
+
+logger = logging.getLogger(__name__)
+
+THRESHOLD_MS = getattr(settings, 'SLOW_QUERY_MS', 100)
+SAMPLE_RATE = getattr(settings, 'SLOW_QUERY_SAMPLE_RATE', 1.0)
+MAX_PER_REQUEST = getattr(settings, 'SLOW_QUERY_MAX_PER_REQUEST', 20)
+MAX_ROWS = getattr(settings, 'SLOW_QUERY_MAX_ROWS', 10_000)
+EXPLAIN = getattr(settings, 'SLOW_QUERY_EXPLAIN', True)
+QUEUE_SIZE = getattr(settings, 'SLOW_QUERY_QUEUE_SIZE', 1000)
+PRUNE_SECONDS = getattr(settings, 'SLOW_QUERY_PRUNE_SECONDS', 60)
+
+PRUNE_BATCH_SIZE = 1000
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ROWS = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+_SPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """SQL with the values taken out, so runs with other values compare equal."""
+    sql = _STRING.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _NUMBER.sub('?', sql)
+    sql = _LIST.sub('(...)', sql)
+    sql = _ROWS.sub('(...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()
+
+
+class SlowQueryRecorder:
+    """execute_wrapper hook keeping the slow statements of one request."""
+
+    def __init__(self, threshold_ms=THRESHOLD_MS):
+        self.threshold = threshold_ms / 1000
+        self.entries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            if (elapsed >= self.threshold and len(self.entries) < MAX_PER_REQUEST
+                    and random.random() < SAMPLE_RATE):
+                # Parameters are only needed (and only kept) to EXPLAIN a single SELECT
+                explainable = not many and sql.lstrip()[:6].upper() in ('SELECT', 'WITH ')
+                self.entries.append(
+                    (context['connection'].alias, sql, params if explainable else None, elapsed, explainable)
+                )
+
+
+def explain(alias, sql, params):
+    """The database's plan for `sql`, as text ('' where unsupported)."""
+    connection = connections[alias]
+    if connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif connection.vendor == 'postgresql':
+        prefix = 'EXPLAIN '
+    else:
+        return ''
+
+    try:
+        # Own savepoint: a failing EXPLAIN must not break an open transaction
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+    except DatabaseError as e:
+        return f"EXPLAIN failed: {e}"
+
+    if connection.vendor == 'postgresql':
+        return '\n'.join(row[0] for row in rows)
+
+    # SQLite rows: (id, parent id, unused, detail); indent children under parents
+    depth = {0: -1}
+    lines = []
+    for node_id, parent_id, _, detail in rows:
+        depth[node_id] = depth.get(parent_id, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return '\n'.join(lines)
+
+
+def save_slow_queries(entries, view='', path='', user_id=None):
+    from .models import SlowQuery
+
+    rows = []
+    for alias, sql, params, elapsed, explainable in entries:
+        normalized = normalize_sql(sql)
+        rows.append(SlowQuery(
+            fingerprint=fingerprint(normalized),
+            sql=normalized,
+            duration_ms=round(elapsed * 1000, 2),
+            database=alias,
+            view=view[:255],
+            path=path[:255],
+            user_id=user_id,
+            plan=explain(alias, sql, params) if EXPLAIN and explainable else '',
+        ))
+
+    SlowQuery.objects.using(DEFAULT_DB_ALIAS).bulk_create(rows)
+
+
+def prune_slow_queries(max_rows=MAX_ROWS, batch_size=PRUNE_BATCH_SIZE):
+    """Drop everything older than the newest `max_rows` rows; returns the number deleted."""
+    from .models import SlowQuery
+
+    rows = SlowQuery.objects.using(DEFAULT_DB_ALIAS)
+    cutoff = list(rows.order_by('-pk').values_list('pk', flat=True)[max_rows:max_rows + 1])
+    if not cutoff:
+        return 0
+
+    deleted = 0
+    while True:
+        # Small deletes: the write lock is never held for long
+        batch = list(rows.filter(pk__lte=cutoff[0]).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += rows.filter(pk__in=batch).delete()[0]
+
+
+class SlowQueryWriter:
+    """Saves recorded slow queries on a background thread."""
+
+    def __init__(self, max_queued=QUEUE_SIZE, prune_seconds=PRUNE_SECONDS):
+        self.prune_seconds = prune_seconds
+        self._queue = queue.Queue(max_queued)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+
+    def submit(self, entries, **context):
+        """Queue one request's entries for `save_slow_queries(entries, **context)`."""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait((entries, context))
+        except queue.Full:
+            logger.warning("Slow-query queue full; dropped %d entries", len(entries))
+
+    def join(self):
+        """Wait until everything submitted so far is saved."""
+        self._queue.join()
+
+    def _ensure_thread(self):
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='slow-query-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            entries, context = self._queue.get()
+            try:
+                save_slow_queries(entries, **context)
+                if time.monotonic() >= self._next_prune:
+                    self._next_prune = time.monotonic() + self.prune_seconds
+                    prune_slow_queries()
+            except Exception:
+                logger.exception("Could not save slow queries for %s", context.get('path'))
+                # Reconnect on the next batch
+                connections.close_all()
+            finally:
+                self._queue.task_done()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_slow_query_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = SlowQueryWriter()
+    return _writer
+
+
+class SlowQueryMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'SLOW_QUERY_LOG', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = SlowQueryRecorder()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        if recorder.entries:
+            user = getattr(request, 'user', None)
+            get_slow_query_writer().submit(
+                recorder.entries,
+                view=request_view_name(request),
+                path=request.path,
+                user_id=user.pk if user is not None and user.is_authenticated else None,
+            )
+        return response
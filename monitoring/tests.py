@@ -0,0 +1,208 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from account.authentication import issue_tokens
+from api_expenses.models import Expense
+from api_expenses.serializers import ExpenseSerializer
+
+from proj_expense_track import metrics
+from . import slow_queries
+from .models import RequestProfile, SlowQuery
+from .profiling import ProfilingMiddleware
+
+
+def _exited_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+class MetricsFilesTests(SimpleTestCase):
+
+    def setUp(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir, ignore_errors=True)
+        override = override_settings(METRICS_DIR=metrics_dir, METRICS_ENABLED=True)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.metrics_dir = metrics_dir
+
+    def _write(self, name, count):
+        with open(os.path.join(self.metrics_dir, name), 'w') as f:
+            json.dump([['cache_requests_total', {'cache': 'test', 'result': 'hit'}, [count]]], f)
+
+    def _hits(self):
+        return metrics.collect().get(('cache_requests_total', (('cache', 'test'), ('result', 'hit'))))
+
+    def test_dead_worker_file_is_folded_into_the_total(self):
+        self._write(f'{_exited_pid()}-1.json', 3)
+        self._write(f'{os.getppid()}-1.json', 4)
+
+        self.assertEqual(self._hits(), [7])
+        self.assertEqual(
+            sorted(os.listdir(self.metrics_dir)), ['.lock', f'{os.getppid()}-1.json', metrics.EXITED_FILE]
+        )
+
+        # Later dead workers add to the total; nothing is counted twice
+        self._write(f'{_exited_pid()}-2.json', 5)
+        self.assertEqual(self._hits(), [12])
+        self.assertEqual(self._hits(), [12])
+
+    def test_worker_exit_folds_its_own_file(self):
+        registry = metrics.Registry()
+        registry.inc('cache_requests_total', 2, cache='test', result='hit')
+
+        registry.close()
+
+        self.assertEqual(os.listdir(self.metrics_dir).count(metrics.EXITED_FILE), 1)
+        self.assertFalse([name for name in os.listdir(self.metrics_dir) if name[0].isdigit()])
+        self.assertEqual(self._hits(), [2])
+
+
+class SlowQueryWriterTests(TransactionTestCase):
+    # The writer thread has its own connection: rows must really be committed
+
+    def test_explain_and_save_run_off_the_request_thread(self):
+        writer = slow_queries.SlowQueryWriter()
+        threads = []
+        real_explain = slow_queries.explain
+
+        def explain(*args):
+            threads.append(threading.current_thread())
+            return real_explain(*args)
+
+        sql = 'SELECT "id" FROM "monitoring_slowquery" WHERE "view" = %s'
+        with mock.patch.object(slow_queries, 'explain', side_effect=explain):
+            writer.submit([('default', sql, ('x',), 0.25, True)], view='v', path='/p', user_id=7)
+            writer.join()
+
+        self.assertNotIn(threading.current_thread(), threads)
+        saved = SlowQuery.objects.get()
+        self.assertEqual((saved.duration_ms, saved.view, saved.path, saved.user_id), (250.0, 'v', '/p', 7))
+        self.assertEqual(saved.sql, 'SELECT "id" FROM "monitoring_slowquery" WHERE "view" = ?')
+        self.assertTrue(saved.plan)
+
+    def test_full_queue_drops_entries(self):
+        writer = slow_queries.SlowQueryWriter(max_queued=1)
+        started, release = threading.Event(), threading.Event()
+
+        def save(*args, **kwargs):
+            started.set()
+            release.wait()
+
+        with mock.patch.object(slow_queries, 'save_slow_queries', side_effect=save):
+            writer.submit(['busy'])
+            started.wait()
+            writer.submit(['queued'])
+            with self.assertLogs(slow_queries.logger, 'WARNING'):
+                writer.submit(['dropped'])
+            release.set()
+            writer.join()
+
+    def test_prune_keeps_the_newest_rows_in_batches(self):
+        SlowQuery.objects.bulk_create(
+            SlowQuery(fingerprint=str(i), sql='SELECT ?', duration_ms=i, database='default') for i in range(25)
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            deleted = slow_queries.prune_slow_queries(max_rows=10, batch_size=4)
+
+        self.assertEqual(deleted, 15)
+        self.assertEqual(
+            sorted(SlowQuery.objects.values_list('duration_ms', flat=True)), [float(i) for i in range(15, 25)]
+        )
+        deletes = [q for q in queries if q['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 4)
+
+
+@override_settings(REQUEST_TIMING_HEADERS=True, REQUEST_TIMING_METRICS=['queries', 'db', 'view', 'serialize', 'render', 'total'])
+class RequestTimingTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='timing@example.com', username='timing', password='S3cure-pass!'
+        )
+        for amount in ('1.00', '2.00'):
+            Expense.objects.create(user=self.user, amount=amount, date=date(2026, 1, 1))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _server_timing(self, response):
+        timings = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, duration = entry.split(';')[:2]
+            timings[name] = float(duration.split('=')[1])
+        return timings
+
+    def test_serializer_time_is_reported_apart_from_the_view(self):
+        original = ExpenseSerializer.to_representation
+
+        def slow(serializer, instance):
+            time.sleep(0.05)
+            return original(serializer, instance)
+
+        with mock.patch.object(ExpenseSerializer, 'to_representation', slow):
+            response = self.client.get('/api/expenses/')
+
+        self.assertEqual(response.status_code, 200)
+        timings = self._server_timing(response)
+        self.assertEqual(set(timings), {'db', 'view', 'serialize', 'render', 'total'})
+        self.assertGreaterEqual(timings['serialize'], 100)
+        self.assertLess(timings['view'], 100)
+        self.assertGreaterEqual(timings['total'], timings['view'] + timings['serialize'])
+
+
+class ProfilingGateTests(TestCase):
+    url = '/api/expenses/'
+
+    def setUp(self):
+        User = get_user_model()
+        self.staff = User.objects.create_user(
+            email='staff@example.com', username='staff', password='S3cure-pass!', is_staff=True
+        )
+        self.member = User.objects.create_user(
+            email='member@example.com', username='member', password='S3cure-pass!'
+        )
+
+    def _get(self, user, **headers):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens(user).access_token}')
+        response = client.get(self.url, **headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_staff_request_with_the_flag_is_profiled(self):
+        response = self._get(self.staff, HTTP_X_PROFILE='sample')
+
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response['X-Profile-Id'], str(profile.pk))
+        self.assertEqual((profile.user_id, profile.mode, profile.path), (self.staff.pk, 'sample', self.url))
+
+    def test_flag_is_ignored_for_other_users_and_unflagged_requests(self):
+        response = self._get(self.member, HTTP_X_PROFILE='sample')
+        self.assertNotIn('X-Profile-Id', response)
+
+        response = self._get(self.staff)
+        self.assertNotIn('X-Profile-Id', response)
+
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_middleware_removes_itself_when_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ProfilingMiddleware(lambda request: None)
@@ -0,0 +1,168 @@
+"""
+File responses with HTTP caching and byte-range support.
+
+Django's FileResponse always sends the whole file and sets no validators.
+`serve_file` adds an ETag, Last-Modified / If-Modified-Since, Accept-Ranges
+/ single-range 206 responses and a caller-chosen Cache-Control, so browsers
+and CDNs can cache and resume.
+
+Behind a front-end server, set MEDIA_SERVE_MODE so the transfer itself is
+handed off and no Python worker copies file bytes:
+- 'nginx':    X-Accel-Redirect to MEDIA_ACCEL_REDIRECT_PREFIX + path
+              (an `internal` location aliased to MEDIA_ROOT)
+- 'sendfile': X-Sendfile with the absolute path (Apache mod_xsendfile,
+              lighttpd)
+- 'django':   stream from Python (default, development)
+"""
+
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+
+
+SERVE_MODE = getattr(settings, 'MEDIA_SERVE_MODE', 'django')
+ACCEL_REDIRECT_PREFIX = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class _RangeReader:
+    """Read at most `length` bytes from an open file (no tell(), so
+    FileResponse leaves Content-Length to us)."""
+
+    def __init__(self, fileobj, start, length):
+        fileobj.seek(start)
+        self._file = fileobj
+        self._remaining = length
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+def file_etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) inclusive for a single `bytes=` range, None if the
+    header is absent or not a single byte range (serve the full file), or
+    False if the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+        return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and int(mtime) <= since
+
+
+def _handoff_response(path, content_type, filename, as_attachment):
+    """Let the front-end server send the file (nginx / sendfile modes)."""
+    response = HttpResponse(content_type=content_type)
+    if SERVE_MODE == 'nginx':
+        relative = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + relative
+    else:
+        response['X-Sendfile'] = os.path.abspath(path)
+
+    disposition = 'attachment' if as_attachment else 'inline'
+    response['Content-Disposition'] = f'{disposition}; filename="{filename}"'
+    return response
+
+
+def serve_file(request, path, content_type=None, cache_control=None,
+               filename=None, as_attachment=False):
+    """Serve `path` honouring conditional and Range requests."""
+    content_type = content_type or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    filename = filename or os.path.basename(path)
+
+    if SERVE_MODE in ('nginx', 'sendfile'):
+        # The front-end server handles validators and ranges itself
+        response = _handoff_response(path, content_type, filename, as_attachment)
+        if cache_control:
+            response['Cache-Control'] = cache_control
+        return response
+
+    stat = os.stat(path)
+    etag = file_etag(stat)
+
+    if _not_modified(request, etag, stat.st_mtime):
+        response = HttpResponse(status=304)
+    else:
+        byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+        if request.headers.get('If-Range') not in (None, etag):
+            byte_range = None
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+        fileobj = open(path, 'rb')
+
+        if byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            response = FileResponse(
+                _RangeReader(fileobj, start, length),
+                status=206,
+                content_type=content_type,
+                as_attachment=as_attachment,
+                filename=filename
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = str(length)
+        else:
+            response = FileResponse(
+                fileobj,
+                content_type=content_type,
+                as_attachment=as_attachment,
+                filename=filename
+            )
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    if cache_control:
+        response['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,94 @@
+"""
+Authenticated media serving.
+
+Replaces the `static()` helper for MEDIA_URL: every file under MEDIA_ROOT is
+served only to its owner (or staff), then handed to the front-end server
+or streamed with conditional/Range support by `fileserve.serve_file`.
+
+Apps declare who owns files under a path prefix with `register_media_owner`
+(see AccountConfig.ready). Files under an unregistered prefix are staff-only.
+
+Browsers send no Authorization header for `<img src>`, so API responses
+hand out `signed_media_url`s instead: the URL carries a `sig` for that one
+path, valid for MEDIA_SIGNED_URL_SECONDS, and needs no credentials.
+"""
+
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.utils._os import safe_join
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotAuthenticated
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from .fileserve import serve_file
+
+
+SIGNED_URL_SECONDS = getattr(settings, 'MEDIA_SIGNED_URL_SECONDS', 3600)
+_SIGNING_SALT = 'proj_expense_track.media'
+
+
+# prefix -> callable(relative_path) returning the owner's user id or None
+_OWNER_RESOLVERS = {}
+
+
+def register_media_owner(prefix, resolver):
+    _OWNER_RESOLVERS[prefix] = resolver
+
+
+def media_owner_id(relative_path):
+    for prefix, resolver in _OWNER_RESOLVERS.items():
+        if relative_path.startswith(prefix):
+            return resolver(relative_path)
+    return None
+
+
+def signed_media_url(request, name):
+    """Absolute URL of the media file `name` that works without credentials until it expires."""
+    signed = signing.TimestampSigner(salt=_SIGNING_SALT).sign(name)
+    token = signed[len(name) + 1:]
+    return request.build_absolute_uri(f"{settings.MEDIA_URL}{quote(name)}?sig={token}")
+
+
+def _valid_signature(relative_path, token):
+    if not token:
+        return False
+    try:
+        signing.TimestampSigner(salt=_SIGNING_SALT).unsign(
+            f'{relative_path}:{token}', max_age=SIGNED_URL_SECONDS
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+@api_view(['GET', 'HEAD'])
+@permission_classes([AllowAny])
+def serve_media(request, path):
+    """Serve a file from MEDIA_ROOT after an ownership check."""
+    not_found = Response({'error': 'File not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except Exception:
+        return not_found
+
+    relative_path = os.path.relpath(full_path, settings.MEDIA_ROOT).replace(os.sep, '/')
+
+    if not _valid_signature(relative_path, request.GET.get('sig')):
+        if not request.user.is_authenticated:
+            raise NotAuthenticated
+
+        # 404 rather than 403 so file names of other users are not confirmed
+        # Owner check first: is_staff is a deferred field on the lean JWT user
+        if media_owner_id(relative_path) != request.user.pk and not request.user.is_staff:
+            return not_found
+
+    if not os.path.isfile(full_path):
+        return not_found
+
+    return serve_file(request, full_path, cache_control='private, max-age=3600')
@@ -0,0 +1,383 @@
+"""
+Prometheus-style metrics without an external collector.
+
+Each process counts into its own in-memory registry and a background thread
+writes it to METRICS_DIR/<pid>-<start>.json every METRICS_FLUSH_SECONDS
+(atomically, via a temp file and rename). `/metrics` merges every file in
+the directory, so all gunicorn workers are reported together, and renders
+the Prometheus text format. A worker's file is folded into
+METRICS_DIR/_exited.json when it exits, or, if it died without running its
+exit handlers, on the first scrape after its pid is gone (as
+prometheus_client's mark_process_dead): counters and histograms stay
+monotonic across worker restarts without one file per worker ever started.
+The pid check assumes METRICS_DIR is local to the host. Clear the directory
+on deploy.
+
+Recorded:
+- http_requests_total{view,method,status}
+- http_request_duration_seconds{view}        (histogram)
+- http_request_db_queries{view}              (histogram)
+- cache_requests_total{cache,result}         hit ratio = hit / (hit + miss)
+- export_size_bytes{format}                  (histogram)
+
+`/metrics` is open to a request bearing METRICS_TOKEN, or to staff users.
+"""
+
+import atexit
+import contextlib
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+try:
+    import fcntl
+except ImportError:  # Windows: no directory lock, exited workers' files are kept
+    fcntl = None
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+# name -> (type, help, buckets)
+METRICS = {
+    'http_requests_total': ('counter', 'Requests served, by view, method and status', None),
+    'http_request_duration_seconds': ('histogram', 'Time to produce the response, by view', LATENCY_BUCKETS),
+    'http_request_db_queries': ('histogram', 'SQL statements per request, by view', QUERY_BUCKETS),
+    'cache_requests_total': ('counter', 'Application cache lookups, by cache and hit/miss', None),
+    'export_size_bytes': ('histogram', 'Size of generated exports, by format', SIZE_BUCKETS),
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Sum of every exited worker's numbers
+EXITED_FILE = '_exited.json'
+
+
+def _enabled():
+    return getattr(settings, 'METRICS_ENABLED', True)
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Registry:
+    """This process's metrics, periodically written to its own file."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _reset(self):
+        # First use, or first use after a fork: start empty with a new file
+        self._pid = os.getpid()
+        self._values = {}
+        self._dirty = False
+        self._path = os.path.join(
+            settings.METRICS_DIR, f'{self._pid}-{int(time.time() * 1000)}.json'
+        )
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _entry(self, name, labels):
+        if self._pid != os.getpid():
+            self._reset()
+        key = (name, _labels_key(labels))
+        entry = self._values.get(key)
+        if entry is None:
+            buckets = METRICS[name][2]
+            # counter: [value]; histogram: [bucket counts..., sum, count]
+            entry = self._values[key] = [0] * (len(buckets) + 2) if buckets else [0]
+        self._dirty = True
+        return entry
+
+    def inc(self, name, value=1, **labels):
+        if not _enabled():
+            return
+        with self._lock:
+            self._entry(name, labels)[0] += value
+
+    def observe(self, name, value, **labels):
+        if not _enabled():
+            return
+        buckets = METRICS[name][2]
+        with self._lock:
+            entry = self._entry(name, labels)
+            index = bisect_left(buckets, value)
+            if index < len(buckets):
+                entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def flush(self):
+        with self._lock:
+            if self._pid != os.getpid() or not self._dirty:
+                return
+            snapshot = [[name, dict(labels), list(entry)] for (name, labels), entry in self._values.items()]
+            self._dirty = False
+            path = self._path
+
+        _write_snapshot(path, snapshot)
+
+    def close(self):
+        """Worker exit: fold this process's file into the exited total."""
+        self.flush()
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            path = self._path
+            # Stops the flush thread; a later use starts a new file
+            self._pid = None
+        absorb_files([path])
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(getattr(settings, 'METRICS_FLUSH_SECONDS', 1))
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+
+registry = Registry()
+atexit.register(registry.close)
+
+
+def inc(name, value=1, **labels):
+    registry.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+
+def cache_lookup(cache_name, hit):
+    inc('cache_requests_total', cache=cache_name, result='hit' if hit else 'miss')
+
+
+def measure_stream(chunks, export_format):
+    """Pass a streaming body through, recording its size once fully sent."""
+    size = 0
+    for chunk in chunks:
+        size += len(chunk.encode() if isinstance(chunk, str) else chunk)
+        yield chunk
+    observe('export_size_bytes', size, format=export_format)
+
+
+# ==================== EXPOSITION ====================
+
+def _write_snapshot(path, snapshot):
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(temp_path, path)
+
+
+def _read_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(merged, snapshot):
+    for name, labels, values in snapshot:
+        if name not in METRICS:
+            continue
+        key = (name, _labels_key(labels))
+        total = merged.get(key)
+        if total is None:
+            merged[key] = list(values)
+        elif len(total) == len(values):
+            merged[key] = [a + b for a, b in zip(total, values)]
+
+
+@contextlib.contextmanager
+def _directory_lock(exclusive):
+    """Readers share the directory; folding files into the total is exclusive."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    with open(os.path.join(settings.METRICS_DIR, '.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def absorb_files(paths):
+    """Add process files to the exited total and delete them."""
+    if fcntl is None:
+        return
+    exited_path = os.path.join(settings.METRICS_DIR, EXITED_FILE)
+    with _directory_lock(exclusive=True):
+        merged = {}
+        _merge(merged, _read_snapshot(exited_path) or [])
+        absorbed = []
+        for path in paths:
+            snapshot = _read_snapshot(path)
+            # None: already absorbed by a concurrent scrape
+            if snapshot is not None:
+                _merge(merged, snapshot)
+                absorbed.append(path)
+        if not absorbed:
+            return
+        _write_snapshot(exited_path, [[name, dict(labels), values] for (name, labels), values in merged.items()])
+        for path in absorbed:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, under another user
+        return True
+    return True
+
+
+def _is_dead_process_file(path):
+    pid = os.path.basename(path).split('-', 1)[0]
+    if not pid.isdigit():
+        return False
+    if int(pid) == os.getpid():
+        # Our pid, reused from an earlier process: any file but ours is dead
+        return path != getattr(registry, '_path', None)
+    return not _pid_alive(int(pid))
+
+
+def collect():
+    """Merge every process file: {(name, labels key): values}."""
+    pattern = os.path.join(settings.METRICS_DIR, '*.json')
+    dead = [path for path in glob.glob(pattern) if _is_dead_process_file(path)]
+    if dead:
+        absorb_files(dead)
+
+    merged = {}
+    # Shared lock: a file is never counted both on its own and in the total
+    with _directory_lock(exclusive=False):
+        for path in glob.glob(pattern):
+            snapshot = _read_snapshot(path)
+            if snapshot is not None:
+                _merge(merged, snapshot)
+    return merged
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render_text(merged):
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = sorted((labels, values) for (n, labels), values in merged.items() if n == name)
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, values in series:
+            if kind == 'counter':
+                lines.append(f'{name}{_format_labels(labels)} {_number(values[0])}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, values):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", _number(float(bound)))])} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {values[-1]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_number(values[-2])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {values[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def _authorized(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and header.startswith('Bearer ') and constant_time_compare(header[7:], token):
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_active and user.is_staff
+
+
+@require_GET
+def metrics_view(request):
+    if not _authorized(request):
+        return HttpResponseForbidden('Forbidden')
+    # Include this process's latest numbers
+    registry.flush()
+    return HttpResponse(render_text(collect()), content_type=CONTENT_TYPE)
+
+
+# ==================== REQUEST METRICS ====================
+
+def request_view_name(request):
+    """URL name (or dotted path) of the view that served the request.
+
+    Used instead of the path so label cardinality stays bounded.
+    """
+    match = getattr(request, 'resolver_match', None)
+    return (match.view_name or match._func_path) if match else 'unresolved'
+
+
+class _QueryCounter:
+    __slots__ = ('count',)
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not _enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        counter = _QueryCounter()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+
+        elapsed = time.perf_counter() - started
+        view = request_view_name(request)
+
+        inc('http_requests_total', view=view, method=request.method, status=response.status_code)
+        observe('http_request_duration_seconds', elapsed, view=view)
+        observe('http_request_db_queries', counter.count, view=view)
+        return response
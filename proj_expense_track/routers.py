@@ -0,0 +1,129 @@
+"""
+Read-replica routing.
+
+Read-only endpoints opt in with `@replica_reads` (placed under
+`@api_view`, so request.user is already authenticated). While such a view
+runs, ORM reads go to DATABASE_REPLICA_ALIAS; everything else, and every
+write, uses 'default'.
+
+Read-your-writes: a replica lags the primary, so a user who changed data
+must not be sent to it straight away. Any request that wrote to the
+database pins its user to the primary for READ_YOUR_WRITES_SECONDS
+(`ReadYourWritesMiddleware`, tracked in the cache), and once a request
+writes, its remaining reads go to the primary as well. "Wrote" means an
+INSERT/UPDATE/DELETE was executed (seen by an execute wrapper), not that a
+write alias was resolved: get_or_create finding its row or a
+select_for_update read leaves the request on the replica.
+
+With no replica configured the router sends everything to 'default'.
+"""
+
+import contextvars
+import functools
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+
+REPLICA_ALIAS = getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica')
+PIN_SECONDS = getattr(settings, 'READ_YOUR_WRITES_SECONDS', 10)
+
+PRIMARY_ALIAS = 'default'
+
+_WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+# Per request (contextvars are per thread / per task)
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+_wrote = contextvars.ContextVar('db_wrote', default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def _pin_key(user_id):
+    return f'db:pin-primary:{user_id}'
+
+
+def pin_to_primary(user_id):
+    cache.set(_pin_key(user_id), 1, PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return cache.get(_pin_key(user_id)) is not None
+
+
+def mark_wrote():
+    """Record a write made on this request's behalf (e.g. by another thread)."""
+    _wrote.set(True)
+
+
+def _record_writes(execute, sql, params, many, context):
+    """execute_wrapper hook: flag the request once it runs a data-changing statement."""
+    if sql.lstrip()[:7].upper().startswith(_WRITE_STATEMENTS):
+        _wrote.set(True)
+    return execute(sql, params, many, context)
+
+
+def read_alias_for(user):
+    """Alias to read from for `user` outside the router, e.g. for streamed responses."""
+    if not replica_configured() or _wrote.get():
+        return PRIMARY_ALIAS
+    if user is not None and user.is_authenticated and is_pinned(user.pk):
+        return PRIMARY_ALIAS
+    return REPLICA_ALIAS
+
+
+def replica_reads(view):
+    """Serve the view's reads from the replica unless the user is pinned to the primary."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        alias = read_alias_for(getattr(request, 'user', None))
+        token = _use_replica.set(alias == REPLICA_ALIAS)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and not _wrote.get() and replica_configured():
+            return REPLICA_ALIAS
+        return PRIMARY_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary, never migrated on its own
+        return db != REPLICA_ALIAS
+
+
+class ReadYourWritesMiddleware:
+    """Pin users who wrote during this request to the primary for a while."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _wrote.set(False)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_record_writes))
+                response = self.get_response(request)
+            # DRF sets the authenticated user on the underlying HttpRequest
+            user = getattr(request, 'user', None)
+            if _wrote.get() and user is not None and user.is_authenticated and replica_configured():
+                pin_to_primary(user.pk)
+            return response
+        finally:
+            _wrote.reset(token)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -51,6 +52,7 @@ INSTALLED_APPS = [
     'api_expenses.apps.ApiExpensesConfig',
     'dashboard.apps.DashboardConfig',
     'contact.apps.ContactConfig',
+    'monitoring.apps.MonitoringConfig',
 
     # DRF
     'rest_framework',
@@ -58,14 +60,23 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Ahead of metrics/timing so saving the slow-query log is not counted in them
+    'monitoring.slow_queries.SlowQueryMiddleware',
+    # First, so their totals cover every other middleware
+    'proj_expense_track.metrics.MetricsMiddleware',
+    'proj_expense_track.timing.RequestTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'proj_expense_track.sharding.ShardContextMiddleware',
+    'proj_expense_track.routers.ReadYourWritesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Last, so a profile is about the view rather than the middleware
+    'monitoring.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'proj_expense_track.urls'
@@ -73,7 +84,7 @@ ROOT_URLCONF = 'proj_expense_track.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -92,13 +103,136 @@ WSGI_APPLICATION = 'proj_expense_track.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')   # 'sqlite' or 'postgresql'
+
+# SQLite tuning, applied to every new connection through init_command
+# (Django 5.1+). WAL lets readers run alongside the single writer; with WAL,
+# synchronous=NORMAL only risks the last commits on an OS crash, not an
+# application crash. cache_size is per connection (negative = KiB).
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', 20))   # seconds to wait for the write lock
+
+# Postgres (DB_ENGINE=postgresql). Connections are pooled per process, so
+# size the pool from the server's process model: each of WEB_CONCURRENCY
+# gunicorn workers runs WEB_THREADS request threads, plus one connection for
+# the expense write coalescer. The server then needs roughly
+# WEB_CONCURRENCY x DB_POOL_MAX_SIZE connections per database alias
+# (default, replica, each shard) - keep that under max_connections.
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 2))
+WEB_THREADS = int(os.getenv('WEB_THREADS', 4))
+
+DB_POOL = os.getenv('DB_POOL', 'true').lower() in ('1', 'true', 'yes')
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 2))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', WEB_THREADS + 1))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))        # seconds a request waits for a free connection
+DB_POOL_MAX_IDLE = float(os.getenv('DB_POOL_MAX_IDLE', 600))     # idle connections above min_size are closed after this
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 600))         # persistent connections when DB_POOL is off
+DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', 5))
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'expense_tracker'),
+            'USER': os.getenv('DB_USER', 'postgres'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'OPTIONS': {
+                'connect_timeout': DB_CONNECT_TIMEOUT,
+            },
+        }
+    }
+
+    if DB_POOL:
+        # Django's native psycopg pool (needs psycopg[pool]); a closed
+        # connection goes back to the pool, so CONN_MAX_AGE must stay 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+            'max_idle': DB_POOL_MAX_IDLE,
+        }
+    else:
+        # Persistent per-thread connections, checked before each request reuses them
+        DATABASES['default']['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+        DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                'timeout': SQLITE_BUSY_TIMEOUT,
+                # Take the write lock at BEGIN: a deferred transaction that
+                # upgrades from read to write fails with "database is locked"
+                # immediately, without waiting out the busy timeout
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    f'PRAGMA journal_mode={SQLITE_JOURNAL_MODE};'
+                    f'PRAGMA synchronous={SQLITE_SYNCHRONOUS};'
+                    f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB};'
+                    f'PRAGMA mmap_size={SQLITE_MMAP_SIZE};'
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+        }
+    }
+
+# Read replica (proj_expense_track/routers.py). Views marked @replica_reads
+# read from it; writes and recently-writing users stay on 'default'.
+# Locally, point DATABASE_REPLICA_NAME at a second SQLite file and keep it
+# fresh with `python manage.py sync_sqlite_replica --loop`.
+DATABASE_REPLICA_ALIAS = 'replica'
+READ_YOUR_WRITES_SECONDS = int(os.getenv('READ_YOUR_WRITES_SECONDS', 10))
+
+if os.getenv('DATABASE_REPLICA_NAME'):
+    DATABASES[DATABASE_REPLICA_ALIAS] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DATABASE_REPLICA_NAME'),
+        'HOST': os.getenv('DATABASE_REPLICA_HOST', DATABASES['default'].get('HOST', '')),
+        # Tests run against the primary only
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Shards (proj_expense_track/sharding.py): each user's expenses, budgets and
+# settings live on one of DATABASE_SHARDS. DATABASE_SHARD_NAMES is a
+# comma-separated list of extra SQLite files (or Postgres databases on
+# DB_HOST), added as shard_1, shard_2, ...
+# Create their schema with `python manage.py migrate --database shard_1`.
+DATABASE_SHARDS = ['default']
+SHARD_MAP_CACHE_SECONDS = int(os.getenv('SHARD_MAP_CACHE_SECONDS', 60))
+
+for index, name in enumerate(filter(None, os.getenv('DATABASE_SHARD_NAMES', '').split(',')), start=1):
+    DATABASES[f'shard_{index}'] = {**DATABASES['default'], 'NAME': name.strip()}
+    DATABASE_SHARDS.append(f'shard_{index}')
+
+DATABASE_ROUTERS = [
+    'proj_expense_track.sharding.ShardRouter',
+    'proj_expense_track.routers.ReplicaRouter',
+]
+
+# ----------------------------Cache---------------------------------------
+# Local memory by default (per process). Point CACHE_BACKEND/CACHE_LOCATION at
+# a shared cache (e.g. django.core.cache.backends.redis.RedisCache) so login
+# and OTP rate limits are enforced across all workers.
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
+# Per-user UserSettings cache lifetime. Saves invalidate the entry, which
+# reaches every worker only through a shared cache; with the per-process
+# default the lifetime is capped at USER_SETTINGS_LOCAL_CACHE_SECONDS so
+# other workers pick up a change within seconds.
+USER_SETTINGS_CACHE_SECONDS = int(os.getenv('USER_SETTINGS_CACHE_SECONDS', 60 * 60))
+USER_SETTINGS_LOCAL_CACHE_SECONDS = int(os.getenv('USER_SETTINGS_LOCAL_CACHE_SECONDS', 5))
+
 # ----------------------Custom User Model-------------------------------
 
 AUTH_USER_MODEL = 'account.User'
@@ -108,7 +242,8 @@ from datetime import timedelta
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Builds request.user from token claims - no User query per request
+        'account.authentication.LeanJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -121,6 +256,27 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Login / OTP abuse protection (account/throttling.py)
+# scope -> (requests allowed per IP in a burst, seconds to refill the burst)
+AUTH_RATE_LIMITS = {
+    'login': (10, 60),
+    'otp_register': (10, 60),   # verify-otp (sign-up)
+    'otp_reset': (10, 60),      # password-reset/verify-otp
+}
+
+# Number of reverse proxies in front of the app that append to
+# X-Forwarded-For. 0: use REMOTE_ADDR only (the header is client-supplied
+# and would let anyone pick a fresh rate-limit bucket per request).
+TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', 0))
+
+# How long LeanJWTAuthentication trusts the cached is_active / password state
+AUTH_USER_STATE_CACHE_SECONDS = 60
+
+# Failed-attempt lockout
+AUTH_MAX_FAILED_ATTEMPTS = 5      # wrong passwords / OTPs per (IP, email) ...
+AUTH_LOCKOUT_SECONDS = 15 * 60    # ... within this window before that pair is locked out
+AUTH_SLOWDOWN_SECONDS = 30        # past the limit from all IPs: one attempt per email this often
+
 
 
 # Password validation
@@ -176,11 +332,44 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+
+# Outbox worker (python manage.py send_outbox_emails --loop)
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 50))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+EMAIL_OUTBOX_BACKOFF_SECONDS = int(os.getenv('EMAIL_OUTBOX_BACKOFF_SECONDS', 30))
+EMAIL_OUTBOX_MAX_BACKOFF_SECONDS = int(os.getenv('EMAIL_OUTBOX_MAX_BACKOFF_SECONDS', 3600))
+EMAIL_OUTBOX_LEASE_SECONDS = int(os.getenv('EMAIL_OUTBOX_LEASE_SECONDS', 300))   # claimed rows hidden from other workers
+
+# Contact form (contact/views.py, contact/notifications.py)
+CONTACT_RATE_LIMIT = (5, 600)          # messages per IP in a burst, seconds to refill
+CONTACT_DEDUPE_SECONDS = 3600          # identical messages within this window are stored once
+# Staff addresses that receive the digest queued by send_contact_digest
+CONTACT_NOTIFY_EMAILS = [e.strip() for e in os.getenv('CONTACT_NOTIFY_EMAILS', '').split(',') if e.strip()]
+CONTACT_DIGEST_MAX_MESSAGES = 100
 # -------------------------------------------------------------------------
 
 # -----------------------Media Files Configuration---------------------------
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# How /media/ files are delivered after the ownership check (proj_expense_track/fileserve.py):
+# 'django' streams from Python, 'nginx' uses X-Accel-Redirect, 'sendfile' uses X-Sendfile
+MEDIA_SERVE_MODE = os.getenv('MEDIA_SERVE_MODE', 'django')
+# nginx: location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+# Lifetime of the signed media URLs returned by the API (for <img src>)
+MEDIA_SIGNED_URL_SECONDS = int(os.getenv('MEDIA_SIGNED_URL_SECONDS', 3600))
+
+# Avatar uploads (account/avatars.py)
+AVATAR_MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+AVATAR_MAX_PIXELS = 40_000_000          # header check, guards against decompression bombs
+AVATAR_THUMBNAIL_SIZE = 256             # square thumbnail edge in px
+
+# Receipt attachments (api_expenses/receipts.py)
+RECEIPT_MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+RECEIPT_CHUNK_SIZE = 1024 * 1024        # clients PUT chunks of exactly this size (last may be shorter)
+RECEIPT_UPLOAD_TTL_HOURS = 24           # unfinished uploads are purged after this
+RECEIPT_THUMBNAIL_SIZE = 320
 # -------------------------------------------------------------------------
 
 
@@ -192,4 +381,91 @@ JAZZMIN_SETTINGS = {
     "search_model": "auth.User",
     "show_sidebar": True,
     "navigation_expanded": True,
-}
\ No newline at end of file
+}
+# -----------------------Expense Anomaly Detection-------------------------
+# Expenses are flagged when their z-score against the per-category running
+# stats (all-time or EWMA) reaches the threshold.
+EXPENSE_ANOMALY_MIN_SAMPLES = int(os.getenv('EXPENSE_ANOMALY_MIN_SAMPLES', 5))
+EXPENSE_ANOMALY_Z_THRESHOLD = float(os.getenv('EXPENSE_ANOMALY_Z_THRESHOLD', 3.0))
+EXPENSE_ANOMALY_EWMA_ALPHA = float(os.getenv('EXPENSE_ANOMALY_EWMA_ALPHA', 0.3))
+# Spread assumed at least this fraction of the mean (flat histories)
+EXPENSE_ANOMALY_STD_FLOOR = float(os.getenv('EXPENSE_ANOMALY_STD_FLOOR', 0.05))
+
+# Group commit for create_expense (api_expenses/batching.py): concurrent
+# creates in one process share a transaction. Worth it on SQLite under load.
+EXPENSE_WRITE_COALESCING = os.getenv('EXPENSE_WRITE_COALESCING', 'false').lower() in ('1', 'true', 'yes')
+EXPENSE_WRITE_BATCH_SIZE = int(os.getenv('EXPENSE_WRITE_BATCH_SIZE', 64))
+EXPENSE_WRITE_MAX_DELAY_MS = float(os.getenv('EXPENSE_WRITE_MAX_DELAY_MS', 5))
+EXPENSE_WRITE_TIMEOUT_SECONDS = float(os.getenv('EXPENSE_WRITE_TIMEOUT_SECONDS', 30))   # per caller, then WriteTimeout
+# -------------------------------------------------------------------------
+
+# ---------------------------Request timing--------------------------------
+# proj_expense_track/timing.py. Metrics: queries, db, view, serialize,
+# render, total.
+# Headers (Server-Timing, X-Query-Count) reveal internals, so they default
+# to DEBUG only; the JSON log line goes to 'proj_expense_track.timing'.
+REQUEST_TIMING_METRICS = [
+    m.strip() for m in os.getenv('REQUEST_TIMING_METRICS', 'queries,db,view,serialize,render,total').split(',') if m.strip()
+]
+REQUEST_TIMING_HEADERS = os.getenv('REQUEST_TIMING_HEADERS', str(DEBUG)).lower() in ('1', 'true', 'yes')
+REQUEST_TIMING_LOG = os.getenv('REQUEST_TIMING_LOG', 'false').lower() in ('1', 'true', 'yes')
+
+# Let browser devtools and frontend code on the allowed origins read them
+CORS_EXPOSE_HEADERS = ['Server-Timing', 'X-Query-Count']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'proj_expense_track.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+# -------------------------------------------------------------------------
+
+# ------------------------------Metrics------------------------------------
+# proj_expense_track/metrics.py, served on /metrics in Prometheus text format.
+# Every process writes its numbers to its own file in METRICS_DIR (shared by
+# all gunicorn workers on the host; clear it on deploy). /metrics needs
+# "Authorization: Bearer <METRICS_TOKEN>" or a staff session.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'expense_tracker_metrics'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 1))
+# -------------------------------------------------------------------------
+
+# ---------------------------Slow query log--------------------------------
+# monitoring/slow_queries.py: statements over SLOW_QUERY_MS are saved with
+# their plan (a sample of them, capped per request and in total) and listed
+# in the admin under Monitoring > Slow queries.
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', 'true').lower() in ('1', 'true', 'yes')
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 100))
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv('SLOW_QUERY_SAMPLE_RATE', 1.0))
+SLOW_QUERY_MAX_PER_REQUEST = int(os.getenv('SLOW_QUERY_MAX_PER_REQUEST', 20))
+SLOW_QUERY_MAX_ROWS = int(os.getenv('SLOW_QUERY_MAX_ROWS', 10000))
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() in ('1', 'true', 'yes')
+# Saving (and EXPLAIN) happens on a background thread; at most this many
+# requests' worth of entries wait for it, the rest are dropped
+SLOW_QUERY_QUEUE_SIZE = int(os.getenv('SLOW_QUERY_QUEUE_SIZE', 1000))
+SLOW_QUERY_PRUNE_SECONDS = float(os.getenv('SLOW_QUERY_PRUNE_SECONDS', 60))
+# -------------------------------------------------------------------------
+
+# ---------------------------Request profiling-----------------------------
+# monitoring/profiling.py: staff requests sent with "X-Profile: cprofile"
+# (or "sample", or ?_profile=1) are profiled and kept under Monitoring >
+# Request profiles; other requests are not affected.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+PROFILING_INTERVAL_MS = float(os.getenv('PROFILING_INTERVAL_MS', 5))
+PROFILING_MAX_ROWS = int(os.getenv('PROFILING_MAX_ROWS', 200))
+
+# Let the frontend send the flag and read the profile id
+from corsheaders.defaults import default_headers
+CORS_ALLOW_HEADERS = (*default_headers, 'x-profile')
+CORS_EXPOSE_HEADERS += ['X-Profile-Id']
+# -------------------------------------------------------------------------
@@ -0,0 +1,208 @@
+"""
+User-id sharding of per-user data.
+
+Every model in SHARDED_APPS (expenses, budgets, user settings) belongs to
+exactly one user, and every view scopes by `request.user`, so a user's
+rows can live on a database of their own: one of DATABASE_SHARDS. Users,
+auth and everything else stay on 'default'.
+
+The shard map is the `account.UserShard` table on 'default', cached per
+user for SHARD_MAP_CACHE_SECONDS. Users get their row the first time their
+shard is looked up (in practice: when the account is created), placed by
+`choose_shard`. `move_user_shard` moves a user between shards.
+
+Routing (`ShardRouter`, ahead of the replica router):
+- model instances route to the database they were loaded from, or to
+  their user's shard (`user.expenses.all()`, `Expense(user=...)`);
+- anything else goes to the current shard, set for the request by
+  LeanJWTAuthentication and for scripts with `with user_shard(user_id):`.
+Queries on 'default' are left to the replica router. Relations between
+sharded rows must stay on one database; a row may point at its user only
+from that user's shard.
+
+Every shard carries the full schema (`migrate --database <alias>`), since
+the sharded apps' migrations reference the user table, but data
+migrations of the other apps only run on 'default'. User foreign keys on
+sharded models have no database constraint because the user row lives on
+'default'. The shard map is always read from 'default', never from the
+replica.
+"""
+
+import contextlib
+import contextvars
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from . import metrics
+from .routers import REPLICA_ALIAS
+
+
+SHARDED_APPS = frozenset({'api_expenses', 'api_budgets', 'usersettings'})
+
+DEFAULT_SHARD = 'default'
+MAP_CACHE_SECONDS = getattr(settings, 'SHARD_MAP_CACHE_SECONDS', 60)
+
+# Shard of the user the current request / script works for
+_current_shard = contextvars.ContextVar('current_shard', default=None)
+
+
+def shard_aliases():
+    return list(getattr(settings, 'DATABASE_SHARDS', [DEFAULT_SHARD]))
+
+
+def is_sharded(model):
+    return model._meta.app_label in SHARDED_APPS
+
+
+def _map_key(user_id):
+    return f'shard:user:{user_id}'
+
+
+def choose_shard(user_id):
+    """Placement for a user without a shard yet: spread by id."""
+    aliases = shard_aliases()
+    return aliases[int(user_id) % len(aliases)]
+
+
+def shard_for_user(user_id):
+    """Database alias holding the user's data, assigning one on first use."""
+    key = _map_key(user_id)
+    alias = cache.get(key)
+    metrics.cache_lookup('shard_map', alias is not None)
+    if alias is None:
+        UserShard = apps.get_model('account', 'UserShard')
+        # Pinned: a lagging replica could miss a new or moved user
+        shards = UserShard.objects.using(DEFAULT_DB_ALIAS)
+        alias = shards.filter(user_id=user_id).values_list('shard', flat=True).first()
+        if alias is None:
+            alias = shards.get_or_create(
+                user_id=user_id,
+                defaults={'shard': choose_shard(user_id)}
+            )[0].shard
+        cache.set(key, alias, MAP_CACHE_SECONDS)
+    return alias
+
+
+def set_user_shard(user_id, alias):
+    """Point the shard map at `alias` (used once the data has been moved)."""
+    UserShard = apps.get_model('account', 'UserShard')
+    UserShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(user_id=user_id, defaults={'shard': alias})
+    cache.delete(_map_key(user_id))
+
+
+def forget_user_shard(user_id):
+    cache.delete(_map_key(user_id))
+
+
+def current_shard():
+    return _current_shard.get() or DEFAULT_SHARD
+
+
+def activate_user_shard(user_id):
+    """Route unhinted queries on sharded models to this user's shard."""
+    alias = shard_for_user(user_id)
+    _current_shard.set(alias)
+    return alias
+
+
+@contextlib.contextmanager
+def user_shard(user_id):
+    """`with user_shard(user_id) as alias:` - work on one user's data outside a request."""
+    token = _current_shard.set(shard_for_user(user_id))
+    try:
+        yield _current_shard.get()
+    finally:
+        _current_shard.reset(token)
+
+
+@contextlib.contextmanager
+def use_shard(alias):
+    token = _current_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_shard.reset(token)
+
+
+def delete_user_data(user_id, alias):
+    """Remove a user's sharded rows from `alias` (cascades to receipts and stats)."""
+    with use_shard(alias), transaction.atomic(using=alias):
+        for model_name in ('api_expenses.Expense', 'api_expenses.ReceiptUpload',
+                           'api_budgets.Budget', 'api_budgets.BudgetCategory',
+                           'usersettings.UserSettings'):
+            apps.get_model(model_name).objects.using(alias).filter(user_id=user_id).delete()
+
+
+class ShardRouter:
+    def _alias(self, model, hints):
+        instance = hints.get('instance')
+        if instance is not None:
+            if is_sharded(type(instance)):
+                if instance._state.db:
+                    return instance._state.db
+                user_id = getattr(instance, 'user_id', None)
+                if user_id is not None:
+                    return shard_for_user(user_id)
+            elif isinstance(instance, apps.get_model(settings.AUTH_USER_MODEL)) and instance.pk:
+                return shard_for_user(instance.pk)
+        return _current_shard.get()
+
+    def _route(self, model, hints):
+        if not is_sharded(model):
+            return None
+        alias = self._alias(model, hints)
+        # 'default' (and its replica) is the replica router's business
+        if alias is None or alias == DEFAULT_SHARD or alias not in shard_aliases():
+            return None
+        return alias
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        sharded = [obj for obj in (obj1, obj2) if is_sharded(type(obj))]
+        if not sharded:
+            return None
+        if len(sharded) == 2:
+            return _database(obj1) == _database(obj2)
+
+        row = sharded[0]
+        other = obj2 if row is obj1 else obj1
+        if not isinstance(other, apps.get_model(settings.AUTH_USER_MODEL)):
+            # Sharded rows only point at each other and at their user
+            return False
+        return row._state.db is None or other.pk is None or _database(row) == shard_for_user(other.pk)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_SHARD or db not in shard_aliases():
+            return None
+        if app_label in SHARDED_APPS:
+            return True
+        # Schema only: no model_name means a data migration, whose rows
+        # belong on 'default'
+        return model_name is not None
+
+
+def _database(obj):
+    # The replica holds the same rows as 'default'
+    return DEFAULT_SHARD if obj._state.db == REPLICA_ALIAS else obj._state.db
+
+
+class ShardContextMiddleware:
+    """Start every request without a current shard (threads are reused)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _current_shard.set(None)
+        try:
+            return self.get_response(request)
+        finally:
+            _current_shard.reset(token)
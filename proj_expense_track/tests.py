@@ -0,0 +1,180 @@
+import csv
+import io
+import os
+import runpy
+import shutil
+import tempfile
+import time
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api_expenses.models import Expense
+from . import admin_utils, media
+from .fileserve import parse_range
+from .media import signed_media_url
+
+
+User = get_user_model()
+
+
+class ParseRangeTests(SimpleTestCase):
+
+    def test_single_ranges(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        # Clamped to the file
+        self.assertEqual(parse_range('bytes=990-2000', 1000), (990, 999))
+        self.assertEqual(parse_range('bytes=-5000', 1000), (0, 999))
+
+    def test_whole_file_when_absent_or_not_a_single_byte_range(self):
+        for header in (None, '', 'bytes=-', 'items=0-5', 'bytes=0-1,5-9', 'bytes=a-b'):
+            self.assertIsNone(parse_range(header, 1000), header)
+
+    def test_unsatisfiable(self):
+        for header in ('bytes=1000-', 'bytes=5-4', 'bytes=-0'):
+            self.assertIs(parse_range(header, 1000), False, header)
+
+
+class ServeMediaTests(TestCase):
+    name = 'profiles/owner.png'
+    body = bytes(range(256)) * 4
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        os.makedirs(os.path.join(media_root, 'profiles'))
+        with open(os.path.join(media_root, self.name), 'wb') as f:
+            f.write(self.body)
+
+        self.owner = User.objects.create_user(
+            email='owner@example.com', username='owner', password='S3cure-pass!'
+        )
+        User.objects.filter(pk=self.owner.pk).update(profile_image=self.name)
+        self.other = User.objects.create_user(
+            email='other@example.com', username='other', password='S3cure-pass!'
+        )
+        self.url = f'/media/{self.name}'
+
+    def _client(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client
+
+    def _signed_url(self, name=None):
+        return signed_media_url(APIRequestFactory().get('/'), name or self.name)
+
+    def test_only_the_owner_gets_the_unsigned_file(self):
+        self.assertEqual(self._client(self.owner).get(self.url).status_code, 200)
+        # Not confirmed to exist for anyone else
+        self.assertEqual(self._client(self.other).get(self.url).status_code, 404)
+        self.assertEqual(self._client().get(self.url).status_code, 401)
+
+    def test_signed_url_needs_no_credentials_until_it_expires(self):
+        url = self._signed_url()
+        self.assertEqual(self._client().get(url).status_code, 200)
+
+        later = time.time() + media.SIGNED_URL_SECONDS + 1
+        with mock.patch('django.core.signing.time.time', return_value=later):
+            self.assertEqual(self._client().get(url).status_code, 401)
+
+    def test_signature_is_bound_to_its_path(self):
+        other_sig = self._signed_url('profiles/other.png').split('?')[1]
+
+        self.assertEqual(self._client().get(f'{self.url}?{other_sig}').status_code, 401)
+        self.assertEqual(self._client().get(f'{self.url}?sig=forged').status_code, 401)
+
+    def test_range_request(self):
+        response = self._client(self.owner).get(self.url, HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.body)}')
+        self.assertEqual(b''.join(response.streaming_content), self.body[10:20])
+
+        response = self._client(self.owner).get(self.url, HTTP_RANGE=f'bytes={len(self.body)}-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_stale_if_range_sends_the_whole_file(self):
+        response = self._client(self.owner).get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.body)
+
+
+class CSVExportTests(TestCase):
+    url = '/admin/api_expenses/expense/export-csv/'
+    # The export's own SELECT; the changelist also counts the rows
+    export_sql = '"api_expenses_expense"."notes"'
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='S3cure-pass!'
+        )
+        Expense.objects.create(user=self.admin, amount='12.50', date=date(2026, 1, 1), notes='=HYPERLINK("x")')
+        Expense.objects.bulk_create(
+            Expense(user=self.admin, amount='1.00', date=date(2026, 1, 2)) for _ in range(4)
+        )
+        self.client.force_login(self.admin)
+
+    def test_rows_are_read_while_streaming(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        self.assertFalse([q for q in queries if self.export_sql in q['sql']])
+
+        with mock.patch.object(admin_utils, 'EXPORT_CHUNK_SIZE', 2), \
+                CaptureQueriesContext(connection) as queries:
+            body = b''.join(response.streaming_content).decode()
+        # One query, user and category joined in
+        self.assertEqual(len([q for q in queries if self.export_sql in q['sql']]), 1)
+
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0][:4], ['ID', 'User', 'Date', 'Amount'])
+        self.assertEqual(len(rows), 6)
+        notes = {row[6] for row in rows[1:]}
+        # Formulas are neutralised for spreadsheet apps
+        self.assertIn('\'=HYPERLINK("x")', notes)
+
+    def test_needs_admin_access(self):
+        self.client.logout()
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 302)
+
+
+class DatabasePoolSettingsTests(SimpleTestCase):
+    settings_path = os.path.join(os.path.dirname(__file__), 'settings.py')
+
+    def _databases(self, **env):
+        env = {'DB_ENGINE': 'postgresql', **env}
+        with mock.patch.dict(os.environ, env):
+            for name in ('DB_POOL', 'DB_POOL_MAX_SIZE', 'WEB_THREADS'):
+                if name not in env:
+                    os.environ.pop(name, None)
+            return runpy.run_path(self.settings_path)['DATABASES']
+
+    def test_pool_is_sized_from_the_request_threads(self):
+        default = self._databases(WEB_THREADS='8')['default']
+
+        self.assertEqual(default['OPTIONS']['pool']['max_size'], 9)
+        # A pooled connection goes back to the pool on close
+        self.assertNotIn('CONN_MAX_AGE', default)
+
+    def test_persistent_connections_without_the_pool(self):
+        default = self._databases(DB_POOL='false')['default']
+
+        self.assertNotIn('pool', default['OPTIONS'])
+        self.assertEqual(default['CONN_MAX_AGE'], 600)
+        self.assertTrue(default['CONN_HEALTH_CHECKS'])
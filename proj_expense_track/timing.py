@@ -0,0 +1,206 @@
+"""
+Per-request performance numbers.
+
+`RequestTimingMiddleware` measures, for every request:
+- queries / db : number of SQL statements and their total time, across all
+                 database aliases (through `connection.execute_wrapper`);
+- view         : time spent in the view, from the call to its return,
+                 less the serializer time below;
+- serialize    : time in DRF serializers' `.data` (to_representation of
+                 every object), wherever the view reads it;
+- render       : time turning the response into bytes (DRF's JSON render);
+- total        : the whole request as seen by this middleware.
+
+`serialize` is measured by wrapping `BaseSerializer.data` once, when the
+middleware is set up with that metric on; outside a timed request the
+wrapper only does a context variable lookup.
+
+They are sent back as `Server-Timing` (shown in the browser's network
+panel) and `X-Query-Count` headers, and written as one JSON line to the
+'proj_expense_track.timing' logger. REQUEST_TIMING_METRICS picks which
+metrics are collected; REQUEST_TIMING_HEADERS and REQUEST_TIMING_LOG switch
+the two outputs. With everything off the middleware removes itself.
+"""
+
+import contextvars
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+logger = logging.getLogger('proj_expense_track.timing')
+
+ALL_METRICS = ('queries', 'db', 'view', 'serialize', 'render', 'total')
+
+_REQUEST_ATTR = '_request_timing'
+
+# RequestTiming of the request running in this thread / task
+_current = contextvars.ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """Numbers for one request; times in seconds."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.view = None
+        self.serialize = 0.0
+        self.render = None
+        self.total = None
+        self._in_serializer = False
+        self._view_started = None
+        self._render_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+    def view_started(self):
+        self._view_started = time.perf_counter()
+
+    def view_finished(self):
+        if self._view_started is not None and self.view is None:
+            self.view = time.perf_counter() - self._view_started - self.serialize
+        self._render_started = time.perf_counter()
+
+    def render_finished(self, response):
+        if self._render_started is not None:
+            self.render = time.perf_counter() - self._render_started
+        return response
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+        if self.view is None and self._view_started is not None:
+            # No template response (plain HttpResponse, streaming): the view
+            # ran until the response came back here
+            self.view = self.total - (self._view_started - self.started) - self.serialize
+
+    def timed_serializer_data(self, get_data):
+        # Nested serializers run inside the outer one's .data: count once
+        if self._in_serializer:
+            return get_data()
+        self._in_serializer = True
+        started = time.perf_counter()
+        try:
+            return get_data()
+        finally:
+            self.serialize += time.perf_counter() - started
+            self._in_serializer = False
+
+
+def _install_serializer_timing():
+    from rest_framework.serializers import BaseSerializer
+
+    get_data = BaseSerializer.data.fget
+    if getattr(get_data, 'request_timed', False):
+        return
+
+    def data(serializer):
+        timing = _current.get()
+        if timing is None:
+            return get_data(serializer)
+        return timing.timed_serializer_data(lambda: get_data(serializer))
+
+    data.request_timed = True
+    BaseSerializer.data = property(data)
+
+
+def get_request_timing(request):
+    """The RequestTiming of the current request, or None when timing is off."""
+    return getattr(getattr(request, '_request', request), _REQUEST_ATTR, None)
+
+
+class RequestTimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.metrics = [m for m in getattr(settings, 'REQUEST_TIMING_METRICS', ALL_METRICS) if m in ALL_METRICS]
+        self.headers = getattr(settings, 'REQUEST_TIMING_HEADERS', False)
+        self.log = getattr(settings, 'REQUEST_TIMING_LOG', False)
+        if not self.metrics or not (self.headers or self.log):
+            raise MiddlewareNotUsed
+
+        self.track_db = 'queries' in self.metrics or 'db' in self.metrics
+        if 'serialize' in self.metrics:
+            _install_serializer_timing()
+
+    def __call__(self, request):
+        timing = RequestTiming()
+        setattr(request, _REQUEST_ATTR, timing)
+
+        token = _current.set(timing)
+        try:
+            with ExitStack() as stack:
+                if self.track_db:
+                    for connection in connections.all():
+                        stack.enter_context(connection.execute_wrapper(timing))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        timing.finish()
+        values = self._values(timing)
+
+        if self.headers:
+            self._add_headers(response, values)
+        if self.log:
+            user = getattr(request, 'user', None)
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'user_id': user.pk if user is not None and user.is_authenticated else None,
+                **values,
+            }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = getattr(request, _REQUEST_ATTR, None)
+        if timing is not None:
+            timing.view_started()
+
+    def process_template_response(self, request, response):
+        # Called once the view returned and before the response is rendered
+        timing = getattr(request, _REQUEST_ATTR, None)
+        if timing is not None:
+            timing.view_finished()
+            response.add_post_render_callback(timing.render_finished)
+        return response
+
+    def _values(self, timing):
+        values = {}
+        for metric in self.metrics:
+            value = getattr(timing, metric)
+            if value is None:
+                continue
+            values[metric if metric == 'queries' else f'{metric}_ms'] = (
+                value if metric == 'queries' else round(value * 1000, 2)
+            )
+        return values
+
+    def _add_headers(self, response, values):
+        if 'queries' in values:
+            response['X-Query-Count'] = str(values['queries'])
+
+        entries = []
+        for metric in ('db', 'view', 'serialize', 'render', 'total'):
+            key = f'{metric}_ms'
+            if key in values:
+                entry = f'{metric};dur={values[key]}'
+                if metric == 'db' and 'queries' in values:
+                    count = values['queries']
+                    entry += f';desc="{count} {"query" if count == 1 else "queries"}"'
+                entries.append(entry)
+        if entries:
+            response['Server-Timing'] = ', '.join(entries)
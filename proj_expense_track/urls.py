@@ -13,6 +13,15 @@ urlpatterns = [
 ]
 
 from django.conf import settings
-from django.conf.urls.static import static
+from .media import serve_media
+from .metrics import metrics_view
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Owner-checked media (X-Accel-Redirect / X-Sendfile behind a proxy, see fileserve.py)
+urlpatterns += [
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:path>", serve_media, name='serve_media'),
+]
+
+# Prometheus scrape target (token or staff only, see metrics.py)
+urlpatterns += [
+    path('metrics', metrics_view, name='metrics'),
+]
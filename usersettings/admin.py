@@ -1,8 +1,9 @@
 from django.contrib import admin
+from proj_expense_track.admin_utils import DefaultShardAdminMixin
 from .models import UserSettings
 
 @admin.register(UserSettings)
-class UserSettingsAdmin(admin.ModelAdmin):
+class UserSettingsAdmin(DefaultShardAdminMixin, admin.ModelAdmin):
     list_display = (
         'user',
         'currency',
@@ -10,3 +11,5 @@ class UserSettingsAdmin(admin.ModelAdmin):
         'created_at',
     )
     search_fields = ('user__email',)
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
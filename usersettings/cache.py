@@ -0,0 +1,74 @@
+"""
+Cached access to UserSettings.
+
+Settings rows are created eagerly when a User is created (see signals.py),
+so reads never need get_or_create. `get_settings_for_request` memoizes the
+row on the request; below that a per-user cache entry keyed with a schema
+version is shared across requests and dropped whenever the row is saved.
+
+Dropping the entry only reaches other workers through a shared cache
+backend (Redis, Memcached, database). With a per-process cache (LocMem,
+the default) another worker would keep its copy until it expires, so
+entries then live USER_SETTINGS_LOCAL_CACHE_SECONDS instead: a change is
+seen everywhere within seconds.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from proj_expense_track import metrics
+from proj_expense_track.sharding import shard_for_user
+from .models import UserSettings
+
+
+# Bump when the cached shape changes so old entries are ignored
+CACHE_VERSION = 1
+
+# Backends whose entries are private to one process
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def _cache_seconds():
+    seconds = getattr(settings, 'USER_SETTINGS_CACHE_SECONDS', 3600)
+    if settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_BACKENDS:
+        seconds = min(seconds, getattr(settings, 'USER_SETTINGS_LOCAL_CACHE_SECONDS', 5))
+    return seconds
+
+
+CACHE_SECONDS = _cache_seconds()
+
+_REQUEST_ATTR = '_cached_user_settings'
+
+
+def _cache_key(user_id):
+    return f'usersettings:v{CACHE_VERSION}:{user_id}'
+
+
+def get_user_settings(user):
+    """Return the user's settings from cache, falling back to the database."""
+    key = _cache_key(user.pk)
+    settings_obj = cache.get(key)
+    metrics.cache_lookup('user_settings', settings_obj is not None)
+    if settings_obj is None:
+        # get_or_create only covers users created before eager creation
+        # and not yet backfilled (see backfill_user_settings)
+        settings_obj, _ = UserSettings.objects.using(shard_for_user(user.pk)).get_or_create(user_id=user.pk)
+        cache.set(key, settings_obj, CACHE_SECONDS)
+    return settings_obj
+
+
+def get_settings_for_request(request):
+    """Load the current user's settings at most once per request."""
+    http_request = getattr(request, '_request', request)
+    settings_obj = getattr(http_request, _REQUEST_ATTR, None)
+    if settings_obj is None:
+        settings_obj = get_user_settings(request.user)
+        setattr(http_request, _REQUEST_ATTR, settings_obj)
+    return settings_obj
+
+
+def invalidate_user_settings(user_id):
+    cache.delete(_cache_key(user_id))
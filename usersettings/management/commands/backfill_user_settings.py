@@ -0,0 +1,58 @@
+# usersettings/management/commands/backfill_user_settings.py
+# Create missing UserSettings rows for users created before eager creation
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+
+from proj_expense_track.sharding import shard_for_user
+from usersettings.models import UserSettings
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Create default UserSettings for every user that does not have one"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Users checked per round (default: 1000)'
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs.get('batch_size')
+
+        # Settings rows live on each user's shard, so no join with the user table
+        user_ids = User.objects.values_list('id', flat=True).order_by('id')
+
+        created = 0
+        batch = []
+        for user_id in user_ids.iterator(chunk_size=batch_size):
+            batch.append(user_id)
+            if len(batch) >= batch_size:
+                created += self._backfill(batch)
+                batch = []
+
+        if batch:
+            created += self._backfill(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Backfilled settings for {created} users")
+        )
+
+    def _backfill(self, user_ids):
+        by_shard = {}
+        for user_id in user_ids:
+            by_shard.setdefault(shard_for_user(user_id), []).append(user_id)
+
+        created = 0
+        for alias, ids in by_shard.items():
+            existing = set(
+                UserSettings.objects.using(alias).filter(user_id__in=ids).values_list('user_id', flat=True)
+            )
+            missing = [UserSettings(user_id=user_id) for user_id in ids if user_id not in existing]
+            UserSettings.objects.using(alias).bulk_create(missing, ignore_conflicts=True)
+            created += len(missing)
+        return created
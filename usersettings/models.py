@@ -5,6 +5,8 @@ class UserSettings(models.Model):
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        # The user row lives on 'default', this one on the user's shard
+        db_constraint=False,
         related_name='settings'
     )
 
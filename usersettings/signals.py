@@ -0,0 +1,23 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from proj_expense_track.sharding import shard_for_user
+from .models import UserSettings
+from .cache import invalidate_user_settings
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_user_settings(sender, instance, created, raw=False, **kwargs):
+    """Every user gets a settings row up front, so reads never insert."""
+    if created and not raw:
+        UserSettings.objects.using(shard_for_user(instance.pk)).get_or_create(user=instance)
+
+
+@receiver([post_save, post_delete], sender=UserSettings)
+def drop_cached_user_settings(sender, instance, using, **kwargs):
+    # After commit: dropped earlier, a concurrent read could cache the old row again
+    transaction.on_commit(partial(invalidate_user_settings, instance.user_id), using=using)
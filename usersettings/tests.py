@@ -1,3 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .cache import _cache_key, get_user_settings
+from .models import UserSettings
+
+
+User = get_user_model()
+
+
+class UpdateUserSettingsTests(TestCase):
+    url = '/api/usersettings/update/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='settings@example.com', username='settings', password='S3cure-pass!'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cache_is_dropped_after_commit(self):
+        get_user_settings(self.user)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.put(self.url, {'currency': 'EUR'}, format='json')
+            # Still inside the transaction: the old entry is kept until commit
+            self.assertIsNotNone(cache.get(_cache_key(self.user.pk)))
+
+        self.assertEqual(response.status_code, 200, response.data)
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(_cache_key(self.user.pk)))
+        self.assertEqual(get_user_settings(self.user).currency, 'EUR')
+
+    def test_missing_row_is_created_and_cache_dropped(self):
+        UserSettings.objects.filter(user=self.user).delete()
+        cache.set(_cache_key(self.user.pk), UserSettings(user=self.user, currency='USD'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(self.url, {'currency': 'EUR'}, format='json')
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(UserSettings.objects.get(user=self.user).currency, 'EUR')
+        self.assertIsNone(cache.get(_cache_key(self.user.pk)))
@@ -1,4 +1,5 @@
 from django.shortcuts import render
+from django.db import transaction
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
@@ -6,15 +7,15 @@ from rest_framework import status
 
 from .models import UserSettings
 from . serializers import UserSettingsSerializer
+from .cache import get_settings_for_request
+from proj_expense_track.sharding import shard_for_user
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_settings(request):
     """Retrieve the authenticated user's settings."""
     try:
-        settings_obj, created = UserSettings.objects.get_or_create(
-            user=request.user
-        )
+        settings_obj = get_settings_for_request(request)
 
         serializer = UserSettingsSerializer(settings_obj)
         return Response({
@@ -33,17 +34,22 @@ def get_user_settings(request):
 def update_user_settings(request):
     """Update the authenticated user's settings (currency and/or monthly budget)."""
     try:
-        settings_obj, _ = UserSettings.objects.get_or_create(
-            user=request.user
-        )
+        # Write path: always edit the database row on the user's shard,
+        # never the cached copy. The cache entry is dropped once the
+        # transaction commits (see signals.py).
+        alias = shard_for_user(request.user.pk)
+        with transaction.atomic(using=alias):
+            settings_obj, _ = UserSettings.objects.using(alias).select_for_update().get_or_create(
+                user_id=request.user.pk
+            )
 
-        serializer = UserSettingsSerializer(
-            settings_obj,
-            data=request.data,
-            partial=True
-        )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+            serializer = UserSettingsSerializer(
+                settings_obj,
+                data=request.data,
+                partial=True
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
 
         return Response({
             'message': 'User settings updated successfully',